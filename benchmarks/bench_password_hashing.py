@@ -0,0 +1,84 @@
+"""
+Event loop latency during a burst of password hashes, hashed inline against through the hasher.
+
+A ticker task sleeps --tick seconds in a loop and records how late it wakes up, which is the
+delay every other request on the worker would see. --burst passwords are then hashed at once,
+first by calling the key derivation directly in the coroutine as create_account used to, then
+through the PasswordHasher process pool. Reports the burst duration and the ticker's lateness.
+
+    python benchmarks/bench_password_hashing.py
+    python benchmarks/bench_password_hashing.py --burst 64 --workers 4 --iterations 600000
+    python benchmarks/bench_password_hashing.py --algorithm scrypt
+"""
+
+# ruff: noqa: T201
+import argparse
+import asyncio
+import secrets
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from library.extensions import HashParams, PasswordHasher
+from library.extensions.password_hasher_extn import derive
+
+
+async def _measure(burst: Callable[[], Awaitable[None]], tick: float) -> tuple[float, list[float]]:
+    lateness: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lateness.append(time.perf_counter() - started - tick)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick * 2)
+    started = time.perf_counter()
+    await burst()
+    duration = time.perf_counter() - started
+    done.set()
+    await task
+    return duration, sorted(lateness)
+
+
+def _report(label: str, duration: float, lateness: list[float]) -> None:
+    p99 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))]
+    print(
+        f"  {label:<8}: burst {duration * 1000:9.1f} ms"
+        f"  loop lag p99 {p99 * 1000:8.1f} ms  max {lateness[-1] * 1000:8.1f} ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    params = HashParams(args.algorithm, iterations=args.iterations)
+    hasher = PasswordHasher(params, workers=args.workers or None, queue_size=max(args.burst, 1))
+    passwords = [secrets.token_urlsafe(12) for _ in range(args.burst)]
+
+    async def inline() -> None:
+        for password in passwords:
+            derive(password, secrets.token_bytes(16), params)
+            await asyncio.sleep(0)
+
+    async def pooled() -> None:
+        await asyncio.gather(*(hasher.hash(password) for password in passwords))
+
+    print(f"{args.burst} hashes with {params.encode()}, {hasher.workers} workers, ticking every {args.tick * 1000} ms")
+    await hasher.hash("warm up the pool")
+    _report("inline", *await _measure(inline, args.tick))
+    _report("hasher", *await _measure(pooled, args.tick))
+    await hasher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=16, help="passwords hashed at once")
+    parser.add_argument("--algorithm", choices=["pbkdf2_sha256", "scrypt"], default="pbkdf2_sha256")
+    parser.add_argument("--iterations", type=int, default=600000)
+    parser.add_argument("--workers", type=int, default=0, help="0 means one per CPU")
+    parser.add_argument("--tick", type=float, default=0.005, help="seconds between two ticker wake ups")
+    asyncio.run(main(parser.parse_args()))
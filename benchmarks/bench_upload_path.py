@@ -0,0 +1,342 @@
+"""
+Throughput, tail latency, peak RSS and open file descriptors of POST /api/v1/uploads/.
+
+Synthetic PDFs of each --sizes are posted --files at a time, through Quart's test client and
+through a real hypercorn server bound to localhost in the same process.
+
+    python benchmarks/bench_upload_path.py
+    python benchmarks/bench_upload_path.py --sizes 65536 8388608 --files 1 8 --transport hypercorn
+    python benchmarks/bench_upload_path.py --output before.json
+    python benchmarks/bench_upload_path.py --compare before.json
+"""
+
+# ruff: noqa: T201
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Self
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from quart import Blueprint, Quart
+from quart_schema import QuartSchema
+from quart_uploads import configure_uploads
+
+from blueprints import bp
+from library.extensions import configure_upload_scheduler, pdf_loader
+
+BOUNDARY = "bench-boundary-7MA4YWxkTrZu0gW"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+Post = Callable[[bytes], Awaitable[int]]
+
+
+def synthetic_pdf(size: int, seed: int) -> bytes:
+    """A well formed single page PDF padded to ``size`` bytes with an incompressible stream."""
+    head = b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+    head += b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n"
+    head += b"3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >> endobj\n"
+    tail = b"\nendstream endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n"
+    marker = f"% bench {seed}\n".encode()
+    length = max(size - len(head) - len(marker) - len(tail) - 40, 0)
+    stream = f"4 0 obj << /Length {length} >> stream\n".encode()
+    return head + marker + stream + os.urandom(length) + tail
+
+
+def multipart_body(files: list[bytes]) -> bytes:
+    parts = [f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="passwords"\r\n\r\n\r\n'.encode()]
+    for i, payload in enumerate(files):
+        disposition = f'form-data; name="documents"; filename="bench-{i}.pdf"'
+        header = f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\nContent-Type: application/pdf\r\n\r\n"
+        parts.extend((header.encode(), payload, b"\r\n"))
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def create_bench_app(destination: Path) -> Quart:
+    """The upload blueprint mounted like create_app does, without the database and settings."""
+    app = Quart(__name__)
+    app.config.update(UPLOADS_DEFAULT_DEST=str(destination), MAX_CONTENT_LENGTH=None, BODY_TIMEOUT=300)
+    QuartSchema().init_app(app)
+    configure_uploads(app, pdf_loader)
+    configure_upload_scheduler(app)
+    api_v1 = Blueprint("parent", __name__, url_prefix="/api/v1")
+    api_v1.register_blueprint(bp)
+    app.register_blueprint(api_v1)
+    return app
+
+
+class ResourceSampler:
+    """Samples resident memory and open file descriptors of this process while a scenario runs."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_fds = 0
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def rss() -> int:
+        try:
+            with Path("/proc/self/statm").open() as statm:
+                return int(statm.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            # lifetime peak, the best that is available outside Linux
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    @staticmethod
+    def fds() -> int:
+        folder = next((Path(folder) for folder in ("/proc/self/fd", "/dev/fd") if Path(folder).is_dir()), None)
+        return sum(1 for _ in folder.iterdir()) if folder is not None else 0
+
+    def sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, self.rss())
+        self.peak_fds = max(self.peak_fds, self.fds())
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self) -> Self:
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+def test_client_poster(app: Quart) -> Post:
+    client = app.test_client()
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+    async def post(body: bytes) -> int:
+        response = await client.post("/api/v1/uploads/", data=body, headers=headers)
+        await response.get_data()
+        return response.status_code
+
+    return post
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    status_line = await reader.readline()
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+def hypercorn_poster(port: int) -> Post:
+    async def post(body: bytes) -> int:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        head = (
+            "POST /api/v1/uploads/ HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\n"
+            f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode())
+            view = memoryview(body)
+            for start in range(0, len(body), 262144):
+                writer.write(view[start : start + 262144])
+                await writer.drain()
+            return await _read_response(reader)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    return post
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_scenario(post: Post, size: int, files: int, requests: int, concurrency: int) -> dict[str, Any]:
+    # every file is distinct so blob deduplication never short-cuts a write
+    bodies = [
+        multipart_body([synthetic_pdf(size, request * files + i) for i in range(files)])
+        for request in range(requests + 1)
+    ]
+    await post(bodies.pop())  # warm up routing, schema and the upload destination
+    latencies: list[float] = []
+    failures = 0
+    queue: asyncio.Queue[bytes] = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def client() -> None:
+        nonlocal failures
+        while not queue.empty():
+            body = queue.get_nowait()
+            started = time.perf_counter()
+            status = await post(body)
+            latencies.append(time.perf_counter() - started)
+            failures += status != 201  # noqa: PLR2004
+
+    async with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    megabytes = size * files * requests / 1048576
+    return {
+        "file_size": size,
+        "files_per_request": files,
+        "requests": requests,
+        "concurrency": concurrency,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 4),
+        "mb_per_s": round(megabytes / elapsed, 2),
+        "requests_per_s": round(requests / elapsed, 2),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 3),
+        "latency_ms_p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        "latency_ms_max": round(latencies[-1] * 1000, 3),
+        "peak_rss_mb": round(sampler.peak_rss / 1048576, 1),
+        "peak_open_fds": sampler.peak_fds,
+    }
+
+
+async def run_transport(transport: str, args: argparse.Namespace) -> list[dict[str, Any]]:
+    destination = Path(tempfile.mkdtemp(prefix="bench-uploads-"))
+    app = create_bench_app(destination)
+    results = []
+    if transport == "test_client":
+        async with app.test_app():
+            post = test_client_poster(app)
+            for size in args.sizes:
+                for files in args.files:
+                    results.append(await run_scenario(post, size, files, args.requests, args.concurrency))
+                    print(_row(transport, results[-1]))
+        return results
+
+    # hypercorn is what the image serves with, but it is not a dependency of the package
+    from hypercorn.asyncio import serve  # noqa: PLC0415
+    from hypercorn.config import Config  # noqa: PLC0415
+
+    port = _free_port()
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    config.errorlog = None
+    shutdown = asyncio.Event()
+    server = asyncio.create_task(serve(app, config, shutdown_trigger=shutdown.wait))
+    for _ in range(200):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.01)
+            continue
+        writer.close()
+        break
+    try:
+        post = hypercorn_poster(port)
+        for size in args.sizes:
+            for files in args.files:
+                results.append(await run_scenario(post, size, files, args.requests, args.concurrency))
+                print(_row(transport, results[-1]))
+    finally:
+        shutdown.set()
+        await server
+    return results
+
+
+def _row(transport: str, result: dict[str, Any]) -> str:
+    return (
+        f"  {transport:<11} {result['file_size']:>10} B x{result['files_per_request']:<3}"
+        f" {result['mb_per_s']:>9.1f} MB/s  p50 {result['latency_ms_p50']:>9.1f} ms"
+        f"  p99 {result['latency_ms_p99']:>9.1f} ms  rss {result['peak_rss_mb']:>7.1f} MB"
+        f"  fds {result['peak_open_fds']:>4}  failures {result['failures']}"
+    )
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path: Path, results: list[dict[str, Any]]) -> None:
+    baseline = {
+        (r["transport"], r["file_size"], r["files_per_request"]): r
+        for r in json.loads(baseline_path.read_text())["results"]
+    }
+    print(f"compared with {baseline_path} (ratio new / old)")
+    for result in results:
+        old = baseline.get((result["transport"], result["file_size"], result["files_per_request"]))
+        if old is None:
+            continue
+        ratios = "  ".join(
+            f"{metric} x{result[metric] / old[metric]:.2f}"
+            for metric in ("mb_per_s", "latency_ms_p50", "latency_ms_p99", "peak_rss_mb")
+            if old[metric]
+        )
+        print(f"  {result['transport']:<11} {result['file_size']:>10} B x{result['files_per_request']:<3} {ratios}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"POST /api/v1/uploads/, {args.requests} requests per scenario, concurrency {args.concurrency}")
+    results = []
+    for transport in args.transport:
+        results.extend({"transport": transport, **result} for result in await run_transport(transport, args))
+
+    report = {
+        "benchmark": "upload_path",
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"results written to {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[65536, 1048576, 8388608], help="file sizes in bytes")
+    parser.add_argument("--files", type=int, nargs="+", default=[1, 4], help="files per request")
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--transport", nargs="+", choices=("test_client", "hypercorn"), default=["test_client", "hypercorn"]
+    )
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run to compare against")
+    asyncio.run(main(parser.parse_args()))
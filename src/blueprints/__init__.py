@@ -1,3 +1,5 @@
+from .auth import bp as auth_bp
+from .documents import bp as documents_bp
 from .uploads import bp
 
-__all__ = ("bp",)
+__all__ = ("auth_bp", "bp", "documents_bp")
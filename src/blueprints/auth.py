@@ -0,0 +1,47 @@
+import logging
+
+from pydantic import BaseModel
+from quart import Blueprint, g, request
+from quart_schema import validate_request, validate_response
+
+from library.extensions import login_required
+from service.account_service import AccountService
+
+bp = Blueprint("auth", __name__, url_prefix="/auth")
+
+logger = logging.getLogger(__name__)
+
+
+class LoginReqst(BaseModel):
+    email: str
+    password: str
+
+
+class TokenResponse(BaseModel):
+    token: str
+    token_type: str = "Bearer"  # noqa: S105
+    expires_at: int
+
+
+class ErrorResponse(BaseModel):
+    error: str
+
+
+@bp.route("/login", methods=["POST"])
+@validate_request(LoginReqst)
+@validate_response(TokenResponse, 200)
+async def login(data: LoginReqst) -> tuple:
+    """Exchange an email and password for a session token, sent back as ``Authorization: Bearer``."""
+    issued = await AccountService.login(data.email, data.password, request.remote_addr or "")
+    if issued is None:
+        return ErrorResponse(error="Invalid email or password."), 401
+    _, token, expires_at = issued
+    return TokenResponse(token=token, expires_at=expires_at), 200
+
+
+@bp.route("/logout", methods=["POST"])
+@login_required
+async def logout() -> tuple:
+    """Revoke every session token of the account, on all its devices."""
+    await AccountService.revoke_sessions(g.token.account_id)
+    return "", 204
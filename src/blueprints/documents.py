@@ -0,0 +1,71 @@
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+from quart import Blueprint
+from quart_schema import validate_querystring, validate_response
+
+from database import db
+from database.models import Document
+
+bp = Blueprint("documents", __name__, url_prefix="/batches")
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentPageQuery(BaseModel):
+    after: uuid.UUID | None = None
+    limit: int = Field(default=100, ge=1, le=1000)
+
+
+class DocumentResponse(BaseModel):
+    id: uuid.UUID
+    batch_id: uuid.UUID
+    name: str
+    extension: str
+    doc_type: str | None = None
+    doc_language: str | None = None
+    content_hash: str | None = None
+    file_size: int | None = None
+    created_at: datetime
+    processing_started_at: datetime | None = None
+    parsing_completed_at: datetime | None = None
+    parsing_failed_at: datetime | None = None
+    parsing_error: str | None = None
+    archived: bool
+
+
+class DocumentPageResponse(BaseModel):
+    documents: list[DocumentResponse]
+    next_cursor: uuid.UUID | None = None
+
+
+@bp.route("/<uuid:batch_id>/documents", methods=["GET"])
+@validate_querystring(DocumentPageQuery)
+@validate_response(DocumentPageResponse, 200)
+async def list_documents(batch_id: uuid.UUID, query_args: DocumentPageQuery) -> tuple:
+    """One page of the batch's documents, pass ``next_cursor`` back as ``after`` for the next one."""
+    documents = await Document.get_documents_page(
+        batch_id, query_args.after, query_args.limit + 1, columns=tuple(DocumentResponse.model_fields)
+    )
+    next_cursor = documents[query_args.limit - 1].id if len(documents) > query_args.limit else None
+    page = [
+        DocumentResponse.model_validate(document, from_attributes=True) for document in documents[: query_args.limit]
+    ]
+    return DocumentPageResponse(documents=page, next_cursor=next_cursor), 200
+
+
+@bp.route("/<uuid:batch_id>/documents.ndjson", methods=["GET"])
+async def stream_documents(batch_id: uuid.UUID) -> tuple:
+    """Every document of the batch, one JSON object per line, streamed as the rows are read."""
+
+    async def lines() -> AsyncIterator[bytes]:
+        async with aclosing(Document.stream_documents_by_batch_id(batch_id, *DocumentResponse.model_fields)) as rows:
+            async for row in rows:
+                yield DocumentResponse.model_validate(dict(row)).model_dump_json().encode() + b"\n"
+
+    # the rows are read after the headers went out, their queries are reported by /sql-stats only
+    return db.record_stream(lines()), 200, {"Content-Type": "application/x-ndjson", "Cache-Control": "no-store"}
@@ -0,0 +1,83 @@
+import logging
+import uuid
+
+from pydantic import BaseModel, Field, PositiveInt
+from quart import Blueprint, current_app, request, url_for
+from quart_schema import validate_request, validate_response
+
+from library.extensions import pdf_loader
+from service.upload_service import UploadService, UploadSessionError
+
+bp = Blueprint("upload_sessions", __name__, url_prefix="/sessions")
+
+logger = logging.getLogger(__name__)
+
+
+class CreateSessionReqst(BaseModel):
+    batch_id: uuid.UUID
+    filename: str
+    upload_length: PositiveInt
+    content_hash: str | None = Field(default=None, pattern="^[0-9a-f]{64}$")
+
+
+class SessionResponse(BaseModel):
+    id: uuid.UUID
+    batch_id: uuid.UUID
+    filename: str
+    upload_length: int
+    upload_offset: int
+    status: str
+    content_hash: str | None = None
+    document_id: uuid.UUID | None = None
+
+
+class ErrorResponse(BaseModel):
+    error: str
+
+
+def _offset_headers(upload_offset: int, upload_length: int) -> dict[str, str]:
+    return {"Upload-Offset": str(upload_offset), "Upload-Length": str(upload_length), "Cache-Control": "no-store"}
+
+
+@bp.errorhandler(UploadSessionError)
+async def upload_session_error(e: UploadSessionError) -> tuple:
+    logger.error(f"Upload session error {e.message}")
+    return ErrorResponse(error=e.message), e.status_code
+
+
+@bp.route("/", methods=["POST"])
+@validate_request(CreateSessionReqst)
+@validate_response(SessionResponse, 201)
+async def create_session(data: CreateSessionReqst) -> tuple:
+    if data.upload_length > current_app.config.get("UPLOADS_SESSION_MAX_LENGTH", 2147483648):
+        return ErrorResponse(error="The uploaded file is too large. Please reduce the file size."), 413
+    if not pdf_loader.file_allowed(pdf_loader.get_basename(data.filename)):
+        return ErrorResponse(error=f"File type not allowed: {data.filename}"), 415
+    upload = await UploadService.create_session(data.batch_id, data.filename, data.upload_length, data.content_hash)
+    headers = _offset_headers(0, upload.upload_length)
+    headers["Location"] = url_for(".get_session", upload_id=upload.id)
+    return SessionResponse.model_validate(upload, from_attributes=True), 201, headers
+
+
+@bp.route("/<uuid:upload_id>", methods=["HEAD"])
+async def get_offset(upload_id: uuid.UUID) -> tuple:
+    upload = await UploadService.get_session(upload_id)
+    return "", 200, _offset_headers(upload.upload_offset, upload.upload_length)
+
+
+@bp.route("/<uuid:upload_id>", methods=["GET"])
+@validate_response(SessionResponse, 200)
+async def get_session(upload_id: uuid.UUID) -> tuple:
+    upload = await UploadService.get_session(upload_id)
+    return SessionResponse.model_validate(upload, from_attributes=True), 200
+
+
+@bp.route("/<uuid:upload_id>", methods=["PATCH"])
+async def patch_session(upload_id: uuid.UUID) -> tuple:
+    if request.mimetype != "application/offset+octet-stream":
+        return ErrorResponse(error="Content-Type must be application/offset+octet-stream."), 415
+    offset = request.headers.get("Upload-Offset", "")
+    if not offset.isdigit():
+        return ErrorResponse(error="A non negative Upload-Offset header is required."), 400
+    upload = await UploadService.write_chunk(upload_id, int(offset))
+    return "", 204, _offset_headers(upload.upload_offset, upload.upload_length)
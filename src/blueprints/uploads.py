@@ -1,56 +1,110 @@
 import asyncio
 import logging
-from typing import List, Self
+import uuid
 
-from pydantic import BaseModel, model_validator
-from pydantic.dataclasses import dataclass
-from quart import Blueprint, current_app, request
-from quart_schema import DataSource, validate_request, validate_response
+from pydantic import BaseModel
+from quart import Blueprint, request
+from quart_schema import DataSource, document_request, validate_response
 from quart_schema.pydantic import File
+from quart_uploads import UploadNotAllowed
 
-from library.extensions import pdf_loader
+from database.models import Document
+from library.extensions import pdf_blobs, pdf_loader, stream_multipart
+from service.upload_service import UploadService, UploadSessionError
+
+from .upload_sessions import bp as upload_sessions_bp
 
 bp = Blueprint("uploads", __name__, url_prefix="/uploads")
+bp.register_blueprint(upload_sessions_bp)
 
 logger = logging.getLogger(__name__)
 
 
 class UploadReqst(BaseModel):
-    passwords: list[str]
+    batch_id: uuid.UUID
+    passwords: list[str] = []
+    # sent before the documents, the n-th hash declares the n-th document; stored ones are not written again
+    content_hashes: list[str] = []
     documents: list[File]
 
 
+class UploadedDocument(BaseModel):
+    document_id: uuid.UUID
+    filename: str
+    content_hash: str
+    size: int
+    duplicate: bool
+
+
 class UploadResponse(BaseModel):
     message: str
+    documents: list[UploadedDocument] = []
 
 
 class ErrorResponse(BaseModel):
     error: str
 
 
-# Kept for Deubing purpose only
+# Kept for Deubing purpose only, logs metadata so the body stays unread until the view streams it
 @bp.before_request
-async def log_request():
+async def log_request() -> None:
     if request.method == "POST":
-        form_data = await request.form
-        logger.debug(f"Received form data: {form_data}")
-        # Don't use this in production, just for debugging
-        files = await request.files
-        logger.debug(f"Received files: {files}")
+        logger.debug(f"Received {request.mimetype} body, content length: {request.content_length}")
 
 
 @bp.route("/", methods=["POST"])
-@validate_request(UploadReqst, source=DataSource.FORM_MULTIPART)
+@document_request(UploadReqst, source=DataSource.FORM_MULTIPART)
 @validate_response(UploadResponse, 201)
-async def post(data: UploadReqst) -> tuple:
-    logger.info(f"Total No of documents uploaded {len(data.documents)} ")
-    uploads_list = []
-    for data_item in data.documents:
-        logger.info(f"File name: {data_item.filename}")
-        uploads_list.append(pdf_loader.save(data_item, name=data_item.filename))
-    saved_list = await asyncio.gather(*uploads_list)
-    logger.info(f"Saved list: {len(saved_list)}")
-    return UploadResponse(message=f"Saved list: {len(saved_list)}"), 201
+async def post() -> tuple:
+    try:
+        form = await stream_multipart(pdf_loader, store=pdf_blobs, hashes_field="content_hashes")
+    except UploadNotAllowed as e:
+        logger.error(f"Upload not allowed {e}")
+        return ErrorResponse(error=f"File type not allowed: {e}"), 415
+    documents = form.files_for("documents")
+    if not documents:
+        return ErrorResponse(error="No documents were uploaded."), 400
+    try:
+        batch_id = uuid.UUID(form.getlist("batch_id")[0])
+    except (IndexError, ValueError):
+        return ErrorResponse(error="A valid batch_id is required."), 400
+    logger.info(f"Total No of documents uploaded {len(documents)} ")
+    # the blobs stay unreferenced, and are swept, when the batch does not exist
+    document_ids = await UploadService.register_files(batch_id, documents, form.getlist("passwords"))
+    uploaded = []
+    for document_id, document in zip(document_ids, documents, strict=True):
+        logger.debug(f"File name: {document.filename}, blob: {document.content_hash}, duplicate: {document.duplicate}")
+        uploaded.append(
+            UploadedDocument(
+                document_id=document_id,
+                filename=document.filename,
+                content_hash=document.content_hash,
+                size=document.size,
+                duplicate=document.duplicate,
+            )
+        )
+    duplicates = sum(document.duplicate for document in uploaded)
+    logger.info(f"Saved list: {len(uploaded)}, already stored: {duplicates}")
+    return UploadResponse(message=f"Saved list: {len(uploaded)}", documents=uploaded), 201
+
+
+@bp.route("/blobs/<content_hash>", methods=["HEAD"])
+async def blob_exists(content_hash: str) -> tuple:
+    """
+    Lets clients declare, rather than write, a file whose SHA-256 is already stored.
+
+    Only blobs a document points at are reported, an unreferenced one may be swept at any time.
+    """
+    if len(content_hash) != 64 or not all(c in "0123456789abcdef" for c in content_hash):  # noqa: PLR2004
+        return "", 400
+    found = await asyncio.to_thread(pdf_blobs.exists, content_hash)
+    return "", 200 if found and await Document.referenced_hashes([content_hash]) else 404
+
+
+@bp.errorhandler(UploadSessionError)
+async def upload_error(e: UploadSessionError) -> tuple:
+    logger.error(f"Upload error {e.message}")
+    return ErrorResponse(error=e.message), e.status_code
 
 
 @bp.errorhandler(413)
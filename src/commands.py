@@ -1,4 +1,6 @@
 import asyncio
+import uuid
+from pathlib import Path
 
 import click
 
@@ -42,3 +44,143 @@ def create_user(
     loop = asyncio.get_event_loop()
     account = loop.run_until_complete(AccountService.create_account(email, password, name, language, timezone))
     click.echo(click.style(f"User created: {account.email}", fg="green"))
+
+
+@click.command("run-worker")
+@click.option("--queue", default=None, help="Queue to claim jobs from, default: JOBS_QUEUE.")
+@click.option("--concurrency", type=int, default=None, help="Jobs run at once, default: JOBS_CONCURRENCY.")
+@click.option("--poll-interval", type=float, default=None, help="Idle poll interval in seconds.")
+@click.option("--visibility-timeout", type=int, default=None, help="Lease duration of a claimed job in seconds.")
+@click.pass_context
+def run_worker(
+    ctx: click.Context,
+    queue: str | None = None,
+    concurrency: int | None = None,
+    poll_interval: float | None = None,
+    visibility_timeout: int | None = None,
+) -> None:
+    """Run queued background jobs until interrupted."""
+    import signal
+
+    from quart.cli import ScriptInfo
+
+    from database.base import db
+    from service.job_service import JobWorker
+
+    app = ctx.ensure_object(ScriptInfo).load_app()
+    worker = JobWorker(
+        app,
+        queue=queue or app.config.get("JOBS_QUEUE", "default"),
+        concurrency=concurrency or app.config.get("JOBS_CONCURRENCY", 4),
+        poll_interval=poll_interval or app.config.get("JOBS_POLL_INTERVAL", 1.0),
+        visibility_timeout=visibility_timeout or app.config.get("JOBS_VISIBILITY_TIMEOUT", 300),
+        backoff_base=app.config.get("JOBS_BACKOFF_BASE", 5.0),
+        backoff_max=app.config.get("JOBS_BACKOFF_MAX", 600.0),
+    )
+
+    async def _run() -> None:
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, worker.stop)
+        await db.warm_up()
+        try:
+            await worker.run()
+        finally:
+            await db.drain()
+
+    click.echo(f"Worker {worker.worker_id} started, press CTRL+C to stop")
+    asyncio.run(_run())
+
+
+@click.command("rebalance-tenant")
+@click.argument("tenant_id", type=click.UUID)
+@click.option("--to", "target", required=True, help="Name of the shard to move the tenant to.")
+@click.option("--from", "source", default=None, help="Name of the shard the tenant is on, default: its mapped shard.")
+@click.option("--batch-size", type=int, default=1000, help="Rows copied per round trip.")
+@click.option("--delete-source", is_flag=True, help="Delete the tenant's rows from the source shard once copied.")
+@click.pass_context
+def rebalance_tenant(  # noqa: PLR0913, PLR0917
+    ctx: click.Context,
+    tenant_id: uuid.UUID,
+    target: str,
+    source: str | None = None,
+    batch_size: int = 1000,
+    delete_source: bool = False,
+) -> None:
+    """Copy a tenant's rows from one database shard to another."""
+    from quart.cli import ScriptInfo
+
+    from database.base import db
+
+    ctx.ensure_object(ScriptInfo).load_app()
+    source = source or db.shard_for(tenant_id)
+    if source == target:
+        click.echo(click.style(f"Tenant {tenant_id} is already on shard {target}.", fg="yellow"))
+        return
+    if not {source, target} <= db.shards.keys():
+        click.echo(click.style(f"Unknown shard, configured shards: {', '.join(db.shards)}", fg="red"))
+        return
+
+    async def _run() -> None:
+        try:
+            copied = await db.copy_tenant(tenant_id, source, target, batch_size=batch_size)
+            for table, count in copied.items():
+                click.echo(f"  {table}: {count} rows copied")
+            if delete_source:
+                deleted = await db.delete_tenant(tenant_id, source)
+                click.echo(f"  {sum(deleted.values())} rows deleted from {source}")
+        finally:
+            await db.drain()
+
+    click.echo(f"Copying tenant {tenant_id} from {source} to {target}")
+    asyncio.run(_run())
+    click.echo(
+        click.style(f"Done, map {tenant_id} to {target} in SQLALCHEMY_SHARD_MAP to serve it from there.", fg="green")
+    )
+
+
+@click.command("import-users")
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--format", "format_", type=click.Choice(["csv", "jsonl"]), default=None, help="Default: by extension.")
+@click.option("--chunk-size", type=int, default=500, help="Accounts hashed and inserted together.")
+@click.option("--language", default="en-US", help="Language of the accounts without one.")
+@click.option("--timezone", default="UTC", help="Timezone of the accounts without one.")
+@click.pass_context
+def import_users(  # noqa: PLR0913, PLR0917
+    ctx: click.Context,
+    source: Path,
+    format_: str | None = None,
+    chunk_size: int = 500,
+    language: str = "en-US",
+    timezone: str = "UTC",
+) -> None:
+    """Create accounts from a CSV or JSON lines file of email, password, name, language, timezone."""
+    import csv
+    import json
+
+    from quart.cli import ScriptInfo
+
+    from database.base import db
+    from library.extensions.password_hasher_extn import password_hasher
+    from service.account_service import AccountService
+
+    app = ctx.ensure_object(ScriptInfo).load_app()
+    format_ = format_ or ("jsonl" if source.suffix.lower() in {".jsonl", ".ndjson"} else "csv")
+
+    async def _run() -> None:
+        with source.open(newline="", encoding="utf-8") as file:
+            records = csv.DictReader(file) if format_ == "csv" else (json.loads(line) for line in file if line.strip())
+            try:
+                async with app.app_context():
+                    async for progress in AccountService.import_accounts(records, chunk_size, language, timezone):
+                        click.echo(
+                            f"  read {progress.read}, created {progress.created}, skipped {progress.skipped},"
+                            f" invalid {progress.invalid}, {progress.rate:.0f} records/s"
+                        )
+            finally:
+                await password_hasher.close()
+                await db.drain()
+
+    click.echo(f"Importing accounts from {source} ({format_})")
+    asyncio.run(_run())
+    click.echo(click.style("Import finished.", fg="green"))
@@ -1,6 +1,6 @@
-from typing import Any
+from typing import Any, Literal
 
-from pydantic import Field, NonNegativeInt, PositiveInt, SecretStr, computed_field
+from pydantic import Field, NonNegativeFloat, NonNegativeInt, PositiveFloat, PositiveInt, SecretStr, computed_field
 from pydantic_settings import BaseSettings
 from sqlalchemy import URL
 from sqlalchemy.util import immutabledict
@@ -67,6 +67,130 @@ class DatabaseConfig(BaseSettings):
         default=False,
     )
 
+    SQLALCHEMY_POOL_MIN_CONNECTIONS: NonNegativeInt = Field(
+        description="Connections opened in every pool before the app starts serving, capped at the pool size.",
+        default=4,
+    )
+
+    SQLALCHEMY_WARMUP_QUERIES: list[str] = Field(
+        description="Read-only statements run on every warmed up connection, e.g. to prime server side caches.",
+        default=[],
+    )
+
+    SQLALCHEMY_DRAIN_TIMEOUT: NonNegativeFloat = Field(
+        description="Seconds to wait at shutdown for checked out connections before the pools are disposed.",
+        default=10.0,
+    )
+
+    SQLALCHEMY_REPLICA_URIS: list[str] = Field(
+        description="SQLAlchemy URIs of read replicas, read-only statements are spread over them.",
+        default_factory=list,
+    )
+
+    SQLALCHEMY_REPLICA_STRATEGY: Literal["round_robin", "least_busy"] = Field(
+        description="How a replica is picked for a read: in turn, or the one with the fewest checked out connections.",
+        default="round_robin",
+    )
+
+    SQLALCHEMY_REPLICA_MAX_LAG: NonNegativeFloat = Field(
+        description=(
+            "Seconds of replication lag after which a replica stops serving reads. "
+            "Only PostgreSQL replicas report their lag, the others are only checked for being reachable."
+        ),
+        default=5.0,
+    )
+
+    SQLALCHEMY_REPLICA_CHECK_INTERVAL: PositiveFloat = Field(
+        description="Seconds between two replication lag checks.",
+        default=10.0,
+    )
+
+    SQLALCHEMY_SHARD_URIS: dict[str, str] = Field(
+        description="SQLAlchemy URIs of tenant shards by name, the primary database is the shard named default.",
+        default_factory=dict,
+    )
+
+    SQLALCHEMY_SHARD_MAP: dict[str, str] = Field(
+        description="Shard name of explicitly placed tenants, by tenant id.",
+        default_factory=dict,
+    )
+
+    SQLALCHEMY_SHARD_STRATEGY: Literal["map", "hash"] = Field(
+        description="Where tenants missing from SQLALCHEMY_SHARD_MAP go: the default shard, or a consistent hash ring.",
+        default="map",
+    )
+
+    SQLALCHEMY_SHARDED_TABLES: list[str] = Field(
+        description="Tables holding per tenant rows, with a tenant_id column, that live on the shards.",
+        default_factory=lambda: ["datasets"],
+    )
+
+    SQLALCHEMY_TENANT_HEADER: str = Field(
+        description="Request header carrying the tenant id, used when the route has no tenant_id argument.",
+        default="X-Tenant-Id",
+    )
+
+    SQLITE_PRODUCTION_MODE: bool = Field(
+        description="Tune a file based SQLite database for concurrent load: pragmas, one writer, a read pool.",
+        default=False,
+    )
+
+    SQLITE_JOURNAL_MODE: str = Field(
+        description="SQLite journal_mode pragma in production mode.",
+        default="WAL",
+    )
+
+    SQLITE_SYNCHRONOUS: str = Field(
+        description="SQLite synchronous pragma in production mode.",
+        default="NORMAL",
+    )
+
+    SQLITE_MMAP_SIZE: NonNegativeInt = Field(
+        description="Bytes of the SQLite database file memory mapped in production mode.",
+        default=268435456,
+    )
+
+    SQLITE_CACHE_SIZE: int = Field(
+        description="SQLite cache_size pragma, negative values are KiB, in production mode.",
+        default=-65536,
+    )
+
+    SQLITE_BUSY_TIMEOUT: NonNegativeInt = Field(
+        description="Milliseconds SQLite waits for a lock held by another process before failing.",
+        default=5000,
+    )
+
+    SQLITE_READ_POOL_SIZE: PositiveInt = Field(
+        description="Number of read-only SQLite connections in production mode.",
+        default=8,
+    )
+
+    SQLITE_WRITE_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of queued writes group committed in one SQLite transaction. Every model write "
+        "goes through db.run_write and so through this queue in production mode.",
+        default=64,
+    )
+
+    SQLALCHEMY_RECORD_QUERIES: bool = Field(
+        description="Record per-request query counts and timings, reported in the Server-Timing header.",
+        default=True,
+    )
+
+    SQLALCHEMY_SLOW_QUERY_MS: NonNegativeFloat = Field(
+        description="Statements running at least this many milliseconds are logged as slow.",
+        default=200,
+    )
+
+    SQLALCHEMY_N_PLUS_ONE_THRESHOLD: PositiveInt = Field(
+        description="Number of repeats of one SELECT shape within a request logged as a likely N+1.",
+        default=5,
+    )
+
+    SQLALCHEMY_SLOWEST_PER_REQUEST: NonNegativeInt = Field(
+        description="Number of slowest statements kept in the summary of each request.",
+        default=5,
+    )
+
     @property
     def is_sqlite(self) -> bool:
         return "sqlite" in self.DB_TYPE.lower()
@@ -1,5 +1,21 @@
+from .entity_cache_conf import EntityCacheConfig
+from .extraction_conf import ExtractionConfig
+from .housekeeping_conf import HousekeepingConfig
+from .jobs_conf import JobsConfig
+from .message_catalogue_conf import MessageCatalogueConfig
+from .password_hash_conf import PasswordHashConfig
+from .session_token_conf import SessionTokenConfig
 from .uploads_conf import UploadConfig
 
 
-class FeatureConfig(UploadConfig):
+class FeatureConfig(
+    UploadConfig,
+    ExtractionConfig,
+    HousekeepingConfig,
+    JobsConfig,
+    EntityCacheConfig,
+    MessageCatalogueConfig,
+    PasswordHashConfig,
+    SessionTokenConfig,
+):
     pass
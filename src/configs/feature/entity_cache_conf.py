@@ -0,0 +1,22 @@
+from typing import Literal
+
+from pydantic import Field, PositiveFloat, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class EntityCacheConfig(BaseSettings):
+    ENTITY_CACHE_ENABLED: bool = Field(description="Cache model lookups by primary key", default=True)
+    ENTITY_CACHE_BACKEND: Literal["memory", "redis"] = Field(
+        description="memory caches per process, redis shares entries and invalidations between processes",
+        default="memory",
+    )
+    ENTITY_CACHE_TTL: PositiveFloat = Field(
+        description="Seconds an entity stays cached, bounds staleness from writes made by other processes",
+        default=10.0,
+    )
+    ENTITY_CACHE_MAX_ENTRIES: PositiveInt = Field(
+        description="Entities kept by the memory backend before the least recently used are evicted", default=10000
+    )
+    ENTITY_CACHE_REDIS_URL: str = Field(
+        description="Server of the redis backend, any Redis compatible server", default="redis://localhost:6379/0"
+    )
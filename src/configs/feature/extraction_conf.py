@@ -0,0 +1,29 @@
+from typing import Optional
+
+from pydantic import Field, NonNegativeInt, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class ExtractionConfig(BaseSettings):
+    POPPLER_PATH: Optional[str] = Field(
+        description="Directory holding the poppler binaries (pdftotext, pdfinfo) and qpdf, which decrypts "
+        "password protected documents, defaults to PATH",
+        default=None,
+    )
+    EXTRACTION_WORKERS: NonNegativeInt = Field(
+        description="Maximum number of poppler processes running at once, 0 means one per CPU", default=0
+    )
+    EXTRACTION_PAGES_PER_TASK: PositiveInt = Field(
+        description="Number of pages handed to a single pdftotext process", default=8
+    )
+    EXTRACTION_TIMEOUT: PositiveInt = Field(
+        description="Seconds a single pdftotext process may run before it is killed", default=120
+    )
+    EXTRACTION_LAYOUT: bool = Field(description="Keep the physical page layout in extracted text", default=True)
+    TEXT_CACHE_MEMORY_CHARS: PositiveInt = Field(
+        description="Characters of extracted text kept in the in-memory cache", default=67108864
+    )
+    TEXT_CACHE_DISK_BYTES: PositiveInt = Field(
+        description="Bytes of compressed extracted text kept on disk before the least recently used is evicted",
+        default=1073741824,
+    )
@@ -0,0 +1,23 @@
+from pydantic import Field, NonNegativeFloat, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class HousekeepingConfig(BaseSettings):
+    HOUSEKEEPING_INTERVAL: PositiveInt = Field(description="Seconds between two housekeeping sweeps", default=600)
+    HOUSEKEEPING_TTL: PositiveInt = Field(
+        description="Seconds after which abandoned uploads and temporary files are removed", default=86400
+    )
+    HOUSEKEEPING_ORPHAN_BLOB_TTL: PositiveInt = Field(
+        description="Seconds after its last upload before a stored blob no document refers to is removed",
+        default=86400,
+    )
+    HOUSEKEEPING_TEMP_DIRS: list[str] = Field(
+        description="Temporary directories swept by the housekeeping service", default_factory=list
+    )
+    HOUSEKEEPING_TEMP_QUOTA: PositiveInt = Field(
+        description="Maximum bytes kept in each temporary directory, oldest entries are removed first",
+        default=1073741824,
+    )
+    HOUSEKEEPING_DELETE_PAUSE: NonNegativeFloat = Field(
+        description="Seconds to pause between two deletions so a sweep does not starve request I/O", default=0.05
+    )
@@ -0,0 +1,19 @@
+from pydantic import Field, PositiveFloat, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class JobsConfig(BaseSettings):
+    JOBS_QUEUE: str = Field(description="Queue a worker claims jobs from", default="default")
+    JOBS_CONCURRENCY: PositiveInt = Field(description="Jobs a single worker process runs at once", default=4)
+    JOBS_POLL_INTERVAL: PositiveFloat = Field(
+        description="Seconds an idle worker waits before polling again", default=1.0
+    )
+    JOBS_VISIBILITY_TIMEOUT: PositiveInt = Field(
+        description="Seconds a claimed job stays leased without a heartbeat before another worker may take it",
+        default=300,
+    )
+    JOBS_MAX_ATTEMPTS: PositiveInt = Field(description="Runs of a job before it is given up as dead", default=5)
+    JOBS_BACKOFF_BASE: PositiveFloat = Field(
+        description="Seconds before the first retry of a failed job, doubled on every further failure", default=5.0
+    )
+    JOBS_BACKOFF_MAX: PositiveFloat = Field(description="Upper bound of the retry delay in seconds", default=600.0)
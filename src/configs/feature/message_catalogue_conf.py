@@ -0,0 +1,17 @@
+from pydantic import Field, PositiveFloat
+from pydantic_settings import BaseSettings
+
+
+class MessageCatalogueConfig(BaseSettings):
+    MESSAGE_CATALOGUE_PRELOAD: bool = Field(
+        description="Load the message catalogue before serving and keep it refreshed in the background", default=True
+    )
+    MESSAGE_CATALOGUE_LANGUAGES: list[str] = Field(
+        description="Languages kept in memory, all of them when empty", default_factory=list
+    )
+    MESSAGE_CATALOGUE_FALLBACK_LANGUAGE: str = Field(
+        description="Language used for messages missing from the requested language", default="en-US"
+    )
+    MESSAGE_CATALOGUE_REFRESH_INTERVAL: PositiveFloat = Field(
+        description="Seconds between two reads of the messages changed since the cached version", default=30.0
+    )
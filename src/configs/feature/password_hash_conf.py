@@ -0,0 +1,29 @@
+from typing import Literal
+
+from pydantic import Field, NonNegativeInt, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class PasswordHashConfig(BaseSettings):
+    PASSWORD_HASH_ALGORITHM: Literal["pbkdf2_sha256", "scrypt"] = Field(
+        description="Key derivation of new password hashes, older hashes are upgraded at the next sign-in",
+        default="pbkdf2_sha256",
+    )
+    PASSWORD_HASH_ITERATIONS: PositiveInt = Field(description="Iterations of pbkdf2_sha256", default=600000)
+    PASSWORD_HASH_SCRYPT_N: PositiveInt = Field(
+        description="CPU and memory cost of scrypt, a power of 2", default=16384
+    )
+    PASSWORD_HASH_SCRYPT_R: PositiveInt = Field(description="Block size of scrypt", default=8)
+    PASSWORD_HASH_SCRYPT_P: PositiveInt = Field(description="Parallelization of scrypt", default=1)
+    PASSWORD_HASH_EXECUTOR: Literal["process", "thread"] = Field(
+        description="Where derivations run, off the event loop either way", default="process"
+    )
+    PASSWORD_HASH_WORKERS: NonNegativeInt = Field(
+        description="Maximum number of derivations running at once, 0 means one per CPU", default=0
+    )
+    PASSWORD_HASH_QUEUE_SIZE: PositiveInt = Field(
+        description="Maximum number of derivations waiting for a worker before requests get a 503", default=256
+    )
+    PASSWORD_HASH_RETRY_AFTER: PositiveInt = Field(
+        description="Seconds sent in the Retry-After header when the hashing queue is full", default=2
+    )
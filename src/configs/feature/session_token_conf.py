@@ -0,0 +1,20 @@
+from pydantic import Field, PositiveFloat, PositiveInt, SecretStr
+from pydantic_settings import BaseSettings
+
+
+class SessionTokenConfig(BaseSettings):
+    SESSION_TOKEN_SECRET: SecretStr = Field(
+        description="Key signing session tokens, shared by every worker; a random per process key when empty",
+        default=SecretStr(""),
+    )
+    SESSION_TOKEN_TTL: PositiveInt = Field(description="Seconds a session token stays valid", default=86400)
+    SESSION_TOKEN_CACHE_TTL: PositiveFloat = Field(
+        description="Seconds a validated token is trusted without a database check, bounds revocation delay",
+        default=60.0,
+    )
+    SESSION_TOKEN_CACHE_MAX_ENTRIES: PositiveInt = Field(
+        description="Validated tokens cached per process before the least recently used are evicted", default=10000
+    )
+    SESSION_ACTIVITY_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Seconds between two batched writes of the accounts' last_active_at", default=30.0
+    )
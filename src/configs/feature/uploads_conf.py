@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from pydantic import Field, field_validator
+from pydantic import Field, PositiveInt, field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +10,30 @@ class UploadConfig(BaseSettings):
         description="Allowed extensions for the uploaded files", default_factory=lambda: ["pdf", "PDF", "png", "PNG"]
     )
     CLEANUP_TEMP_FILES: bool = Field(description="Cleanup temporary files", default=True)
+    UPLOADS_STREAM_BUFFER_SIZE: PositiveInt = Field(
+        description="Bytes of an uploaded file held in memory before it is flushed to disk", default=1048576
+    )
+    UPLOADS_MAX_CONCURRENT_WRITES: PositiveInt = Field(
+        description="Maximum number of upload disk writes in flight across the worker", default=8
+    )
+    UPLOADS_MAX_WRITES_PER_REQUEST: PositiveInt = Field(
+        description="Maximum number of upload disk writes in flight for a single request", default=2
+    )
+    UPLOADS_WRITE_QUEUE_SIZE: PositiveInt = Field(
+        description="Maximum number of upload writes waiting for a slot before requests get a 503", default=64
+    )
+    UPLOADS_RETRY_AFTER: PositiveInt = Field(
+        description="Seconds sent in the Retry-After header when the upload queue is full", default=5
+    )
+    UPLOADS_BLOB_SHARD_DEPTH: PositiveInt = Field(
+        description="Number of two character hash prefix directories used to shard stored blobs", default=2
+    )
+    UPLOADS_SESSION_MAX_LENGTH: PositiveInt = Field(
+        description="Maximum size in bytes of a file uploaded through a resumable upload session", default=2147483648
+    )
+    UPLOADS_MAX_FIELD_SIZE: PositiveInt = Field(
+        description="Maximum size in bytes of a non-file multipart field", default=65536
+    )
 
     @field_validator("UPLOADS_DEFAULT_DEST", mode="before")
     @classmethod
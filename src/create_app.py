@@ -30,10 +30,12 @@ def _register_services(app: LLMOrchaX) -> None:
 def _register_blueprints(app: LLMOrchaX) -> None:
     from quart import Blueprint
 
-    from blueprints import bp
+    from blueprints import auth_bp, bp, documents_bp
 
     api_v1 = Blueprint("parent", __name__, url_prefix="/api/v1")
     api_v1.register_blueprint(bp)
+    api_v1.register_blueprint(documents_bp)
+    api_v1.register_blueprint(auth_bp)
 
     app.register_blueprint(api_v1)
     logging.info("Blueprints registration complete...")
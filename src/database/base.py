@@ -1,4 +1,7 @@
-from sqlalchemy import MetaData
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import ColumnElement, MetaData, Row, Select, select
 from sqlalchemy.orm import DeclarativeBase
 
 from library.extensions.database_extn import SqlAlchemy
@@ -15,5 +18,45 @@ POSTGRES_INDEXES_NAMING_CONVENTION = {
 class Base(DeclarativeBase):
     metadata = MetaData(naming_convention=POSTGRES_INDEXES_NAMING_CONVENTION)
 
+    @classmethod
+    def projection(cls, *columns: str) -> Select:
+        """
+        Select only the named columns of the model's table, all of them when none are named.
+
+        Executing the statement yields plain rows instead of model instances: they skip the
+        identity map and change tracking, and only carry the requested values.
+        """
+        table = cls.__table__
+        if not columns:
+            return select(table)
+        unknown = [name for name in columns if name not in table.c]
+        if unknown:
+            raise ValueError(f"{cls.__name__} has no column {', '.join(unknown)}")
+        return select(*(table.c[name] for name in columns))
+
+    @classmethod
+    async def project(
+        cls,
+        *columns: str,
+        where: Iterable[ColumnElement[bool]] = (),
+        order_by: Iterable[ColumnElement[Any]] = (),
+        limit: int | None = None,
+    ) -> list[Row[Any]]:
+        """
+        Read-only rows holding the named columns, for listings that do not need model instances.
+
+        Rows are immutable named tuples: ``row.name``, ``row[0]`` and ``row._mapping["name"]``.
+
+        :param columns: Names of the columns to select, all of them when empty.
+        :param where: Filter criteria, combined with AND.
+        :param order_by: Ordering criteria.
+        :param limit: Maximum number of rows to return.
+        :return: The matching rows.
+        """
+        stmt = cls.projection(*columns).where(*where).order_by(*order_by).limit(limit)
+        async with db.session() as session:
+            result = await session.execute(stmt)
+            return list(result.all())
+
 
 db = SqlAlchemy(model_class=Base)
@@ -1,12 +1,19 @@
 from .account import Account, AccountStatusEnum
 from .dataset import Dataset
-from .document import Document
+from .document import Document, DocumentBatch
+from .jobs import Job, JobStatusEnum
 from .messages import MessageCatalogue
+from .uploads import Uploads, UploadStatusEnum
 
 __all__ = (
     "Account",
     "AccountStatusEnum",
     "Dataset",
     "Document",
+    "DocumentBatch",
+    "Job",
+    "JobStatusEnum",
     "MessageCatalogue",
+    "UploadStatusEnum",
+    "Uploads",
 )
@@ -1,8 +1,12 @@
 import enum
+import ipaddress
 import uuid
+from collections.abc import Iterable, Mapping, Sequence
 from datetime import datetime
+from typing import Any
 
-from sqlalchemy import UUID, UniqueConstraint, func, text
+from sqlalchemy import UUID, Integer, Row, UniqueConstraint, bindparam, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql.sqltypes import DateTime, String
 
@@ -19,6 +23,20 @@ class AccountStatusEnum(enum.StrEnum):
     BLOCKED = "blocked"
 
 
+def normalise_ip(ip: str) -> str:
+    """
+    The compressed form of an address, IPv4 mapped IPv6 ones as IPv4 and without a zone index,
+    cut to the width of ``last_login_ip`` when it is not an address at all.
+    """
+    try:
+        address = ipaddress.ip_address(ip.partition("%")[0])
+    except ValueError:
+        return ip[:45]
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return str(address)
+
+
 class Account(db.Model):
     __tablename__ = "accounts"
 
@@ -27,13 +45,18 @@ class Account(db.Model):
     email: Mapped[str] = mapped_column(String(255), nullable=False)
     password: Mapped[str | None] = mapped_column(String(255), nullable=True)
     password_salt: Mapped[str] = mapped_column(String(255), nullable=True)
+    # key derivation of the password, see HashParams; NULL for the original pbkdf2 hashes
+    password_params: Mapped[str | None] = mapped_column(String(64), nullable=True)
     interface_language: Mapped[str] = mapped_column(String(16))
     interface_theme: Mapped[str] = mapped_column(String(16))
     timezone: Mapped[str] = mapped_column(String(16))
     last_login_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.current_timestamp())
-    last_login_ip: Mapped[str] = mapped_column(String(32))
+    # 45 characters fit any textual IPv6 address, IPv4 mapped ones included
+    last_login_ip: Mapped[str] = mapped_column(String(45))
     last_active_at: Mapped[str] = mapped_column(DateTime, nullable=False, server_default=func.current_timestamp())
     status: Mapped[str] = mapped_column(String(16), nullable=False, server_default=text("'active'"))
+    # bumped to revoke every session token issued to the account
+    token_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
     created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
     updated_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
 
@@ -42,3 +65,90 @@ class Account(db.Model):
     @property
     def is_password_set(self) -> bool:
         return self.password is not None
+
+    @classmethod
+    @staticmethod
+    def normalise_email(email: str) -> str:
+        """Emails are stored trimmed and lowercased, and looked up the same way."""
+        return email.strip().lower()
+
+    @classmethod
+    async def get_by_email(cls, email: str) -> "Account | None":
+        stmt = select(Account).where(Account.email == cls.normalise_email(email))
+        async with db.session() as session:
+            return (await session.execute(stmt)).scalar_one_or_none()
+
+    @classmethod
+    async def existing_emails(cls, emails: Iterable[str]) -> set[str]:
+        """The normalised ``emails`` already registered, see ``normalise_email``."""
+        stmt = select(Account.email).where(Account.email.in_({cls.normalise_email(email) for email in emails}))
+        async with db.session() as session:
+            return set((await session.scalars(stmt)).all())
+
+    @classmethod
+    async def add_accounts(cls, accounts: Sequence[Mapping[str, Any]]) -> int:
+        """
+        Insert accounts in bulk, leaving the account of an email already taken untouched.
+
+        :param accounts: Column values of the accounts, every account with the same keys.
+        :return: The number of accounts inserted on SQLite and Postgres. The MySQL drivers, which
+            connect with ``FOUND_ROWS``, count the untouched accounts too, and drivers that cannot
+            tell return -1, see :meth:`SqlAlchemy.bulk_upsert`.
+        """
+        return await db.bulk_upsert(Account, accounts, conflict=("email",), update=())
+
+    @classmethod
+    async def get_token_state(cls, account_id: uuid.UUID) -> Row[Any] | None:
+        """The ``token_version`` and ``status`` session tokens of the account are checked against."""
+        rows = await cls.project("token_version", "status", where=[cls.id == account_id])
+        return rows[0] if rows else None
+
+    @classmethod
+    async def record_login(cls, account_id: uuid.UUID, ip: str) -> None:
+        now = func.current_timestamp()
+        stmt = (
+            update(Account)
+            .where(Account.id == account_id)
+            .values(last_login_at=now, last_login_ip=normalise_ip(ip), last_active_at=now)
+        )
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(stmt)
+
+        await db.run_write(apply)
+
+    @classmethod
+    async def revoke_tokens(cls, account_id: uuid.UUID) -> int | None:
+        """
+        Invalidate every session token issued to the account so far.
+
+        :return: The new token version, None when the account does not exist.
+        """
+        bump = (
+            update(Account)
+            .where(Account.id == account_id)
+            .values(token_version=Account.token_version + 1, updated_at=func.current_timestamp())
+        )
+        # read back in the same transaction rather than with RETURNING, which MySQL lacks
+        read = select(Account.token_version).where(Account.id == account_id)
+
+        async def apply(session: AsyncSession) -> int | None:
+            if (await session.execute(bump)).rowcount == 0:
+                return None
+            return (await session.execute(read)).scalar_one()
+
+        return await db.run_write(apply)
+
+    @classmethod
+    async def touch_many(cls, seen: Mapping[uuid.UUID, datetime]) -> int:
+        """Set ``last_active_at`` of many accounts in one executemany round trip."""
+        if not seen:
+            return 0
+        table = cls.__table__
+        stmt = update(table).where(table.c.id == bindparam("account_id")).values(last_active_at=bindparam("seen_at"))
+        params = [{"account_id": account_id, "seen_at": seen_at} for account_id, seen_at in seen.items()]
+
+        async def apply(session: AsyncSession) -> int:
+            return (await session.execute(stmt, params)).rowcount
+
+        return await db.run_write(apply)
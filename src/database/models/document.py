@@ -2,13 +2,59 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, TypedDict
 
-from sqlalchemy import JSON, UUID, Boolean, Index, Integer, PrimaryKeyConstraint, func, text
+from sqlalchemy import (
+    JSON,
+    UUID,
+    Boolean,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    Row,
+    Update,
+    exists,
+    func,
+    insert,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql.sqltypes import DateTime, String, Text
 
 from database.base import db
+from library.extensions.entity_cache_extn import entity_cache
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Sequence
+
+    from sqlalchemy.engine import RowMapping
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class DocumentSpec(TypedDict, total=False):
+    """Column values of one document for the bulk registration APIs; ``name`` and ``extension`` are required."""
+
+    id: uuid.UUID
+    name: str
+    extension: str
+    password: str | None
+    process_rule_id: uuid.UUID | None
+    doc_type: str | None
+    doc_metadata: Dict[str, Any] | None
+    doc_language: str | None
+    content_hash: str | None
+    file_size: int | None
+
+
+# Rows per executemany INSERT. SQLAlchemy renders these as multi-row VALUES pages on
+# drivers that support it (asyncpg) and keeps each page under the parameter limit;
+# the statement itself is compiled once and cached, unlike an inline .values(rows).
+BULK_INSERT_CHUNK_SIZE = 500
+
+# Rows fetched per round trip when streaming a batch's documents.
+STREAM_CHUNK_SIZE = 1000
 
 
 class DocumentBatch(db.Model):
@@ -39,10 +85,100 @@ class DocumentBatch(db.Model):
             batch_size=batch_size,
             created_by=created_by,
         )
-        async with db.session() as session:
+
+        async def add(session: AsyncSession) -> DocumentBatch:
+            session.add(batch)
+            return batch
+
+        return await db.run_write(add)
+
+    @classmethod
+    async def register_batch(
+        cls,
+        batch_name: str,
+        created_by: uuid.UUID,
+        documents: Sequence[DocumentSpec],
+        chunk_size: int = BULK_INSERT_CHUNK_SIZE,
+    ) -> tuple[DocumentBatch, list[uuid.UUID]]:
+        """
+        Create a batch together with all of its documents in a single transaction.
+
+        :param batch_name: The name of the batch.
+        :param created_by: The account registering the batch and its documents.
+        :param documents: The documents to register.
+        :param chunk_size: Rows per multi-row INSERT statement.
+        :return: The created DocumentBatch and the generated document ids, in input order.
+        """
+        batch = DocumentBatch(id=uuid.uuid4(), batch_name=batch_name, batch_size=len(documents), created_by=created_by)
+
+        async def add(session: AsyncSession) -> list[uuid.UUID]:
             session.add(batch)
-            await session.commit()
-        return batch
+            await session.flush()
+            return await cls._insert_documents(session, batch.id, created_by, documents, chunk_size)
+
+        return batch, await db.run_write(add)
+
+    @classmethod
+    async def add_documents(
+        cls,
+        batch_id: uuid.UUID,
+        created_by: uuid.UUID,
+        documents: Sequence[DocumentSpec],
+        chunk_size: int = BULK_INSERT_CHUNK_SIZE,
+    ) -> list[uuid.UUID]:
+        """
+        Add documents to an existing batch in a single transaction and grow ``batch_size`` to match.
+
+        :param batch_id: The unique identifier for the batch.
+        :param created_by: The account registering the documents.
+        :param documents: The documents to register.
+        :param chunk_size: Rows per multi-row INSERT statement.
+        :return: The document ids, generated unless given, in input order.
+        """
+
+        async def apply(session: AsyncSession) -> list[uuid.UUID]:
+            # update first: on Postgres the row lock orders concurrent registrations into the same batch
+            result = await session.execute(
+                update(DocumentBatch)
+                .where(DocumentBatch.id == batch_id)
+                .values(batch_size=DocumentBatch.batch_size + len(documents), updated_at=func.current_timestamp())
+            )
+            if result.rowcount == 0:
+                raise ValueError(f"Batch {batch_id} not found")
+            return await cls._insert_documents(session, batch_id, created_by, documents, chunk_size)
+
+        document_ids = await db.run_write(apply)
+        await entity_cache.invalidate(entity_cache.key("DocumentBatch", batch_id))
+        return document_ids
+
+    @staticmethod
+    async def _insert_documents(
+        session: AsyncSession,
+        batch_id: uuid.UUID,
+        created_by: uuid.UUID,
+        documents: Sequence[DocumentSpec],
+        chunk_size: int,
+    ) -> list[uuid.UUID]:
+        rows = [
+            {
+                "id": spec.get("id") or uuid.uuid4(),
+                "batch_id": batch_id,
+                "created_by": created_by,
+                "name": spec["name"],
+                "extension": spec["extension"],
+                "password": spec.get("password"),
+                "process_rule_id": spec.get("process_rule_id"),
+                "doc_type": spec.get("doc_type"),
+                "doc_metadata": spec.get("doc_metadata"),
+                "doc_language": spec.get("doc_language"),
+                "content_hash": spec.get("content_hash"),
+                "file_size": spec.get("file_size"),
+            }
+            for spec in documents
+        ]
+        for start in range(0, len(rows), chunk_size):
+            await session.execute(insert(Document.__table__), rows[start : start + chunk_size])
+        return [row["id"] for row in rows]
 
     @classmethod
     async def get_batch_by_id(cls, batch_id: uuid.UUID) -> DocumentBatch | None:
@@ -50,12 +186,15 @@ class DocumentBatch(db.Model):
         Get a document batch by its ID.
 
         :param batch_id: The unique identifier for the batch.
-        :return: The DocumentBatch instance if found, otherwise None.
+        :return: The DocumentBatch instance if found, otherwise None. It may be shared through the entity
+            cache, treat it as read-only.
         """
-        async with db.session() as session:
-            batch = await session.get(DocumentBatch, batch_id)
-            await session.close()
-            return batch
+
+        async def load() -> DocumentBatch | None:
+            async with db.session() as session:
+                return await session.get(DocumentBatch, batch_id)
+
+        return await entity_cache.get_or_load(entity_cache.key("DocumentBatch", batch_id), load)
 
 
 class Document(db.Model):
@@ -72,12 +211,17 @@ class Document(db.Model):
     doc_type: Mapped[uuid.UUID] = mapped_column(String(40), nullable=True)
     doc_metadata: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=True)
     doc_language: Mapped[str] = mapped_column(String(255), nullable=True)
+    # sha256 of the stored blob, see library.extensions.blob_store_extn
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    file_size: Mapped[int] = mapped_column(Integer(), nullable=True)
 
     # start processing
     processing_started_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
 
     # parsing
     parsing_completed_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    parsing_failed_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    parsing_error: Mapped[str] = mapped_column(String(255), nullable=True)
 
     archived: Mapped[bool] = mapped_column(Boolean(), nullable=False, server_default=text("false"))
     archived_reason: Mapped[uuid.UUID] = mapped_column(String(255), nullable=True)
@@ -85,10 +229,14 @@ class Document(db.Model):
     archived_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
 
-    __table_args__ = (PrimaryKeyConstraint(id, name="document_pkey"), Index("document_batch_idx", (batch_id, id)))
+    __table_args__ = (
+        PrimaryKeyConstraint(id, name="document_pkey"),
+        Index("document_batch_idx", batch_id, id),
+        Index("document_content_hash_idx", content_hash),
+    )
 
     @classmethod
-    async def add_document(
+    async def add_document(  # noqa: PLR0913, PLR0917
         cls,
         batch_id: uuid.UUID,
         name: str,
@@ -99,14 +247,17 @@ class Document(db.Model):
         doc_type: str,
         doc_metadata: Dict[str, Any],
         doc_language: str,
+        *,
+        content_hash: str | None = None,
+        file_size: int | None = None,
     ) -> Document:
         """
-        Add a new document to the database.
+        Add a new document to the database and count it in its batch's ``batch_size``.
 
-        :param document_id: The unique identifier for the document.
         :param batch_id: The unique identifier for the batch.
         :param name: The name of the document.
         :param extension: The file extension of the document.
+        :param content_hash: The SHA-256 of the stored blob the document points at.
         :return: The created Document instance.
         """
         document = Document(
@@ -119,11 +270,20 @@ class Document(db.Model):
             doc_type=doc_type,
             doc_metadata=doc_metadata,
             doc_language=doc_language,
+            content_hash=content_hash,
+            file_size=file_size,
         )
-        async with db.session() as session:
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(
+                update(DocumentBatch)
+                .where(DocumentBatch.id == batch_id)
+                .values(batch_size=DocumentBatch.batch_size + 1, updated_at=func.current_timestamp())
+            )
             session.add(document)
-            await session.commit()
-            await session.close()
+
+        await db.run_write(apply)
+        await entity_cache.invalidate(entity_cache.key("DocumentBatch", batch_id))
         return document
 
     @classmethod
@@ -132,22 +292,248 @@ class Document(db.Model):
         Get a document by its ID.
 
         :param document_id: The unique identifier for the document.
-        :return: The Document instance if found, otherwise None.
+        :return: The Document instance if found, otherwise None. It may be shared through the entity
+            cache, treat it as read-only.
         """
-        async with db.session() as session:
-            document = await session.get(Document, document_id)
-            await session.close()
-            return document
+
+        async def load() -> Document | None:
+            async with db.session() as session:
+                return await session.get(Document, document_id)
+
+        return await entity_cache.get_or_load(entity_cache.key("Document", document_id), load)
 
     @classmethod
     async def get_documents_by_batch_id(cls, batch_id: uuid.UUID) -> list[Document]:
         """
         Get all documents by batch ID.
 
+        Loads the whole batch at once, prefer ``get_documents_page`` or ``stream_documents_by_batch_id``
+        for batches of unknown size.
+
         :param batch_id: The unique identifier for the batch.
         :return: A list of Document instances.
         """
         async with db.session() as session:
-            documents = await session.execute(db.select(Document).where(Document.batch_id == batch_id))
-            await session.close()
-            return documents.scalars().all()
+            documents = await session.scalars(select(Document).where(Document.batch_id == batch_id))
+            return list(documents.all())
+
+    @classmethod
+    async def get_documents_page(
+        cls,
+        batch_id: uuid.UUID,
+        after: uuid.UUID | None = None,
+        limit: int = 100,
+        columns: Sequence[str] = (),
+    ) -> list[Document] | list[Row[Any]]:
+        """
+        Get one page of a batch's documents in id order, using keyset pagination.
+
+        The ``(batch_id, id)`` index ``document_batch_idx`` serves both the filter and the order,
+        so each page is an index range scan starting at ``after`` whatever its position in the
+        batch, unlike an OFFSET that reads and discards every preceding row.
+
+        :param batch_id: The unique identifier for the batch.
+        :param after: The id of the last document of the previous page, None for the first page.
+        :param limit: Maximum number of documents to return.
+        :param columns: When given, return read-only rows of these columns instead of Document instances.
+        :return: A list of Document instances, or of rows.
+        """
+        stmt = cls.projection(*columns) if columns else select(Document)
+        stmt = stmt.where(Document.batch_id == batch_id).order_by(Document.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(Document.id > after)
+        async with db.session() as session:
+            result = await session.execute(stmt)
+            return list(result.all()) if columns else list(result.scalars().all())
+
+    @classmethod
+    async def stream_documents_by_batch_id(
+        cls, batch_id: uuid.UUID, *columns: str, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncIterator[RowMapping]:
+        """
+        Stream a batch's documents in id order as plain rows, ``chunk_size`` rows at a time.
+
+        Rows come from a server side cursor and are not added to the session's identity map, so
+        memory stays constant whatever the size of the batch. The session is held until the
+        iterator is exhausted or closed.
+
+        :param batch_id: The unique identifier for the batch.
+        :param columns: Names of the columns to select, all of them when empty.
+        :param chunk_size: Rows fetched from the cursor per round trip.
+        """
+        stmt = (
+            cls.projection(*columns)
+            .where(Document.batch_id == batch_id)
+            .order_by(Document.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async with db.session() as session:
+            result = await session.stream(stmt)
+            async for row in result.mappings():
+                yield row
+
+    @classmethod
+    async def get_processed_document_by_hash(cls, content_hash: str) -> Document | None:
+        """
+        Get an already parsed document with the same content, so a duplicate upload can reuse its results.
+
+        :param content_hash: The SHA-256 of the stored blob.
+        :return: The most recently parsed Document with that hash if any, otherwise None.
+        """
+        async with db.session() as session:
+            stmt = (
+                select(Document)
+                .where(Document.content_hash == content_hash, Document.parsing_completed_at.is_not(None))
+                .order_by(Document.parsing_completed_at.desc())
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            return result.scalars().first()
+
+    @classmethod
+    async def referenced_hashes(cls, content_hashes: Sequence[str]) -> set[str]:
+        """
+        The blobs among ``content_hashes`` that at least one document points at.
+
+        :param content_hashes: SHA-256 of stored blobs, looked up ``BULK_INSERT_CHUNK_SIZE`` at a time.
+        :return: The referenced hashes.
+        """
+        referenced: set[str] = set()
+        async with db.session() as session:
+            for start in range(0, len(content_hashes), BULK_INSERT_CHUNK_SIZE):
+                chunk = content_hashes[start : start + BULK_INSERT_CHUNK_SIZE]
+                stmt = select(Document.content_hash).where(Document.content_hash.in_(chunk)).distinct()
+                referenced.update((await session.scalars(stmt)).all())
+        return referenced
+
+    @classmethod
+    async def reuse_results(cls, document_id: uuid.UUID, batch_id: uuid.UUID, source: Document) -> None:
+        """
+        Give a document the parsing results of ``source``, an already parsed document with the same content.
+
+        The document is stamped as processed and parsed without being extracted again, its text is
+        served by the text cache under the shared content hash.
+
+        :param document_id: The unique identifier for the document.
+        :param batch_id: The unique identifier for the document's batch.
+        :param source: The parsed document, see ``get_processed_document_by_hash``.
+        """
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(
+                update(Document)
+                .where(Document.id == document_id)
+                .values(
+                    doc_type=source.doc_type,
+                    doc_language=source.doc_language,
+                    doc_metadata=source.doc_metadata,
+                    processing_started_at=func.current_timestamp(),
+                    parsing_completed_at=func.current_timestamp(),
+                    parsing_failed_at=None,
+                    parsing_error=None,
+                    updated_at=func.current_timestamp(),
+                )
+            )
+            await session.execute(
+                update(DocumentBatch)
+                .where(DocumentBatch.id == batch_id, DocumentBatch.processing_started_at.is_(None))
+                .values(processing_started_at=func.current_timestamp(), updated_at=func.current_timestamp())
+            )
+            await session.execute(cls._batch_parsed(batch_id))
+
+        await db.run_write(apply)
+        await entity_cache.invalidate(
+            entity_cache.key("Document", document_id), entity_cache.key("DocumentBatch", batch_id)
+        )
+
+    @classmethod
+    async def mark_processing_started(cls, document_id: uuid.UUID, batch_id: uuid.UUID) -> None:
+        """
+        Stamp ``processing_started_at`` on the document, and on its batch if it is the first document to start.
+
+        :param document_id: The unique identifier for the document.
+        :param batch_id: The unique identifier for the document's batch.
+        """
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(
+                update(Document)
+                .where(Document.id == document_id)
+                .values(processing_started_at=func.current_timestamp(), updated_at=func.current_timestamp())
+            )
+            await session.execute(
+                update(DocumentBatch)
+                .where(DocumentBatch.id == batch_id, DocumentBatch.processing_started_at.is_(None))
+                .values(processing_started_at=func.current_timestamp(), updated_at=func.current_timestamp())
+            )
+
+        await db.run_write(apply)
+        await entity_cache.invalidate(
+            entity_cache.key("Document", document_id), entity_cache.key("DocumentBatch", batch_id)
+        )
+
+    @classmethod
+    async def mark_parsing_completed(cls, document_id: uuid.UUID, batch_id: uuid.UUID) -> None:
+        """
+        Stamp ``parsing_completed_at`` on the document, and on its batch once no active document is left unparsed.
+
+        :param document_id: The unique identifier for the document.
+        :param batch_id: The unique identifier for the document's batch.
+        """
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(
+                update(Document)
+                .where(Document.id == document_id)
+                .values(
+                    parsing_completed_at=func.current_timestamp(),
+                    parsing_failed_at=None,
+                    parsing_error=None,
+                    updated_at=func.current_timestamp(),
+                )
+            )
+            await session.execute(cls._batch_parsed(batch_id))
+
+        await db.run_write(apply)
+        await entity_cache.invalidate(
+            entity_cache.key("Document", document_id), entity_cache.key("DocumentBatch", batch_id)
+        )
+
+    @classmethod
+    async def mark_parsing_failed(cls, document_id: uuid.UUID, error: str) -> None:
+        """
+        Stamp ``parsing_failed_at`` and the reason on a document whose extraction raised.
+
+        The stamp is cleared once a later attempt completes.
+
+        :param document_id: The unique identifier for the document.
+        :param error: What went wrong, truncated to the column size.
+        """
+
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(
+                update(Document)
+                .where(Document.id == document_id)
+                .values(
+                    parsing_failed_at=func.current_timestamp(),
+                    parsing_error=error[:255],
+                    updated_at=func.current_timestamp(),
+                )
+            )
+
+        await db.run_write(apply)
+        await entity_cache.invalidate(entity_cache.key("Document", document_id))
+
+    @staticmethod
+    def _batch_parsed(batch_id: uuid.UUID) -> Update:
+        # stamps the batch once no active document of it is left unparsed
+        unparsed = exists().where(
+            Document.batch_id == batch_id,
+            Document.parsing_completed_at.is_(None),
+            Document.archived.is_(False),
+        )
+        return (
+            update(DocumentBatch)
+            .where(DocumentBatch.id == batch_id, DocumentBatch.parsing_completed_at.is_(None), ~unparsed)
+            .values(parsing_completed_at=func.current_timestamp(), updated_at=func.current_timestamp())
+        )
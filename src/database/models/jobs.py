@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import enum
+import uuid
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import JSON, UUID, Index, Integer, PrimaryKeyConstraint, Text, and_, func, or_, select, text, update
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.sqltypes import DateTime, String
+
+from database.base import db
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class JobStatusEnum(enum.StrEnum):
+    """Enum for durable job status."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    DEAD = "dead"
+
+
+class Job(db.Model):
+    """
+    A unit of background work, claimed by workers under a time limited lease.
+
+    A running job whose lease expired (its worker died or stalled) becomes claimable again, so
+    every job runs at least once; handlers must be idempotent.
+    """
+
+    __tablename__ = "jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), default=uuid.uuid4, primary_key=True)
+    queue: Mapped[str] = mapped_column(String(64), nullable=False, server_default=text("'default'"))
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False, default=dict)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, server_default=text("'queued'"))
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    run_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
+    locked_by: Mapped[str] = mapped_column(String(255), nullable=True)
+    lease_token: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
+    finished_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+
+    __table_args__ = (
+        PrimaryKeyConstraint(id, name="job_pkey"),  # noqa: A003
+        Index("job_claim_idx", queue, status, run_at),
+    )
+
+    @classmethod
+    async def enqueue(
+        cls,
+        kind: str,
+        payload: dict[str, Any],
+        queue: str = "default",
+        run_at: datetime | None = None,
+        max_attempts: int = 5,
+    ) -> Job:
+        """
+        Add a job to a queue.
+
+        :param kind: Name of the handler that runs the job.
+        :param payload: JSON serialisable arguments of the handler.
+        :param queue: The queue workers claim the job from.
+        :param run_at: Earliest time the job may run, defaults to now.
+        :param max_attempts: Number of runs before the job is given up as dead.
+        :return: The created Job instance.
+        """
+        now = datetime.now()
+        job = Job(
+            queue=queue,
+            kind=kind,
+            payload=payload,
+            status=JobStatusEnum.QUEUED,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=run_at or now,
+            created_at=now,
+            updated_at=now,
+        )
+
+        async def add(session: AsyncSession) -> Job:
+            session.add(job)
+            return job
+
+        return await db.run_write(add)
+
+    @classmethod
+    async def get_job(cls, job_id: uuid.UUID) -> Job | None:
+        async with db.session() as session:
+            return await session.get(Job, job_id)
+
+    @classmethod
+    async def claim(cls, queue: str, worker_id: str, limit: int, visibility_timeout: float) -> list[Job]:
+        """
+        Lease up to ``limit`` due jobs of ``queue``, including running jobs whose lease expired.
+
+        On Postgres the candidate rows are locked with ``FOR UPDATE SKIP LOCKED`` so concurrent
+        workers never wait on, nor claim, each other's rows. SQLite ignores the locking clause but
+        runs the single UPDATE under its database write lock, which gives the same guarantee.
+
+        :param queue: The queue to claim from.
+        :param worker_id: Identifies the claiming worker, for operators.
+        :param limit: Maximum number of jobs to claim.
+        :param visibility_timeout: Seconds before an un-renewed lease expires.
+        :return: The claimed jobs, each carrying the lease_token required to finish it.
+        """
+        now = datetime.now()
+        claimable = and_(
+            Job.queue == queue,
+            or_(
+                and_(Job.status == JobStatusEnum.QUEUED, Job.run_at <= now),
+                and_(Job.status == JobStatusEnum.RUNNING, Job.lease_expires_at < now),
+            ),
+        )
+        candidates = select(Job.id).where(claimable).order_by(Job.run_at).limit(limit).with_for_update(skip_locked=True)
+        stmt = (
+            update(Job)
+            .where(Job.id.in_(candidates))
+            .values(
+                status=JobStatusEnum.RUNNING,
+                attempts=Job.attempts + 1,
+                locked_by=worker_id,
+                lease_token=uuid.uuid4(),
+                lease_expires_at=now + timedelta(seconds=visibility_timeout),
+                updated_at=now,
+            )
+            .returning(Job)
+            .execution_options(synchronize_session=False)
+        )
+
+        async def apply(session: AsyncSession) -> list[Job]:
+            return list((await session.scalars(stmt)).all())
+
+        return await db.run_write(apply)
+
+    @classmethod
+    async def _update_leased(cls, job: Job, **values: Any) -> bool:
+        # a worker that lost its lease must not overwrite the outcome of the worker that took over
+        stmt = (
+            update(Job)
+            .where(Job.id == job.id, Job.lease_token == job.lease_token, Job.status == JobStatusEnum.RUNNING)
+            .values(updated_at=datetime.now(), **values)
+        )
+
+        async def apply(session: AsyncSession) -> bool:
+            return (await session.execute(stmt)).rowcount == 1
+
+        return await db.run_write(apply)
+
+    @classmethod
+    async def extend_lease(cls, job: Job, visibility_timeout: float) -> bool:
+        return await cls._update_leased(job, lease_expires_at=datetime.now() + timedelta(seconds=visibility_timeout))
+
+    @classmethod
+    async def complete(cls, job: Job) -> bool:
+        return await cls._update_leased(
+            job, status=JobStatusEnum.SUCCEEDED, finished_at=datetime.now(), lease_token=None, lease_expires_at=None
+        )
+
+    @classmethod
+    async def fail(cls, job: Job, error: str, retry_in: float | None) -> bool:
+        """
+        Record a failed run, re-queueing the job after ``retry_in`` seconds or burying it when None.
+        """
+        if retry_in is None:
+            return await cls._update_leased(
+                job,
+                status=JobStatusEnum.DEAD,
+                last_error=error,
+                finished_at=datetime.now(),
+                lease_token=None,
+                lease_expires_at=None,
+            )
+        return await cls._update_leased(
+            job,
+            status=JobStatusEnum.QUEUED,
+            last_error=error,
+            run_at=datetime.now() + timedelta(seconds=retry_in),
+            lease_token=None,
+            lease_expires_at=None,
+        )
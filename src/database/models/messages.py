@@ -1,27 +1,28 @@
-import re
-import uuid
 from collections.abc import Sequence
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import Boolean, Integer, UniqueConstraint, func, select, text
+from sqlalchemy import Boolean, Integer, Row, UniqueConstraint, func, select, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql.sqltypes import DateTime, String
 
 from database.base import db
+from library.extensions.message_catalogue_extn import PLACEHOLDER_PATTERN
 
 
 class MessageCatalogue(db.Model):
     __tablename__ = "message_catalogue"
 
-    id: Mapped[int] = mapped_column(Integer(), primary_key=True, default=uuid.uuid4)
+    id: Mapped[int] = mapped_column(Integer(), primary_key=True, autoincrement=True)
     code: Mapped[str] = mapped_column(String(10), nullable=False)
     language: Mapped[str] = mapped_column(String(length=20), nullable=False)
     text: Mapped[str] = mapped_column(String(300), nullable=False, default=text("''"))
     description: Mapped[str] = mapped_column(String(200), nullable=False)
     category: Mapped[str] = mapped_column(String(50), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(), server_default=func.current_timestamp())
-    updated_at: Mapped[datetime] = mapped_column(DateTime(), server_default=func.current_timestamp())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(), server_default=func.current_timestamp(), onupdate=func.current_timestamp()
+    )
     isactive: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=True)
 
     __table_args__ = (UniqueConstraint(code, language, name="unique_message_code"),)
@@ -31,21 +32,51 @@ class MessageCatalogue(db.Model):
 
     @property
     def has_parameter(self) -> bool:
-        parms_patteren = re.compile(r"{[a-z]+}")
-        params = parms_patteren.findall(self.text)
-        return bool(params)
+        return PLACEHOLDER_PATTERN.search(self.text) is not None
 
     @classmethod
     async def featch_all(cls, language: str) -> Sequence["MessageCatalogue"]:
         async with db.session() as session:
             stmt = (
                 select(MessageCatalogue)
-                .where(MessageCatalogue.language == language and MessageCatalogue.isactive)
+                .where(MessageCatalogue.language == language, MessageCatalogue.isactive)
                 .order_by(MessageCatalogue.updated_at.desc())
             )
             result = await session.execute(stmt)
             return result.scalars().all()
 
+    @classmethod
+    async def changed_since(cls, version: datetime | None, languages: Sequence[str] = ()) -> list[Row[Any]]:
+        """
+        Rows of the messages updated since ``version``, deactivated ones included, oldest first.
+
+        The second before ``version`` is read again: timestamps are not unique, a message may have
+        been written in the same second after the previous read, and SQLite stores
+        ``CURRENT_TIMESTAMP`` without the fractional seconds a bound datetime is compared with.
+
+        :param version: The largest ``updated_at`` already read, None to read every message.
+        :param languages: Only read these languages, all of them when empty.
+        :return: Rows of ``code``, ``language``, ``text``, ``isactive`` and ``updated_at``.
+        """
+        where = []
+        if version is not None:
+            where.append(cls.updated_at > version - timedelta(seconds=1))
+        if languages:
+            where.append(cls.language.in_(languages))
+        return await cls.project(
+            "code", "language", "text", "isactive", "updated_at", where=where, order_by=(cls.updated_at,)
+        )
+
+    @classmethod
+    async def upsert_messages(cls, messages: Sequence[dict[str, Any]]) -> int:
+        """
+        Add or update messages in bulk, matching existing ones on ``(code, language)``.
+
+        :param messages: Column values of the messages, every message with the same keys.
+        :return: The number of messages written.
+        """
+        return await db.bulk_upsert(MessageCatalogue, messages, conflict=("code", "language"))
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "id": str(self.id),
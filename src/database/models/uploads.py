@@ -1,12 +1,186 @@
+from __future__ import annotations
+
+import enum
 import uuid
+from datetime import datetime  # noqa: TC003 - SQLAlchemy resolves the Mapped annotations at runtime
+from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import UUID
+from sqlalchemy import JSON, UUID, BigInteger, Index, Integer, PrimaryKeyConstraint, func, text, update
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql.sqltypes import DateTime, String
 
 from database.base import db
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Attempts of record_range before giving up on a session that keeps changing under it
+RECORD_RANGE_ATTEMPTS = 16
+
+
+class UploadStatusEnum(enum.StrEnum):
+    """Enum for resumable upload session status."""
+
+    PENDING = "pending"
+    ASSEMBLING = "assembling"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def merge_range(ranges: list[list[int]], start: int, end: int) -> list[list[int]]:
+    """Merge the half open byte range ``[start, end)`` into a sorted list of disjoint ranges."""
+    merged: list[list[int]] = []
+    for lower, upper in sorted([*ranges, [start, end]]):
+        if merged and lower <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], upper)
+        else:
+            merged.append([lower, upper])
+    return merged
+
 
 class Uploads(db.Model):
+    """A resumable upload session for one file of a DocumentBatch."""
+
     __tablename__ = "uploads"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), default=uuid.uuid4, primary_key=True)
+    batch_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    upload_length: Mapped[int] = mapped_column(BigInteger(), nullable=False)
+    # length of the contiguous prefix received so far, what HEAD reports as Upload-Offset
+    upload_offset: Mapped[int] = mapped_column(BigInteger(), nullable=False, default=0)
+    received_ranges: Mapped[list[list[int]]] = mapped_column(JSON, nullable=False, default=list)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    document_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, server_default=text("'pending'"))
+    # bumped by every change of the received ranges, see record_range
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(), nullable=False, server_default=func.current_timestamp())
+    completed_at: Mapped[datetime] = mapped_column(DateTime(), nullable=True)
+
+    __table_args__ = (PrimaryKeyConstraint(id, name="upload_pkey"), Index("upload_batch_idx", batch_id))  # noqa: A003
+
+    @property
+    def is_complete(self) -> bool:
+        return self.upload_offset == self.upload_length
+
+    @classmethod
+    async def create_session(
+        cls, batch_id: uuid.UUID, filename: str, upload_length: int, content_hash: str | None = None
+    ) -> Uploads:
+        """
+        Open a new resumable upload session.
+
+        :param batch_id: The batch the uploaded document will belong to.
+        :param filename: The client side file name.
+        :param upload_length: The total size of the file in bytes.
+        :param content_hash: Optional SHA-256 the assembled file must match.
+        :return: The created Uploads instance.
+        """
+        upload = Uploads(
+            batch_id=batch_id,
+            filename=filename,
+            upload_length=upload_length,
+            upload_offset=0,
+            received_ranges=[],
+            content_hash=content_hash,
+            status=UploadStatusEnum.PENDING,
+        )
+
+        async def add(session: AsyncSession) -> Uploads:
+            session.add(upload)
+            return upload
+
+        return await db.run_write(add)
+
+    @classmethod
+    async def get_session(cls, upload_id: uuid.UUID) -> Uploads | None:
+        async with db.session() as session:
+            return await session.get(Uploads, upload_id)
+
+    @classmethod
+    async def record_range(cls, upload_id: uuid.UUID, start: int, end: int) -> tuple[Uploads, bool]:
+        """
+        Record that ``[start, end)`` has been written.
+
+        Parallel chunks of a session race on ``received_ranges``: each call reads the session, merges
+        its range and writes it back only if ``revision`` did not change meanwhile, else it reads
+        again. The write is a single conditional UPDATE, so no row lock is needed, which SQLite
+        does not have, and it goes through ``db.run_write``.
+
+        :return: The updated session and whether this call received the last missing byte, in which
+                 case the caller is responsible for assembling the file.
+        :raises StaleDataError: When the session kept changing for ``RECORD_RANGE_ATTEMPTS`` attempts.
+        """
+        for _ in range(RECORD_RANGE_ATTEMPTS):
+            upload = await cls.get_session(upload_id)
+            ranges = merge_range(upload.received_ranges, start, end)
+            offset = ranges[0][1] if ranges[0][0] == 0 else 0
+            must_assemble = offset == upload.upload_length and upload.status == UploadStatusEnum.PENDING
+            status = UploadStatusEnum.ASSEMBLING if must_assemble else upload.status
+            stmt = (
+                update(Uploads)
+                .where(Uploads.id == upload_id, Uploads.revision == upload.revision)
+                .values(
+                    received_ranges=ranges,
+                    upload_offset=offset,
+                    status=status,
+                    revision=upload.revision + 1,
+                    updated_at=func.current_timestamp(),
+                )
+            )
+
+            async def apply(session: AsyncSession, stmt: Any = stmt) -> bool:
+                return (await session.execute(stmt)).rowcount == 1
+
+            if await db.run_write(apply):
+                upload.received_ranges, upload.upload_offset, upload.status = ranges, offset, status
+                upload.revision += 1
+                return upload, must_assemble
+        raise StaleDataError(f"Upload session {upload_id} kept changing while recording [{start}, {end})")
+
+    @classmethod
+    async def begin_assembly(cls, upload_id: uuid.UUID) -> bool:
+        """Move a fully received pending session to assembling, returns False when another request did first."""
+        return await cls._update(
+            upload_id,
+            (Uploads.status == UploadStatusEnum.PENDING, Uploads.upload_offset == Uploads.upload_length),
+            status=UploadStatusEnum.ASSEMBLING,
+        )
+
+    @classmethod
+    async def reserve_document(cls, upload_id: uuid.UUID, document_id: uuid.UUID, content_hash: str) -> bool:
+        """
+        Store the verified hash of an assembling session and the id its document will get.
+
+        Assembly resumes from these once the backing file was moved into the blob store.
+        """
+        return await cls._update(
+            upload_id,
+            (Uploads.status == UploadStatusEnum.ASSEMBLING,),
+            document_id=document_id,
+            content_hash=content_hash,
+        )
+
+    @classmethod
+    async def set_status(cls, upload_id: uuid.UUID, status: UploadStatusEnum) -> None:
+        await cls._update(upload_id, (), status=status)
+
+    @classmethod
+    async def finish_session(cls, upload_id: uuid.UUID, status: UploadStatusEnum, **values: Any) -> None:
+        await cls._update(upload_id, (), status=status, completed_at=func.current_timestamp(), **values)
+
+    @classmethod
+    async def _update(cls, upload_id: uuid.UUID, conditions: tuple[Any, ...], **values: Any) -> bool:
+        stmt = (
+            update(Uploads)
+            .where(Uploads.id == upload_id, *conditions)
+            .values(updated_at=func.current_timestamp(), **values)
+        )
+
+        async def apply(session: AsyncSession) -> bool:
+            return (await session.execute(stmt)).rowcount == 1
+
+        return await db.run_write(apply)
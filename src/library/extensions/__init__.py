@@ -1,19 +1,100 @@
+from .blob_store_extn import BlobStore, pdf_blobs
 from .database_extn import SqlAlchemy
+from .entity_cache_extn import (
+    CacheBackend,
+    EntityCache,
+    EntityCodec,
+    MemoryBackend,
+    RedisBackend,
+    configure_entity_cache,
+    entity_cache,
+)
+from .extraction_extn import PageText, PdfExtractionError, PdfTextExtractor, configure_extraction
 from .health_extn import configure_db_checkup, configure_heath_checkup, configure_thread_checkup
+from .housekeeping_extn import Housekeeper, SweepTarget, configure_housekeeping, remove_tree
 from .lifespan_extn import configure_lifespan
 from .logging_extn import configure_logger
+from .message_catalogue_extn import (
+    MessageCatalogueCache,
+    MessageTemplate,
+    configure_message_catalogue,
+    message_catalogue,
+)
+from .password_hasher_extn import (
+    HashingQueueFullError,
+    HashParams,
+    PasswordHash,
+    PasswordHasher,
+    configure_password_hasher,
+    password_hasher,
+)
+from .pool_metrics_extn import PoolMetrics, render_prometheus
+from .resumable_upload_extn import SessionFiles, pdf_sessions
+from .session_token_extn import (
+    SessionTokens,
+    TokenClaims,
+    configure_session_tokens,
+    login_required,
+    session_tokens,
+)
+from .text_cache_extn import TextCache, configure_text_cache
 from .time_extn import configure_timezone
-from .upload_extn import pdf_loader
+from .upload_extn import StreamedFile, StreamedForm, pdf_loader, stream_multipart
+from .upload_scheduler_extn import UploadQueueFullError, UploadScheduler, configure_upload_scheduler
 from .warning_extn import configure_warning
 
 __all__ = (
+    "BlobStore",
+    "CacheBackend",
+    "EntityCache",
+    "EntityCodec",
+    "HashParams",
+    "HashingQueueFullError",
+    "Housekeeper",
+    "MemoryBackend",
+    "MessageCatalogueCache",
+    "MessageTemplate",
+    "PageText",
+    "PasswordHash",
+    "PasswordHasher",
+    "PdfExtractionError",
+    "PdfTextExtractor",
+    "PoolMetrics",
+    "RedisBackend",
+    "SessionFiles",
+    "SessionTokens",
     "SqlAlchemy",
+    "StreamedFile",
+    "StreamedForm",
+    "SweepTarget",
+    "TextCache",
+    "TokenClaims",
+    "UploadQueueFullError",
+    "UploadScheduler",
     "configure_db_checkup",
+    "configure_entity_cache",
+    "configure_extraction",
     "configure_heath_checkup",
+    "configure_housekeeping",
     "configure_lifespan",
     "configure_logger",
+    "configure_message_catalogue",
+    "configure_password_hasher",
+    "configure_session_tokens",
+    "configure_text_cache",
     "configure_thread_checkup",
     "configure_timezone",
+    "configure_upload_scheduler",
     "configure_warning",
+    "entity_cache",
+    "login_required",
+    "message_catalogue",
+    "password_hasher",
+    "pdf_blobs",
     "pdf_loader",
+    "pdf_sessions",
+    "remove_tree",
+    "render_prometheus",
+    "session_tokens",
+    "stream_multipart",
 )
@@ -0,0 +1,125 @@
+import os
+import uuid
+from contextlib import suppress
+from pathlib import Path
+from typing import BinaryIO
+
+from quart import current_app
+from quart_uploads import UploadSet
+
+from .upload_extn import pdf_loader
+
+HASH_LENGTH = 64
+
+
+class BlobStore:
+    """
+    Content addressed storage behind an upload set.
+
+    Each unique file is kept once at ``<destination>/blobs/<ab>/<cd>/<sha256>``. Uploads are
+    streamed into ``<destination>/blobs/incoming`` while their SHA-256 is computed and then
+    linked into place; when the blob already exists the incoming copy is simply dropped. An
+    upload declaring the hash of a stored blob is only hashed, never written, see ``claim``.
+    """
+
+    def __init__(self, upload_set: UploadSet, folder: str = "blobs") -> None:
+        self._upload_set = upload_set
+        self._folder = folder
+
+    @property
+    def root(self) -> Path:
+        return Path(self._upload_set.config.destination) / self._folder
+
+    @property
+    def incoming(self) -> Path:
+        return self.root / "incoming"
+
+    @property
+    def shard_depth(self) -> int:
+        return current_app.config.get("UPLOADS_BLOB_SHARD_DEPTH", 2)
+
+    def path_for(self, content_hash: str) -> Path:
+        shards = [content_hash[i * 2 : i * 2 + 2] for i in range(self.shard_depth)]
+        return self.root.joinpath(*shards, content_hash)
+
+    def exists(self, content_hash: str) -> bool:
+        return self.path_for(content_hash).is_file()
+
+    def prepare(self) -> None:
+        self.incoming.mkdir(parents=True, exist_ok=True)
+
+    def reserve(self, basename: str) -> tuple[Path, BinaryIO]:  # noqa: ARG002
+        target = self.incoming / uuid.uuid4().hex
+        return target, target.open("xb")
+
+    def commit(self, target: Path, content_hash: str) -> tuple[Path, bool]:
+        """
+        Move a fully written incoming file to its content address.
+
+        :return: The blob path and whether an identical blob was already stored.
+        """
+        blob = self.path_for(content_hash)
+        if blob.is_file():
+            target.unlink(missing_ok=True)
+            self._touch(blob)
+            return blob, True
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(target, blob)
+        except FileExistsError:
+            self._touch(blob)
+            return blob, True
+        finally:
+            target.unlink(missing_ok=True)
+        return blob, False
+
+    def claim(self, content_hash: str) -> Path | None:
+        """
+        The stored blob of ``content_hash``, its grace period restarted, so an upload declaring
+        that hash does not need to be written again.
+
+        :return: The blob path, None when no such blob is stored.
+        """
+        blob = self.path_for(content_hash)
+        if not blob.is_file():
+            return None
+        self._touch(blob)
+        return blob
+
+    @staticmethod
+    def _touch(blob: Path) -> None:
+        # a blob uploaded again starts a new grace period, its document may not be inserted yet
+        with suppress(FileNotFoundError):
+            os.utime(blob)
+
+    def release(self, stored: Path) -> None:
+        # Blobs may already be referenced by other documents; unreferenced ones are swept by housekeeping,
+        # see ``stored``.
+        pass
+
+    def stored(self, older_than: float) -> dict[str, Path]:
+        """
+        Walk the blobs last written before ``older_than``, the staging directory excluded.
+
+        Blocking, meant to be run off the event loop.
+
+        :param older_than: A POSIX timestamp, younger blobs are still in their grace period.
+        :return: The blob paths by content hash.
+        """
+        found: dict[str, Path] = {}
+        for folder, subfolders, files in os.walk(self.root):
+            if Path(folder) == self.root and self.incoming.name in subfolders:
+                subfolders.remove(self.incoming.name)
+            for name in files:
+                if len(name) != HASH_LENGTH:
+                    continue
+                path = Path(folder, name)
+                try:
+                    if path.stat().st_mtime < older_than:
+                        found[name] = path
+                except FileNotFoundError:
+                    continue
+        return found
+
+
+pdf_blobs = BlobStore(pdf_loader)
@@ -1,9 +1,42 @@
+import asyncio
+import bisect
+import contextvars
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Type
+from typing import Any, Type, TypeVar
 
-from quart import Quart
-from quart.globals import app_ctx
-from sqlalchemy import URL, QueuePool, StaticPool, engine
+from quart import Quart, Response, has_app_context, request
+from quart_schema import hide
+from sqlalchemy import (
+    URL,
+    Engine,
+    Insert,
+    PrimaryKeyConstraint,
+    QueuePool,
+    StaticPool,
+    Table,
+    delete,
+    engine,
+    event,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -11,12 +44,279 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Mapper, Session
+from sqlalchemy.sql import ClauseElement, Select
+from sqlalchemy.sql.schema import UniqueConstraint
+from werkzeug.exceptions import BadRequest
+
+from .logging_extn import get_request_id
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteOp = Callable[[AsyncSession], Awaitable[T]]
+
+# set on a session once it wrote, its later reads must see those writes
+_PRIMARY_KEY = "db_primary"
+
+# Seconds a replica is behind its primary. Other dialects, MySQL and MariaDB included, only get a
+# liveness check: their lag is taken as 0 as long as the replica answers.
+_REPLICA_LAG_SQL = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+    ),
+}
+
+
+# Bind parameters a single statement may carry, bulk_upsert sizes its multi-row VALUES to fit
+_BIND_PARAM_LIMITS = {
+    "postgresql": 32767,
+    "mysql": 65535,
+    "mariadb": 65535,
+    "sqlite": 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999,
+}
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_RE = re.compile(r"\$\d+|%\(\w+\)s|%s|:\w+")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST_RE = re.compile(r"(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+", re.IGNORECASE)
+
+
+def statement_shape(statement: str) -> str:
+    """Normalise a statement so executions that only differ in bound values or list lengths compare equal."""
+    shape = _PLACEHOLDER_RE.sub("?", _WHITESPACE_RE.sub(" ", statement.strip()))
+    shape = _PLACEHOLDER_LIST_RE.sub("(?)", shape)
+    return _VALUES_LIST_RE.sub(r"\1", shape)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Statements run on behalf of one request."""
+
+    count: int = 0
+    total: float = 0.0
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+    shapes: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float, keep: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.shapes[statement_shape(statement)] += 1
+        if len(self.slowest) < keep:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.total * 1000, 3),
+            "slowest": [
+                {"ms": round(duration * 1000, 3), "statement": _WHITESPACE_RE.sub(" ", statement)[:500]}
+                for duration, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        return {
+            shape: count for shape, count in self.shapes.items() if count >= threshold and shape[:6].upper() == "SELECT"
+        }
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+DEFAULT_SHARD = "default"
+
+_current_tenant: ContextVar[str | None] = ContextVar("current_tenant", default=None)
+
+
+class ShardMap:
+    """
+    Assigns tenants to named databases.
+
+    Tenants listed in ``assignments`` go to their shard. The others are placed on a consistent
+    hash ring of ``vnodes`` points per shard when ``hashed``, so adding a shard only moves the
+    tenants that land on its points, or all stay on the default shard otherwise.
+    """
+
+    def __init__(self, names: Sequence[str], assignments: Mapping[str, str], hashed: bool, vnodes: int = 64) -> None:
+        unknown = set(assignments.values()) - set(names)
+        if unknown:
+            raise ValueError(f"Tenants are assigned to unknown shards: {', '.join(sorted(unknown))}")
+        self.names = list(names)
+        self.assignments = {str(tenant): name for tenant, name in assignments.items()}
+        self.hashed = hashed
+        ring = sorted((self._hash(f"{name}#{i}"), name) for name in self.names for i in range(vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [name for _, name in ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
 
+    def shard_for(self, tenant_id: Any) -> str:
+        tenant = str(tenant_id)
+        if tenant in self.assignments:
+            return self.assignments[tenant]
+        if not self.hashed:
+            return DEFAULT_SHARD
+        return self._owners[bisect.bisect(self._points, self._hash(tenant)) % len(self._points)]
 
-def _app_ctx_id() -> int:
-    """Get the id of the current Flask application context for the session scope."""
-    return id(app_ctx)
+
+def _current_task() -> asyncio.Task | None:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+@dataclass(slots=True)
+class _Replica:
+    engine: AsyncEngine
+    healthy: bool = True
+    lag: float | None = None
+    error: str | None = None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends statements on sharded tables to the current tenant's shard, plain reads
+    to a replica and everything else to the primary.
+
+    Writes, flushes, ``SELECT ... FOR UPDATE`` and textual statements go to the primary, and
+    once a session has used the primary every later statement of that session does too, so a
+    request always reads its own writes.
+    """
+
+    def __init__(self, router: "SqlAlchemy", **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._router = router
+
+    def get_bind(self, mapper: Mapper | None = None, clause: ClauseElement | None = None, **kwargs: Any) -> Engine:  # noqa: ARG002
+        shard = self._router.shard_engine_for(mapper, clause)
+        if shard is not None:
+            return shard.sync_engine
+        if not self._router.replicas:
+            return self._router.engine.sync_engine
+        is_plain_read = isinstance(clause, Select) and clause._for_update_arg is None  # noqa: SLF001
+        if self.info.get(_PRIMARY_KEY) or self._flushing or not is_plain_read:
+            self.info[_PRIMARY_KEY] = True
+            return self._router.engine.sync_engine
+        return self._router.pick_replica().sync_engine
+
+
+@dataclass(slots=True, frozen=True)
+class SqliteProfile:
+    """Connection settings of the SQLite production mode, see ``SqlAlchemy.init_app``."""
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 268435456
+    cache_size: int = -65536
+    busy_timeout: int = 5000
+    read_pool_size: int = 8
+
+    def pragmas(self, read_only: bool = False) -> list[str]:
+        pragmas = [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size={self.cache_size}",
+            f"PRAGMA busy_timeout={self.busy_timeout}",
+            "PRAGMA foreign_keys=ON",
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+    def install(self, async_engine: AsyncEngine, read_only: bool = False) -> None:
+        pragmas = self.pragmas(read_only)
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def set_pragmas(dbapi_connection: Any, _: Any) -> None:
+            # let SQLAlchemy, not the driver, decide where transactions begin
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        @event.listens_for(async_engine.sync_engine, "begin")
+        def begin(conn: Any) -> None:
+            # writers take the write lock up front, so busy_timeout applies instead of failing on lock upgrade
+            conn.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+
+class WriteQueue:
+    """
+    Single writer queue that group commits write operations from concurrent coroutines.
+
+    Operations submitted while a batch is being written are collected, up to ``batch_size`` of
+    them run in one transaction on the writer connection, each inside its own savepoint so a
+    failing operation only rolls back itself, and the batch is made durable with one commit.
+
+    The writer task starts in an empty context, not the one of the request that happened to
+    start it; each operation runs in a copy of its submitter's context, so its statements are
+    recorded for, and routed by the tenant of, the request that submitted it.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], batch_size: int = 64) -> None:
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self._pending: list[tuple[WriteOp, asyncio.Future, contextvars.Context]] = []
+        self._writer: asyncio.Task | None = None
+        self._batches = 0
+        self._operations = 0
+
+    async def submit(self, operation: WriteOp[T]) -> T:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((operation, future, contextvars.copy_context()))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain(), name="sqlite-writer", context=contextvars.Context())
+        return await future
+
+    async def _drain(self) -> None:
+        while self._pending:
+            # let every coroutine that is ready to write join this batch
+            await asyncio.sleep(0)
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+            outcomes: list[tuple[asyncio.Future, Any, BaseException | None]] = []
+            try:
+                async with self._session_factory() as session, session.begin():
+                    for operation, future, context in batch:
+                        try:
+                            async with session.begin_nested():
+                                result = await asyncio.create_task(operation(session), context=context)
+                                outcomes.append((future, result, None))
+                        except Exception as e:  # noqa: PERF203 - each operation is isolated by its own savepoint
+                            outcomes.append((future, None, e))
+            except Exception as e:
+                outcomes = [(future, None, e) for _, future, _ in batch]
+            self._batches += 1
+            self._operations += len(batch)
+            for future, result, error in outcomes:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+    async def join(self) -> None:
+        """Wait until every submitted operation was written."""
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self._batches,
+            "operations": self._operations,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self._operations / self._batches, 2) if self._batches else 0.0,
+        }
 
 
 class SqlAlchemy:
@@ -28,6 +328,24 @@ class SqlAlchemy:
     ) -> None:
         self._session_options = {} if session_options is None else session_options
         self._model = model_class if model_class is not None else DeclarativeBase
+        self._scoped_tasks: weakref.WeakSet[asyncio.Task] = weakref.WeakSet()
+        self._closing: set[asyncio.Task] = set()
+        self._replicas: list[_Replica] = []
+        self._replica_cycle = itertools.count()
+        self._replica_strategy = "round_robin"
+        self._replica_max_lag = 5.0
+        self._replica_check_interval = 10.0
+        self._replica_checked_at = 0.0
+        self._replica_check: asyncio.Task | None = None
+        self._write_queue: WriteQueue | None = None
+        self._recent_requests: deque[dict[str, Any]] = deque(maxlen=100)
+        self._shards: dict[str, AsyncEngine] = {}
+        self._shard_map: ShardMap | None = None
+        self._sharded_tables: frozenset[str] = frozenset()
+        self._tenant_header = "X-Tenant-Id"
+        self._pool_min_connections = 0
+        self._warmup_queries: list[str] = []
+        self._drain_timeout = 10.0
         if app is not None:
             self.init_app(app)
 
@@ -36,7 +354,15 @@ class SqlAlchemy:
             raise RuntimeError("A 'SqlAlchemy' instance has already been registered on this Quart app.")
 
         app.extensions["sqlalchemy"] = self
+        self._reset_routing()
         app.teardown_appcontext(self._teardown_session_with_exception)
+        app.before_serving(self.warm_up)
+        # while serving generators finish after every after_serving hook, so the extensions
+        # registered later have stopped using the engines by the time they are drained
+        app.while_serving(self._drain_after_serving)
+        self._pool_min_connections = app.config.setdefault("SQLALCHEMY_POOL_MIN_CONNECTIONS", 4)
+        self._warmup_queries = app.config.setdefault("SQLALCHEMY_WARMUP_QUERIES", [])
+        self._drain_timeout = app.config.setdefault("SQLALCHEMY_DRAIN_TIMEOUT", 10.0)
 
         # Default configuration
         basic_uri: str | URL | None = app.config.setdefault("SQLALCHEMY_DATABASE_URI", None)
@@ -49,8 +375,61 @@ class SqlAlchemy:
         engine_options["url"] = basic_uri
         self._apply_driver_defaults(engine_options, app)
         url_: str | URL = engine_options.pop("url")
+        sqlite_profile = self._sqlite_profile(url_, app)
+        if sqlite_profile is not None:
+            # a single writer connection, concurrent writers queue for it instead of failing on the file lock
+            engine_options.update(pool_size=1, max_overflow=0)
         self._engine = create_async_engine(url_, **engine_options)
+        if sqlite_profile is not None:
+            sqlite_profile.install(self._engine)
+            reader = create_async_engine(
+                url_, **{**engine_options, "pool_size": sqlite_profile.read_pool_size, "max_overflow": 0}
+            )
+            sqlite_profile.install(reader, read_only=True)
+            self._replicas.append(_Replica(reader))
+            self._write_queue = WriteQueue(
+                async_sessionmaker(bind=self._engine, class_=AsyncSession, expire_on_commit=False),
+                batch_size=app.config.setdefault("SQLITE_WRITE_BATCH_SIZE", 64),
+            )
+
+        # Optional read replicas, each with its own pool
+        for replica_uri in app.config.setdefault("SQLALCHEMY_REPLICA_URIS", []):
+            replica_options = {**engine_options, "url": replica_uri}
+            self._apply_driver_defaults(replica_options, app)
+            self._replicas.append(_Replica(create_async_engine(replica_options.pop("url"), **replica_options)))
+        self._replica_strategy = app.config.setdefault("SQLALCHEMY_REPLICA_STRATEGY", "round_robin")
+        self._replica_max_lag = app.config.setdefault("SQLALCHEMY_REPLICA_MAX_LAG", 5.0)
+        self._replica_check_interval = app.config.setdefault("SQLALCHEMY_REPLICA_CHECK_INTERVAL", 10.0)
+
+        # Optional tenant shards, each with its own pool; the primary database is the default shard
+        for name, shard_uri in app.config.setdefault("SQLALCHEMY_SHARD_URIS", {}).items():
+            shard_options = {**engine_options, "url": shard_uri}
+            self._apply_driver_defaults(shard_options, app)
+            self._shards[name] = create_async_engine(shard_options.pop("url"), **shard_options)
+        if self._shards:
+            self._shard_map = ShardMap(
+                [DEFAULT_SHARD, *self._shards],
+                app.config.setdefault("SQLALCHEMY_SHARD_MAP", {}),
+                hashed=app.config.setdefault("SQLALCHEMY_SHARD_STRATEGY", "map") == "hash",
+            )
+            self._sharded_tables = frozenset(app.config.setdefault("SQLALCHEMY_SHARDED_TABLES", ["datasets"]))
+            self._tenant_header = app.config.setdefault("SQLALCHEMY_TENANT_HEADER", "X-Tenant-Id")
+            app.before_request(self._tenant_from_request)
+
+        if self._replicas or self._shards:
+            self._session_options.setdefault("sync_session_class", RoutingSession)
+            self._session_options.setdefault("router", self)
         self._session = self._make_scoped_session(self._session_options)
+        if app.config.setdefault("SQLALCHEMY_RECORD_QUERIES", True):
+            self._install_query_recorder(app)
+
+    def _reset_routing(self) -> None:
+        # the engines of an app initialised before this one are not routed to any more
+        self._replicas = []
+        self._write_queue = None
+        self._shards = {}
+        self._shard_map = None
+        self._sharded_tables = frozenset()
 
     @property
     def session(self) -> async_scoped_session[AsyncSession]:
@@ -60,6 +439,461 @@ class SqlAlchemy:
     def engine(self) -> AsyncEngine:
         return self._engine
 
+    @property
+    def write_queue(self) -> WriteQueue | None:
+        return self._write_queue
+
+    async def warm_up(self) -> None:
+        """
+        Open ``SQLALCHEMY_POOL_MIN_CONNECTIONS`` connections on the primary and on every replica,
+        run ``SQLALCHEMY_WARMUP_QUERIES`` on each, and return them to the pool.
+
+        Engines connect lazily, so without this the first requests after a deploy pay for
+        connection and TLS setup. Runs before the app starts serving; a database that cannot be
+        reached is logged and left to the first request to report.
+        """
+        for name, async_engine in self.named_engines():
+            size = getattr(async_engine.pool, "size", None)
+            count = min(self._pool_min_connections, size()) if size is not None else min(self._pool_min_connections, 1)
+            if count <= 0:
+                continue
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._warm_connection(async_engine) for _ in range(count)), return_exceptions=True
+            )
+            failures = [result for result in results if isinstance(result, BaseException)]
+            for failure in failures[:1]:
+                logger.error(f"Warm-up of the {name} pool failed: {failure!r}")
+            elapsed = (time.perf_counter() - started) * 1000
+            logger.info(f"Warmed up {count - len(failures)}/{count} connections of the {name} pool in {elapsed:.1f} ms")
+
+    async def _warm_connection(self, async_engine: AsyncEngine) -> None:
+        async with async_engine.connect() as conn:
+            for query in self._warmup_queries:
+                await conn.exec_driver_sql(query)
+            await conn.rollback()
+
+    async def _drain_after_serving(self) -> AsyncIterator[None]:
+        yield
+        await self.drain()
+
+    async def drain(self) -> None:
+        """
+        Finish pending work and close every connection, once the app stopped serving.
+
+        Waits for queued SQLite writes and for sessions being closed, then up to
+        ``SQLALCHEMY_DRAIN_TIMEOUT`` seconds for connections still checked out, e.g. by background
+        tasks, to be returned, and disposes the primary and replica engines.
+        """
+        if self._replica_check is not None:
+            self._replica_check.cancel()
+        try:
+            async with asyncio.timeout(self._drain_timeout):
+                if self._write_queue is not None:
+                    await self._write_queue.join()
+                while self._closing:
+                    await asyncio.gather(*self._closing, return_exceptions=True)
+                # pools have no event to wait on
+                while any(self._checked_out(async_engine) for _, async_engine in self.named_engines()):  # noqa: ASYNC110
+                    await asyncio.sleep(0.05)
+        except TimeoutError:
+            busy = {name: self._checked_out(async_engine) for name, async_engine in self.named_engines()}
+            logger.warning(f"Connections still checked out after {self._drain_timeout} s, closing anyway: {busy}")
+        for name, async_engine in self.named_engines():
+            await async_engine.dispose()
+            logger.info(f"Disposed the {name} pool")
+
+    def named_engines(self) -> list[tuple[str, AsyncEngine]]:
+        """Every engine with a label for logs and metrics: the primary, the replicas, then the shards."""
+        return [
+            ("primary", self._engine),
+            *((f"replica-{i}", replica) for i, replica in enumerate(self.replicas)),
+            *((f"shard-{name}", shard) for name, shard in self._shards.items()),
+        ]
+
+    @staticmethod
+    def _checked_out(async_engine: AsyncEngine) -> int:
+        checkedout = getattr(async_engine.pool, "checkedout", None)
+        return checkedout() if checkedout is not None else 0
+
+    async def run_write(self, operation: WriteOp[T]) -> T:
+        """
+        Run ``operation(session)`` in a committed transaction.
+
+        In SQLite production mode the operation goes through the single writer queue and may share
+        its commit with other coroutines' writes; otherwise it runs on the current session.
+        """
+        if self._write_queue is not None:
+            return await self._write_queue.submit(operation)
+        async with self._session() as session:
+            result = await operation(session)
+            await session.commit()
+        return result
+
+    async def bulk_upsert(
+        self,
+        model: Type[DeclarativeBase],
+        rows: Sequence[Mapping[str, Any]],
+        conflict: Sequence[str] | None = None,
+        update: Sequence[str] | None = None,
+        chunk_size: int | None = None,
+    ) -> int:
+        """
+        Insert ``rows`` into the model's table, updating the existing rows they collide with, in one transaction.
+
+        Postgres and SQLite get ``INSERT ... ON CONFLICT (conflict) DO UPDATE``, MySQL and MariaDB
+        ``INSERT ... ON DUPLICATE KEY UPDATE``, which fires on any unique key of the table. The
+        statement is compiled once and executed for chunks of rows sized to the dialect's bind
+        parameter limit, which drivers batching rows into multi-row VALUES must stay within.
+        ``updated_at`` is stamped on updated rows when the table has it and the rows do not.
+
+        :param model: The mapped class whose table is written.
+        :param rows: Column values, every row with the same keys.
+        :param conflict: The unique columns identifying a row, defaults to the table's first unique
+            constraint by name, or its primary key.
+        :param update: Columns overwritten on conflict, defaults to every given column outside
+            ``conflict`` and the primary key; empty to leave existing rows untouched.
+        :param chunk_size: Rows per statement, overriding the computed one.
+        :return: The sum of the rowcounts the driver reports for every chunk. What is counted is
+            dialect dependent: SQLite and Postgres count inserted and updated rows and not the ones
+            left untouched, MySQL counts an updated row twice, and a driver that cannot tell
+            reports -1 for the chunk.
+        """
+        if not rows:
+            return 0
+        table: Table = model.__table__
+        keys = list(rows[0])
+        if any(row.keys() != rows[0].keys() for row in rows):
+            raise ValueError("Every row of a bulk upsert must have the same columns")
+        conflict = list(conflict) if conflict is not None else self._conflict_columns(table)
+        update = [
+            name
+            for name in (keys if update is None else update)
+            if name not in conflict and not table.c[name].primary_key
+        ]
+        dialect = self._engine.dialect.name
+        if chunk_size is None:
+            # Python side defaults of missing columns are bound as parameters too
+            width = len(set(keys) | {column.name for column in table.c if column.default is not None})
+            chunk_size = max(_BIND_PARAM_LIMITS.get(dialect, 999) // width, 1)
+
+        stmt = self._upsert_statement(table, dialect, conflict, update)
+
+        async def upsert(session: AsyncSession) -> int:
+            written = 0
+            for start in range(0, len(rows), chunk_size):
+                written += (await session.execute(stmt, list(rows[start : start + chunk_size]))).rowcount
+            return written
+
+        return await self.run_write(upsert)
+
+    @staticmethod
+    def _conflict_columns(table: Table) -> list[str]:
+        unique = sorted(
+            (
+                constraint
+                for constraint in table.constraints
+                if isinstance(constraint, UniqueConstraint) and not isinstance(constraint, PrimaryKeyConstraint)
+            ),
+            key=lambda constraint: constraint.name or "",
+        )
+        columns = unique[0].columns if unique else table.primary_key.columns
+        return [column.name for column in columns]
+
+    @staticmethod
+    def _upsert_statement(table: Table, dialect: str, conflict: list[str], update: list[str]) -> Insert:
+        stamp = update and "updated_at" in table.c and "updated_at" not in update
+        touch = {"updated_at": func.current_timestamp()} if stamp else {}
+        if dialect in {"postgresql", "sqlite"}:
+            insert = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+            if not update:
+                return insert.on_conflict_do_nothing(index_elements=conflict)
+            return insert.on_conflict_do_update(
+                index_elements=conflict, set_={**{name: insert.excluded[name] for name in update}, **touch}
+            )
+        if dialect in {"mysql", "mariadb"}:
+            insert = mysql.insert(table)
+            if not update:
+                # assigning a key column to itself turns the duplicate into a no-op
+                return insert.on_duplicate_key_update({conflict[0]: table.c[conflict[0]]})
+            return insert.on_duplicate_key_update({**{name: insert.inserted[name] for name in update}, **touch})
+        raise NotImplementedError(f"bulk_upsert does not support the {dialect} dialect")
+
+    @staticmethod
+    def _sqlite_profile(url_: str | URL, app: Quart) -> SqliteProfile | None:
+        url = engine.make_url(url_)
+        in_memory = url.database is None or url.database in {"", ":memory:"} or "mode=memory" in str(url)
+        enabled = app.config.setdefault("SQLITE_PRODUCTION_MODE", False)
+        if url.get_backend_name() != "sqlite" or in_memory or not enabled:
+            return None
+        return SqliteProfile(
+            journal_mode=app.config.setdefault("SQLITE_JOURNAL_MODE", "WAL"),
+            synchronous=app.config.setdefault("SQLITE_SYNCHRONOUS", "NORMAL"),
+            mmap_size=app.config.setdefault("SQLITE_MMAP_SIZE", 268435456),
+            cache_size=app.config.setdefault("SQLITE_CACHE_SIZE", -65536),
+            busy_timeout=app.config.setdefault("SQLITE_BUSY_TIMEOUT", 5000),
+            read_pool_size=app.config.setdefault("SQLITE_READ_POOL_SIZE", 8),
+        )
+
+    @property
+    def shards(self) -> dict[str, AsyncEngine]:
+        """Every shard by name, the primary database included as the default shard."""
+        return {DEFAULT_SHARD: self._engine, **self._shards}
+
+    def shard_for(self, tenant_id: Any) -> str:
+        return self._shard_map.shard_for(tenant_id) if self._shard_map is not None else DEFAULT_SHARD
+
+    @contextmanager
+    def tenant(self, tenant_id: Any) -> Iterator[None]:
+        """Route statements on sharded tables to the shard of ``tenant_id`` within the block."""
+        token = _current_tenant.set(None if tenant_id is None else str(tenant_id))
+        try:
+            yield
+        finally:
+            _current_tenant.reset(token)
+
+    async def _tenant_from_request(self) -> None:
+        # a route's own tenant_id wins, the header only names the tenant of routes without one
+        header = request.headers.get(self._tenant_header) or None
+        view_args = request.view_args or {}
+        if "tenant_id" not in view_args:
+            _current_tenant.set(header)
+            return
+        tenant_id = str(view_args["tenant_id"])
+        if header is not None and header != tenant_id:
+            raise BadRequest(f"{self._tenant_header} {header} does not match the tenant {tenant_id} of the URL")
+        _current_tenant.set(tenant_id)
+
+    def shard_engine_for(self, mapper: Mapper | None, clause: ClauseElement | None) -> AsyncEngine | None:
+        """The shard a statement on a sharded table runs on, None for every other statement."""
+        if not self._shards:
+            return None
+        tables = [mapper.local_table] if mapper is not None else [getattr(clause, "table", None)]
+        if isinstance(clause, Select):
+            tables += clause.get_final_froms()
+        sharded = next((table.name for table in tables if getattr(table, "name", None) in self._sharded_tables), None)
+        if sharded is None:
+            return None
+        tenant_id = _current_tenant.get()
+        if tenant_id is None:
+            raise RuntimeError(f"Statements on the sharded table {sharded} need a tenant, see SqlAlchemy.tenant")
+        return self.shards[self.shard_for(tenant_id)]
+
+    def _tenant_tables(self) -> list[Table]:
+        return [table for table in self._model.metadata.sorted_tables if table.name in self._sharded_tables]
+
+    async def copy_tenant(self, tenant_id: Any, source: str, target: str, batch_size: int = 1000) -> dict[str, int]:
+        """
+        Copy a tenant's rows of every sharded table from one shard to another.
+
+        Rows are streamed from ``source`` ``batch_size`` at a time and upserted into ``target`` on
+        their primary key, one transaction per batch, so an interrupted copy can simply be run
+        again. Writes of the tenant should be paused until it is mapped to ``target``.
+
+        :param tenant_id: The tenant, as stored in the ``tenant_id`` columns.
+        :param source: Name of the shard the tenant lives on.
+        :param target: Name of the shard to copy to.
+        :param batch_size: Rows read and written per round trip.
+        :return: The number of rows copied per table.
+        """
+        reader_engine, writer_engine = self.shards[source], self.shards[target]
+        copied: dict[str, int] = {}
+        for table in self._tenant_tables():
+            key = [column.name for column in table.primary_key.columns]
+            values = [column.name for column in table.c if not column.primary_key]
+            upsert = self._upsert_statement(table, writer_engine.dialect.name, key, values)
+            copied[table.name] = 0
+            stmt = select(table).where(table.c.tenant_id == tenant_id).execution_options(yield_per=batch_size)
+            async with reader_engine.connect() as reader, writer_engine.connect() as writer:
+                result = await reader.stream(stmt)
+                async for rows in result.mappings().partitions(batch_size):
+                    await writer.execute(upsert, [dict(row) for row in rows])
+                    await writer.commit()
+                    copied[table.name] += len(rows)
+        return copied
+
+    async def delete_tenant(self, tenant_id: Any, shard: str) -> dict[str, int]:
+        """Delete a tenant's rows of every sharded table from ``shard``, in one transaction."""
+        deleted: dict[str, int] = {}
+        async with self.shards[shard].begin() as conn:
+            for table in reversed(self._tenant_tables()):
+                result = await conn.execute(delete(table).where(table.c.tenant_id == tenant_id))
+                deleted[table.name] = result.rowcount
+        return deleted
+
+    @property
+    def replicas(self) -> list[AsyncEngine]:
+        return [replica.engine for replica in self._replicas]
+
+    def use_primary(self) -> None:
+        """Send every statement of the current session to the primary, e.g. right after a write elsewhere."""
+        self._session().info[_PRIMARY_KEY] = True
+
+    def pick_replica(self) -> AsyncEngine:
+        """
+        The engine the next read-only statement should run on.
+
+        Replicas lagging more than ``SQLALCHEMY_REPLICA_MAX_LAG`` seconds, or failing their health
+        check, are skipped until a later check finds them caught up; without a usable replica
+        reads fall back to the primary.
+        """
+        self._schedule_replica_check()
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return self._engine
+        if self._replica_strategy == "least_busy":
+            return min(healthy, key=lambda replica: getattr(replica.engine.pool, "checkedout", lambda: 0)()).engine
+        return healthy[next(self._replica_cycle) % len(healthy)].engine
+
+    def _schedule_replica_check(self) -> None:
+        if self._replica_check is not None and not self._replica_check.done():
+            return
+        if time.monotonic() - self._replica_checked_at < self._replica_check_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._replica_checked_at = time.monotonic()
+        self._replica_check = loop.create_task(self.check_replicas())
+
+    async def check_replicas(self) -> list[dict[str, Any]]:
+        """Measure the replication lag of every replica and mark the ones that may serve reads."""
+        for replica in self._replicas:
+            lag_sql = _REPLICA_LAG_SQL.get(replica.engine.dialect.name, "SELECT 0")
+            try:
+                async with replica.engine.connect() as conn:
+                    replica.lag = float(await conn.scalar(text(lag_sql)) or 0)
+                replica.error = None
+            except Exception as e:
+                replica.lag, replica.error = None, str(e)
+                logger.warning(f"Replica {replica.engine.url.host} failed its health check: {e}")
+            replica.healthy = replica.lag is not None and replica.lag <= self._replica_max_lag
+        self._replica_checked_at = time.monotonic()
+        return self.replica_status()
+
+    def replica_status(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "lag": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self._replicas
+        ]
+
+    def _install_query_recorder(self, app: Quart) -> None:
+        """
+        Record the statements each request runs, on the primary and on every replica.
+
+        Statements slower than ``SQLALCHEMY_SLOW_QUERY_MS`` are logged with the request id as they
+        finish. When the request ends, SELECT shapes repeated ``SQLALCHEMY_N_PLUS_ONE_THRESHOLD``
+        times or more are logged as likely N+1 patterns, and the totals are added to the
+        ``Server-Timing`` header and kept for ``/sql-stats``.
+        """
+        self._slow_query = app.config.setdefault("SQLALCHEMY_SLOW_QUERY_MS", 200) / 1000
+        self._n_plus_one_threshold = app.config.setdefault("SQLALCHEMY_N_PLUS_ONE_THRESHOLD", 5)
+        self._slowest_kept = app.config.setdefault("SQLALCHEMY_SLOWEST_PER_REQUEST", 5)
+        for _, async_engine in self.named_engines():
+            event.listen(async_engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(async_engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+        @app.before_request
+        async def start_query_stats() -> None:
+            _query_stats.set(QueryStats())
+
+        app.after_request(self._report_query_stats)
+
+        @app.route("/sql-stats")
+        @hide
+        async def get_sql_stats() -> tuple[dict[str, Any], int]:
+            recent = list(self._recent_requests)
+            reponse_ = {
+                "pid": os.getpid(),
+                "requests": len(recent),
+                "queries": sum(item["queries"] for item in recent),
+                "db_ms": round(sum(item["db_ms"] for item in recent), 3),
+                "n_plus_one": [item for item in recent if item["n_plus_one"]],
+                "recent": recent[::-1],
+            }
+            return reponse_, 200
+
+    @staticmethod
+    def _before_cursor_execute(conn: Any, *_: Any) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn: Any, _: Any, statement: str, *__: Any) -> None:
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(statement, duration, self._slowest_kept)
+        if duration >= self._slow_query:
+            request_id = get_request_id() if has_app_context() else "-"
+            logger.warning(f"[{request_id}] Slow query {duration * 1000:.1f} ms: {_WHITESPACE_RE.sub(' ', statement)}")
+
+    async def _report_query_stats(self, response: Response) -> Response:
+        stats = _query_stats.get()
+        if stats is None:
+            return response
+        _query_stats.set(None)
+        timing = f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries"'
+        existing = response.headers.get("Server-Timing")
+        response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+        self._remember(stats, get_request_id(), request.method, request.path, response.status_code)
+        return response
+
+    def _remember(self, stats: QueryStats, request_id: str, method: str, path: str, status: int) -> None:
+        repeated = stats.repeated(self._n_plus_one_threshold)
+        for shape, count in repeated.items():
+            logger.warning(f"[{request_id}] Likely N+1 in {method} {path}, {count}x: {shape}")
+        if stats.count:
+            self._recent_requests.append(
+                {
+                    "request_id": request_id,
+                    "method": method,
+                    "path": path,
+                    "status": status,
+                    **stats.summary(),
+                    "n_plus_one": repeated,
+                }
+            )
+
+    def record_stream(self, body: AsyncIterator[T], status: int = 200) -> AsyncIterator[T]:
+        """
+        Record the statements a streamed response body runs.
+
+        A streamed body runs after the response headers were sent, so its statements cannot be in
+        the ``Server-Timing`` header, which only counts those run before the body. Wrapped by this
+        method, they are kept for ``/sql-stats`` as an entry of their own, its path suffixed with
+        `` (body)``, once the body is exhausted or closed. Outside a recorded request the body is
+        returned as is.
+        """
+        if _query_stats.get() is None:
+            return body
+        return self._record_stream(body, get_request_id(), request.method, f"{request.path} (body)", status)
+
+    async def _record_stream(
+        self, body: AsyncIterator[T], request_id: str, method: str, path: str, status: int
+    ) -> AsyncIterator[T]:
+        stats = QueryStats()
+        try:
+            while True:
+                # only the body's own steps are counted, not whatever the server does between them
+                token = _query_stats.set(stats)
+                try:
+                    item = await body.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _query_stats.reset(token)
+                yield item
+        finally:
+            aclose = getattr(body, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._remember(stats, request_id, method, path, status)
+
     def _apply_driver_defaults(self, options: dict[str, Any], app: Quart) -> None:
         url = engine.make_url(options["url"])
 
@@ -84,8 +918,33 @@ class SqlAlchemy:
             if "charset" not in url.query:
                 options["url"] = url.update_query_dict({"charset": "utf8mb4"})
 
+    def _task_scope(self) -> Hashable:
+        """
+        Scope sessions to the running asyncio task.
+
+        Quart serves every request in its own task, so each request, and each background task it
+        spawns, gets its own session. Sessions only check a connection out of the pool on first
+        use; a request's session is closed at app context teardown and any other task's session
+        when the task finishes. Code running outside an event loop is scoped to its thread.
+        """
+        task = _current_task()
+        if task is None:
+            return threading.get_ident()
+        if task not in self._scoped_tasks:
+            self._scoped_tasks.add(task)
+            task.add_done_callback(self._release_task_session)
+        return task
+
+    def _release_task_session(self, task: asyncio.Task) -> None:
+        session = self._session.registry.registry.pop(task, None)
+        if session is None:
+            return
+        closing = task.get_loop().create_task(session.close())
+        self._closing.add(closing)
+        closing.add_done_callback(self._closing.discard)
+
     def _make_scoped_session(self, options: dict[str, Any]) -> async_scoped_session[AsyncSession]:
-        scope = options.pop("scopefunc", _app_ctx_id)
+        scope = options.pop("scopefunc", self._task_scope)
         options.setdefault("expire_on_commit", False)
         factory = async_sessionmaker(bind=self._engine, class_=AsyncSession, **options)
         return async_scoped_session(factory, scope)
@@ -101,7 +960,13 @@ class SqlAlchemy:
     async def create_all(self) -> None:
         async with self._engine.begin() as conn:
             await conn.run_sync(self._model.metadata.create_all)
+        for shard in self._shards.values():
+            async with shard.begin() as conn:
+                await conn.run_sync(self._model.metadata.create_all, tables=self._tenant_tables())
 
     async def drop_all(self) -> None:
         async with self._engine.begin() as conn:
             await conn.run_sync(self._model.metadata.drop_all)
+        for shard in self._shards.values():
+            async with shard.begin() as conn:
+                await conn.run_sync(self._model.metadata.drop_all, tables=self._tenant_tables())
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import date, datetime
+from functools import partial
+from typing import Any, Protocol, TypeVar
+
+from quart import Quart
+from quart_schema import hide
+from sqlalchemy import inspect, orm
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CacheBackend(Protocol):
+    """Where :class:`EntityCache` keeps loaded entities; a missing or expired key reads as None."""
+
+    async def get(self, key: str) -> Any | None: ...
+
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def close(self) -> None: ...
+
+    def stats(self) -> dict[str, Any]: ...
+
+
+class MemoryBackend:
+    """
+    In-process LRU of at most ``max_entries`` entries, each expiring ``ttl`` seconds after it was set.
+
+    Entries are shared by reference: callers must treat cached entities as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._evictions = 0
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "evictions": self._evictions}
+
+
+class EntityCodec:
+    """
+    JSON encoding of cached entities, safe to read back from a server other processes write to.
+
+    Mapped model instances are stored as their class name and column values and rebuilt as
+    detached instances of the classes of ``models``; UUIDs and datetimes are tagged so they come
+    back with their type. Anything else JSON cannot represent is refused when it is stored.
+    """
+
+    def __init__(self, models: orm.registry | None = None) -> None:
+        self._models = models
+        self._classes: dict[str, type] | None = None
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=self._encode, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=self._decode)
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        if isinstance(value, uuid.UUID):
+            return {"$uuid": str(value)}
+        if isinstance(value, datetime):
+            return {"$datetime": value.isoformat()}
+        if isinstance(value, date):
+            return {"$date": value.isoformat()}
+        state = inspect(value, raiseerr=False)
+        if state is not None and getattr(state, "mapper", None) is not None:
+            values = {attr.key: getattr(value, attr.key) for attr in state.mapper.column_attrs}
+            return {"$entity": type(value).__name__, "values": values}
+        raise TypeError(f"{type(value).__name__} cannot be cached as JSON")
+
+    def _decode(self, value: dict[str, Any]) -> Any:
+        if len(value) == 1:
+            if "$uuid" in value:
+                return uuid.UUID(value["$uuid"])
+            if "$datetime" in value:
+                return datetime.fromisoformat(value["$datetime"])
+            if "$date" in value:
+                return date.fromisoformat(value["$date"])
+        if "$entity" in value and "values" in value:
+            cls = self._model(value["$entity"])
+            return cls(**value["values"])
+        return value
+
+    def _model(self, name: str) -> type:
+        if self._classes is None:
+            # mappers are only all known once the models were imported, resolved on first use
+            mappers = self._models.mappers if self._models is not None else ()
+            self._classes = {mapper.class_.__name__: mapper.class_ for mapper in mappers}
+        cls = self._classes.get(name)
+        if cls is None:
+            raise ValueError(f"Unknown cached entity {name}")
+        return cls
+
+
+class RedisBackend:
+    """
+    Entities stored as JSON in a Redis compatible server shared by every process, so a write in
+    one process invalidates the entry for all of them.
+
+    Needs the optional ``redis`` package, ``pip install workflow[redis]``. Any server speaking the
+    protocol works, a local ``redis-server`` or ``valkey-server`` stands in for the shared one in
+    development. Entries are encoded by :class:`EntityCodec`, never unpickled, so whoever can
+    write to the server cannot run code in the application. Errors reaching the server, and
+    entries that do not decode, are logged and read as misses, the database stays the source of
+    truth.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "entity:",
+        client: Any = None,
+        models: orm.registry | None = None,
+    ) -> None:
+        if client is None:
+            try:
+                from redis.asyncio import Redis  # noqa: PLC0415
+            except ImportError as e:
+                raise RuntimeError("The redis entity cache backend needs the redis package") from e
+            client = Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._codec = EntityCodec(models)
+        self._errors = 0
+
+    async def get(self, key: str) -> Any | None:
+        try:
+            data = await self._client.get(self._prefix + key)
+            return None if data is None else self._codec.loads(data)
+        except Exception as e:
+            self._failed("get", e)
+            return None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            await self._client.set(self._prefix + key, self._codec.dumps(value), px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            self._failed("set", e)
+
+    async def delete(self, *keys: str) -> None:
+        try:
+            await self._client.delete(*(self._prefix + key for key in keys))
+        except Exception as e:
+            self._failed("delete", e)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self._errors += 1
+        logger.warning(f"Entity cache {operation} failed: {error!r}")
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "redis", "errors": self._errors}
+
+
+class EntityCache:
+    """
+    Read-through cache of model lookups by primary key.
+
+    A miss runs the loader once, however many callers ask for the same key at the same time:
+    the first caller starts the load in its own task and the others wait on it. Writers call
+    :meth:`invalidate` after committing; a load already in flight for an invalidated key still
+    answers its callers but is not stored, as it may have read the row before the write.
+    None results are never stored.
+    """
+
+    def __init__(self, backend: CacheBackend | None = None, ttl: float = 10.0, enabled: bool = True) -> None:
+        self._backend: CacheBackend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.enabled = enabled
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._counters = dict.fromkeys(("hits", "misses", "coalesced", "invalidations"), 0)
+
+    def configure(self, backend: CacheBackend, ttl: float, enabled: bool = True) -> None:
+        self._backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._inflight.clear()
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend
+
+    @staticmethod
+    def key(kind: str, ident: Hashable) -> str:
+        return f"{kind}:{ident}"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the cached value of ``key``, loading and caching it on a miss.
+
+        :param key: The cache key, see :meth:`key`.
+        :param loader: Coroutine function reading the entity from the database.
+        """
+        if not self.enabled:
+            return await loader()
+        value = await self._backend.get(key)
+        if value is not None:
+            self._counters["hits"] += 1
+            return value
+        flight = self._inflight.get(key)
+        if flight is None:
+            self._counters["misses"] += 1
+            # the load runs in its own task so a cancelled caller does not fail the others
+            flight = asyncio.create_task(self._load(key, loader), name=f"entity-cache-load-{key}")
+            flight.add_done_callback(partial(self._finish_flight, key))
+            self._inflight[key] = flight
+        else:
+            self._counters["coalesced"] += 1
+        return await asyncio.shield(flight)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[T]]) -> T:
+        value = await loader()
+        if value is not None and self._inflight.get(key) is asyncio.current_task():
+            await self._backend.set(key, value, self.ttl)
+        return value
+
+    def _finish_flight(self, key: str, flight: asyncio.Task) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.cancelled():
+            flight.exception()
+
+    async def invalidate(self, *keys: str) -> None:
+        if not self.enabled or not keys:
+            return
+        for key in keys:
+            self._inflight.pop(key, None)
+        self._counters["invalidations"] += len(keys)
+        await self._backend.delete(*keys)
+
+    def stats(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, "ttl": self.ttl, **self._counters, **self._backend.stats()}
+
+
+entity_cache = EntityCache()
+
+
+def configure_entity_cache(app: Quart) -> None:
+    if app.config.get("ENTITY_CACHE_BACKEND", "memory") == "redis":
+        sqlalchemy = app.extensions.get("sqlalchemy")
+        backend = RedisBackend(
+            app.config.get("ENTITY_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            models=sqlalchemy.Model.registry if sqlalchemy is not None else None,
+        )
+    else:
+        backend = MemoryBackend(app.config.get("ENTITY_CACHE_MAX_ENTRIES", 10000))
+    entity_cache.configure(
+        backend,
+        ttl=app.config.get("ENTITY_CACHE_TTL", 10.0),
+        enabled=app.config.get("ENTITY_CACHE_ENABLED", True),
+    )
+
+    @app.after_serving
+    async def close_entity_cache() -> None:
+        await entity_cache.backend.close()
+
+    @app.route("/entity-cache-info")
+    @hide
+    async def get_entity_cache_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **entity_cache.stats()}
+        return reponse_, 200
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from quart import Quart
+
+_PAGES_RE = re.compile(rb"^Pages:\s+(\d+)", re.MULTILINE)
+
+
+class PdfExtractionError(Exception):
+    """Raised when poppler fails or times out on a document."""
+
+
+@dataclass(slots=True, frozen=True)
+class PageText:
+    page: int
+    text: str
+
+
+class PdfTextExtractor:
+    """
+    Extracts PDF text with poppler, fanning each document out over page ranges.
+
+    A document is split into ranges of ``pages_per_task`` pages, each handled by its own
+    ``pdftotext`` process. At most ``workers`` processes run at once across the whole worker,
+    and only a bounded window of ranges is in flight per document, so pages are yielded in
+    order as soon as they are ready without holding the whole document in memory.
+
+    Poppler only takes a document password on its command line, where any local user can read
+    it. A password protected document is therefore decrypted first by ``qpdf``, which reads the
+    password from its stdin, into a private temporary directory that is removed once the
+    document has been read; poppler then runs on the decrypted copy without a password.
+    """
+
+    # Bump whenever the extraction output changes, cached text is keyed on it.
+    VERSION = "pdftotext-1"
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        pages_per_task: int = 8,
+        timeout: float = 120,
+        layout: bool = True,
+        poppler_path: str | None = None,
+    ) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.timeout = timeout
+        self.layout = layout
+        self._poppler_path = poppler_path
+        self._slots = asyncio.Semaphore(self.workers)
+
+    @property
+    def cache_version(self) -> str:
+        """Identifies the text this extractor produces, layout mode changes the output."""
+        return f"{self.VERSION}-{'layout' if self.layout else 'raw'}"
+
+    def _binary(self, name: str) -> str:
+        binary = shutil.which(name, path=self._poppler_path)
+        if binary is None:
+            package = "qpdf" if name == "qpdf" else "poppler-utils"
+            raise PdfExtractionError(f"{name} not found, install {package} or set POPPLER_PATH")
+        return binary
+
+    async def _run(self, name: str, *args: str, stdin: bytes | None = None, accept: tuple[int, ...] = (0,)) -> bytes:
+        async with self._slots:
+            process = await asyncio.create_subprocess_exec(
+                self._binary(name),
+                *args,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(stdin), self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                process.kill()
+                await process.wait()
+                raise
+        if process.returncode not in accept:
+            raise PdfExtractionError(f"{name} exited with {process.returncode}: {stderr.decode(errors='replace')}")
+        return stdout
+
+    @asynccontextmanager
+    async def decrypted(self, path: Path, password: str | None) -> AsyncIterator[Path]:
+        """
+        The path of a copy of ``path`` poppler can read without a password.
+
+        Unprotected documents are used in place. The decrypted copy is removed on exit.
+        """
+        if not password:
+            yield path
+            return
+        folder = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="pdf-"))
+        target = folder / "decrypted.pdf"
+        try:
+            try:
+                # qpdf exits with 3 when it succeeded with warnings
+                await self._run(
+                    "qpdf",
+                    "--password-file=-",
+                    "--decrypt",
+                    str(path),
+                    str(target),
+                    stdin=password.encode() + b"\n",
+                    accept=(0, 3),
+                )
+            except asyncio.TimeoutError as e:
+                raise PdfExtractionError(f"qpdf timed out on {path}") from e
+            yield target
+        finally:
+            await asyncio.to_thread(shutil.rmtree, folder, True)
+
+    async def page_count(self, path: Path) -> int:
+        try:
+            output = await self._run("pdfinfo", str(path))
+        except asyncio.TimeoutError as e:
+            raise PdfExtractionError(f"pdfinfo timed out on {path}") from e
+        match = _PAGES_RE.search(output)
+        if match is None:
+            raise PdfExtractionError(f"pdfinfo reported no page count for {path}")
+        return int(match.group(1))
+
+    async def extract_range(self, path: Path, first: int, last: int) -> list[str]:
+        """Text of pages ``first`` to ``last`` (1 based, inclusive), one string per page."""
+        args = ["-f", str(first), "-l", str(last), "-enc", "UTF-8"]
+        if self.layout:
+            args.append("-layout")
+        try:
+            output = await self._run("pdftotext", *args, str(path), "-")
+        except asyncio.TimeoutError as e:
+            raise PdfExtractionError(f"pdftotext timed out on pages {first}-{last} of {path}") from e
+        # pdftotext terminates every page with a form feed
+        pages = output.decode("utf-8", errors="replace").split("\f")
+        count = last - first + 1
+        return (pages + [""] * count)[:count]
+
+    async def iter_pages(self, path: Path, password: str | None = None) -> AsyncIterator[PageText]:
+        """Yield the text of every page of ``path`` in page order, decrypting it first if ``password`` is set."""
+        async with self.decrypted(path, password) as source:
+            async for page in self._iter_pages(source):
+                yield page
+
+    async def _iter_pages(self, path: Path) -> AsyncIterator[PageText]:
+        total = await self.page_count(path)
+        ranges = iter(
+            [(first, min(first + self.pages_per_task - 1, total)) for first in range(1, total + 1, self.pages_per_task)]
+        )
+        window: deque[tuple[int, asyncio.Task[list[str]]]] = deque()
+
+        def schedule() -> None:
+            page_range = next(ranges, None)
+            if page_range is not None:
+                window.append((page_range[0], asyncio.create_task(self.extract_range(path, *page_range))))
+
+        for _ in range(2 * self.workers):
+            schedule()
+        try:
+            while window:
+                first, task = window.popleft()
+                texts = await task
+                schedule()
+                for offset, text in enumerate(texts):
+                    yield PageText(page=first + offset, text=text)
+        finally:
+            for _, task in window:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in window), return_exceptions=True)
+
+
+def configure_extraction(app: Quart) -> None:
+    app.extensions["pdf_extractor"] = PdfTextExtractor(
+        workers=app.config.get("EXTRACTION_WORKERS") or None,
+        pages_per_task=app.config.get("EXTRACTION_PAGES_PER_TASK", 8),
+        timeout=app.config.get("EXTRACTION_TIMEOUT", 120),
+        layout=app.config.get("EXTRACTION_LAYOUT", True),
+        poppler_path=app.config.get("POPPLER_PATH") or os.environ.get("POPPLER_PATH") or None,
+    )
@@ -1,9 +1,12 @@
 import os
 import threading
+from typing import Any
 
 from quart import Quart
 from quart_schema import hide
 
+from .pool_metrics_extn import PoolMetrics, render_prometheus
+
 
 def configure_heath_checkup(app: Quart) -> None:
     @app.route("/health")
@@ -44,18 +47,30 @@ def configure_thread_checkup(app: Quart) -> None:
 
 
 def configure_db_checkup(app: Quart) -> None:
+    from database import db
+
+    pools = [PoolMetrics(async_engine, name) for name, async_engine in db.named_engines()]
+    app.extensions["db_pool_metrics"] = pools
+    engine_options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+
     @app.route("/db-pool-info")
     @hide
-    def get_dbpool_info() -> tuple[dict[str, str], int]:
-        from database import db
-
+    async def get_dbpool_info() -> tuple[dict[str, Any], int]:
+        timeout = getattr(db.engine.pool, "timeout", None)
+        primary = pools[0].gauges()
         reponse_ = {
             "pid": os.getpid(),
-            "pool_size": db.engine.pool.size(),
-            "checked_in_connections": db.engine.pool.checkedin(),
-            "checked_out_connections": db.engine.pool.checkedout(),
-            "overflow_connections": db.engine.pool.overflow(),
-            "connection_timeout": db.engine.pool.timeout(),
-            "recycle_time": db.engine.pool._recycle,  # noqa: SLF001
+            "pool_size": primary.get("size"),
+            "checked_in_connections": primary.get("checkedin"),
+            "checked_out_connections": primary.get("checkedout"),
+            "overflow_connections": primary.get("overflow"),
+            "connection_timeout": timeout() if timeout is not None else None,
+            "recycle_time": engine_options.get("pool_recycle", -1),
+            "pools": [metrics.snapshot() for metrics in pools],
         }
         return reponse_, 201
+
+    @app.route("/db-pool-metrics")
+    @hide
+    async def get_dbpool_metrics() -> tuple[str, int, dict[str, str]]:
+        return render_prometheus(pools), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from stat import S_ISDIR
+from typing import Any
+
+from quart import Quart
+from quart_schema import hide
+
+from .blob_store_extn import pdf_blobs
+from .resumable_upload_extn import pdf_sessions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class SweepTarget:
+    """A directory whose top level entries expire after ``ttl`` seconds or once it grows past ``quota`` bytes."""
+
+    path: Path
+    ttl: float | None = None
+    quota: int | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class _Entry:
+    path: Path
+    mtime: float
+    size: int
+
+
+def _entry_size(entry: os.DirEntry) -> int:
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            return tree_size(entry.path)
+        return entry.stat(follow_symlinks=False).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def tree_size(path: str | os.PathLike) -> int:
+    """Bytes used by the files below ``path``, symlinks are not followed."""
+    with os.scandir(path) as entries:
+        return sum(_entry_size(entry) for entry in entries)
+
+
+def remove_tree(path: str | os.PathLike) -> int:
+    """
+    Delete a file or a whole directory tree and return the number of bytes reclaimed.
+
+    Blocking, meant to be run off the event loop in a single call per tree.
+    """
+    target = Path(path)
+    try:
+        stat = target.lstat()
+    except FileNotFoundError:
+        return 0
+    if not S_ISDIR(stat.st_mode):
+        target.unlink(missing_ok=True)
+        return stat.st_size
+
+    reclaimed = 0
+    with os.scandir(target) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                reclaimed += remove_tree(entry.path)
+            else:
+                reclaimed += _entry_size(entry)
+                Path(entry.path).unlink(missing_ok=True)
+    target.rmdir()
+    return reclaimed
+
+
+def _scan(root: Path) -> list[_Entry]:
+    found: list[_Entry] = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    size = tree_size(entry.path) if entry.is_dir(follow_symlinks=False) else stat.st_size
+                except FileNotFoundError:
+                    continue
+                found.append(_Entry(Path(entry.path), stat.st_mtime, size))
+    except FileNotFoundError:
+        pass
+    return found
+
+
+class Housekeeper:
+    """
+    Background sweeper for abandoned upload files and temporary directories.
+
+    Every ``interval`` seconds each target is scanned and its expired entries, then its oldest
+    entries while it is over quota, are deleted. Each entry is removed in a single off-loop call
+    and the sweeper pauses ``pause`` seconds between deletions so it never competes with request
+    I/O for long. Stored blobs are never a target, only their ``incoming`` staging directory; the
+    ``orphans`` callable, given the sweep time, returns the stored blobs no document points at.
+    """
+
+    def __init__(
+        self,
+        targets: Callable[[], list[SweepTarget]],
+        interval: float = 600,
+        pause: float = 0.05,
+        orphans: Callable[[float], Awaitable[list[Path]]] | None = None,
+    ) -> None:
+        self._targets = targets
+        self._orphans = orphans
+        self.interval = interval
+        self.pause = pause
+        self._task: asyncio.Task | None = None
+        self._sweeps = 0
+        self._removed = 0
+        self._errors = 0
+        self._reclaimed = 0
+        self._orphans_removed = 0
+        self._last: dict[str, Any] = {}
+
+    @staticmethod
+    def _select(entries: list[_Entry], target: SweepTarget, now: float) -> list[_Entry]:
+        expired = [entry for entry in entries if target.ttl is not None and entry.mtime < now - target.ttl]
+        if target.quota is not None:
+            kept = sorted((entry for entry in entries if entry not in expired), key=lambda entry: entry.mtime)
+            used = sum(entry.size for entry in kept)
+            while kept and used > target.quota:
+                oldest = kept.pop(0)
+                used -= oldest.size
+                expired.append(oldest)
+        return expired
+
+    async def sweep(self) -> dict[str, Any]:
+        started = time.perf_counter()
+        now = time.time()
+        paths = []
+        for target in self._targets():
+            entries = await asyncio.to_thread(_scan, target.path)
+            paths.extend(entry.path for entry in self._select(entries, target, now))
+        removed, reclaimed, errors = await self._remove(paths)
+
+        orphans_removed = 0
+        if self._orphans is not None:
+            try:
+                orphans = await self._orphans(now)
+            except Exception as e:
+                orphans = []
+                errors += 1
+                logger.error(f"Housekeeping could not list unreferenced blobs: {e}")
+            orphans_removed, orphans_reclaimed, orphans_errors = await self._remove(orphans)
+            removed += orphans_removed
+            reclaimed += orphans_reclaimed
+            errors += orphans_errors
+
+        self._sweeps += 1
+        self._removed += removed
+        self._reclaimed += reclaimed
+        self._errors += errors
+        self._orphans_removed += orphans_removed
+        self._last = {
+            "removed": removed,
+            "orphan_blobs_removed": orphans_removed,
+            "bytes_reclaimed": reclaimed,
+            "errors": errors,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "finished_at": time.time(),
+        }
+        logger.info(
+            f"Housekeeping sweep removed {removed} entries, reclaimed {reclaimed} bytes "
+            f"in {self._last['duration_ms']} ms"
+        )
+        return self._last
+
+    async def _remove(self, paths: list[Path]) -> tuple[int, int, int]:
+        removed = reclaimed = errors = 0
+        for path in paths:
+            try:
+                reclaimed += await asyncio.to_thread(remove_tree, path)
+                removed += 1
+            except OSError as e:
+                errors += 1
+                logger.error(f"Housekeeping could not remove {path}: {e}")
+            if self.pause:
+                await asyncio.sleep(self.pause)
+        return removed, reclaimed, errors
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Housekeeping sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="housekeeping")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "sweeps": self._sweeps,
+            "removed": self._removed,
+            "orphan_blobs_removed": self._orphans_removed,
+            "bytes_reclaimed": self._reclaimed,
+            "errors": self._errors,
+            "last_sweep": self._last,
+        }
+
+
+def configure_housekeeping(app: Quart) -> None:
+    ttl = app.config.get("HOUSEKEEPING_TTL", 86400)
+
+    def targets() -> list[SweepTarget]:
+        # resolved per sweep, the upload destination is only known inside an app context
+        quota = app.config.get("HOUSEKEEPING_TEMP_QUOTA", 1073741824)
+        return [
+            SweepTarget(pdf_blobs.incoming, ttl=ttl),
+            SweepTarget(pdf_sessions.root, ttl=ttl),
+            *(
+                SweepTarget(Path(folder), ttl=ttl, quota=quota)
+                for folder in app.config.get("HOUSEKEEPING_TEMP_DIRS", [])
+            ),
+        ]
+
+    orphan_ttl = app.config.get("HOUSEKEEPING_ORPHAN_BLOB_TTL", 86400)
+
+    async def orphans(now: float) -> list[Path]:
+        # blobs of failed or deleted uploads, and of multipart uploads never registered as a document
+        from database.models import Document
+
+        stored = await asyncio.to_thread(pdf_blobs.stored, now - orphan_ttl)
+        referenced = await Document.referenced_hashes(list(stored))
+        return [path for content_hash, path in stored.items() if content_hash not in referenced]
+
+    housekeeper = Housekeeper(
+        targets,
+        interval=app.config.get("HOUSEKEEPING_INTERVAL", 600),
+        pause=app.config.get("HOUSEKEEPING_DELETE_PAUSE", 0.05),
+        orphans=orphans if "sqlalchemy" in app.extensions else None,
+    )
+    app.extensions["housekeeping"] = housekeeper
+
+    if app.config.get("CLEANUP_TEMP_FILES", True):
+
+        @app.before_serving
+        async def start_housekeeping() -> None:
+            housekeeper.start()
+
+        @app.after_serving
+        async def stop_housekeeping() -> None:
+            await housekeeper.stop()
+
+    @app.route("/housekeeping-info")
+    @hide
+    async def get_housekeeping_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **housekeeper.stats()}
+        return reponse_, 200
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from datetime import datetime
+from typing import Any
+
+from quart import Quart
+from quart_schema import hide
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r"{([a-z]+)}")
+
+Fetch = Callable[[datetime | None, Sequence[str]], Awaitable[Sequence[Any]]]
+
+
+class MessageTemplate:
+    """
+    A message text parsed once into a ``%`` format string over its ``{name}`` placeholders.
+
+    Formatting is then a single C level substitution. Parameters missing from the call keep
+    their placeholder, extra ones are ignored.
+    """
+
+    __slots__ = ("_format", "parameters", "text")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.parameters = frozenset(PLACEHOLDER_PATTERN.findall(text))
+        self._format = PLACEHOLDER_PATTERN.sub(r"%(\1)s", text.replace("%", "%%")) if self.parameters else None
+
+    def format(self, params: dict[str, Any]) -> str:
+        if self._format is None:
+            return self.text
+        try:
+            return self._format % params
+        except KeyError:
+            return self._format % {name: params.get(name, f"{{{name}}}") for name in self.parameters}
+
+
+class MessageCatalogueCache:
+    """
+    In-process copy of the active message catalogue, indexed by language then code.
+
+    ``reload`` reads the catalogue in one query; ``refresh`` then only reads the messages updated
+    since the largest ``updated_at`` seen so far, the catalogue version. Each read builds new
+    per-language dicts and swaps them in, so lookups never wait and never see half a refresh.
+    A message deleted from the table, rather than deactivated, stays cached until the next reload.
+    """
+
+    def __init__(self, fetch: Fetch | None = None, fallback_language: str = "en-US", interval: float = 30.0) -> None:
+        self._fetch = fetch
+        self.fallback_language = fallback_language
+        self.interval = interval
+        self.languages: tuple[str, ...] = ()
+        self.version: datetime | None = None
+        self._messages: dict[str, dict[str, MessageTemplate]] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._counters = dict.fromkeys(("reloads", "refreshes", "changes", "misses", "errors"), 0)
+
+    def configure(
+        self, fetch: Fetch, languages: Sequence[str] = (), fallback_language: str = "en-US", interval: float = 30.0
+    ) -> None:
+        self._fetch = fetch
+        self.languages = tuple(languages)
+        self.fallback_language = fallback_language
+        self.interval = interval
+        self.version = None
+        self._messages = {}
+
+    def get(self, code: str, language: str) -> MessageTemplate | None:
+        """The template of ``code`` in ``language``, else in the fallback language, else None."""
+        template = self._messages.get(language, {}).get(code)
+        if template is None:
+            template = self._messages.get(self.fallback_language, {}).get(code)
+            if template is None:
+                self._counters["misses"] += 1
+        return template
+
+    def format(self, code: str, language: str, **params: Any) -> str:
+        """
+        The text of ``code`` in ``language`` with its placeholders substituted.
+
+        :param code: The message code.
+        :param language: The preferred language, the fallback language is used when it lacks the message.
+        :param params: Values of the ``{name}`` placeholders.
+        :return: The formatted text, or the code itself for an unknown message.
+        """
+        template = self.get(code, language)
+        return code if template is None else template.format(params)
+
+    async def reload(self) -> int:
+        """Read the whole catalogue again, returns the number of active messages."""
+        async with self._lock:
+            await self._read(None, {})
+            self._counters["reloads"] += 1
+        return sum(len(messages) for messages in self._messages.values())
+
+    async def refresh(self) -> int:
+        """Apply the messages changed since the catalogue version, returns how many changed."""
+        async with self._lock:
+            changes = await self._read(self.version, self._messages)
+            self._counters["refreshes"] += 1
+        return changes
+
+    async def _read(self, version: datetime | None, current: dict[str, dict[str, MessageTemplate]]) -> int:
+        if self._fetch is None:
+            raise RuntimeError("The message catalogue is not configured")
+        rows = await self._fetch(version, self.languages)
+        changed = [row for row in rows if self._differs(current, row)]
+        if changed or current is not self._messages:
+            updated = {language: dict(messages) for language, messages in current.items()}
+            for row in changed:
+                messages = updated.setdefault(row.language, {})
+                if row.isactive:
+                    messages[row.code] = MessageTemplate(row.text)
+                else:
+                    messages.pop(row.code, None)
+            self._messages = updated
+        self.version = max((row.updated_at for row in rows), default=version)
+        self._counters["changes"] += len(changed)
+        return len(changed)
+
+    @staticmethod
+    def _differs(messages: dict[str, dict[str, MessageTemplate]], row: Any) -> bool:
+        template = messages.get(row.language, {}).get(row.code)
+        if not row.isactive:
+            return template is not None
+        return template is None or template.text != row.text
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._counters["errors"] += 1
+                logger.error(f"Message catalogue refresh failed: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="message-catalogue-refresh")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.version.isoformat() if self.version is not None else None,
+            "languages": {language: len(messages) for language, messages in self._messages.items()},
+            "refreshing": self._task is not None and not self._task.done(),
+            **self._counters,
+        }
+
+
+message_catalogue = MessageCatalogueCache()
+
+
+def configure_message_catalogue(app: Quart) -> None:
+    from database.models import MessageCatalogue
+
+    message_catalogue.configure(
+        MessageCatalogue.changed_since,
+        languages=app.config.get("MESSAGE_CATALOGUE_LANGUAGES", []),
+        fallback_language=app.config.get("MESSAGE_CATALOGUE_FALLBACK_LANGUAGE", "en-US"),
+        interval=app.config.get("MESSAGE_CATALOGUE_REFRESH_INTERVAL", 30.0),
+    )
+    app.extensions["message_catalogue"] = message_catalogue
+
+    if app.config.get("MESSAGE_CATALOGUE_PRELOAD", True):
+
+        @app.before_serving
+        async def load_message_catalogue() -> None:
+            started = time.perf_counter()
+            try:
+                count = await message_catalogue.reload()
+            except Exception as e:
+                logger.error(f"Message catalogue could not be loaded, retrying on the next refresh: {e}")
+            else:
+                duration_ms = (time.perf_counter() - started) * 1000
+                logger.info(f"Message catalogue loaded {count} messages in {duration_ms:.1f} ms")
+            message_catalogue.start()
+
+        @app.after_serving
+        async def stop_message_catalogue() -> None:
+            await message_catalogue.stop()
+
+    @app.route("/message-catalogue-info")
+    @hide
+    async def get_message_catalogue_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **message_catalogue.stats()}
+        return reponse_, 200
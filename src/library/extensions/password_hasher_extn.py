@@ -0,0 +1,264 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import itertools
+import os
+import secrets
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Literal, TypeVar
+
+from quart import Quart
+from quart_schema import hide
+
+T = TypeVar("T")
+
+Algorithm = Literal["pbkdf2_sha256", "scrypt"]
+
+
+class HashingQueueFullError(Exception):
+    """Raised when too many password derivations are waiting; rendered as 503 with a Retry-After header."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+@dataclass(slots=True, frozen=True)
+class HashParams:
+    """
+    Key derivation algorithm and cost of one stored password, encoded as ``Account.password_params``.
+
+    ``pbkdf2_sha256$<iterations>`` or ``scrypt$<n>$<r>$<p>``. Accounts created before parameters
+    were stored have none, they were hashed with :data:`LEGACY_PARAMS`.
+    """
+
+    algorithm: Algorithm = "pbkdf2_sha256"
+    iterations: int = 600000
+    n: int = 16384
+    r: int = 8
+    p: int = 1
+
+    def encode(self) -> str:
+        if self.algorithm == "scrypt":
+            return f"scrypt${self.n}${self.r}${self.p}"
+        return f"pbkdf2_sha256${self.iterations}"
+
+    @classmethod
+    def decode(cls, encoded: str | None) -> "HashParams":
+        if not encoded:
+            return LEGACY_PARAMS
+        algorithm, *costs = encoded.split("$")
+        if algorithm == "scrypt" and len(costs) == 3:  # noqa: PLR2004
+            n, r, p = map(int, costs)
+            return cls("scrypt", n=n, r=r, p=p)
+        if algorithm == "pbkdf2_sha256" and len(costs) == 1:
+            return cls("pbkdf2_sha256", iterations=int(costs[0]))
+        raise ValueError(f"Unknown password hash parameters {encoded!r}")
+
+
+LEGACY_PARAMS = HashParams("pbkdf2_sha256", iterations=10000)
+
+
+def derive(password: str, salt: bytes, params: HashParams) -> bytes:
+    """The hex encoded key of ``password``, CPU bound; runs in the hasher's executor."""
+    if params.algorithm == "scrypt":
+        # OpenSSL refuses to allocate more than maxmem, 128 * n * r bytes plus headroom
+        key = hashlib.scrypt(
+            password.encode("utf-8"), salt=salt, n=params.n, r=params.r, p=params.p, maxmem=256 * params.n * params.r
+        )
+    else:
+        key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params.iterations)
+    return binascii.hexlify(key)
+
+
+def derive_many(passwords: Sequence[str], salts: Sequence[bytes], params: HashParams) -> list[bytes]:
+    return [derive(password, salt, params) for password, salt in zip(passwords, salts, strict=True)]
+
+
+@dataclass(slots=True, frozen=True)
+class PasswordHash:
+    """What an account stores of its password, all three strings go to the ``accounts`` row."""
+
+    password: str
+    salt: str
+    params: str
+
+
+class PasswordHasher:
+    """
+    Runs password key derivations off the event loop, in a pool of ``workers`` processes.
+
+    At most ``workers`` derivations run at once; callers beyond that wait in a queue of at most
+    ``queue_size`` entries, and further callers are refused with :class:`HashingQueueFullError`
+    rather than letting a signup or login burst queue unbounded work. New hashes use ``params``;
+    :meth:`verify` accepts any stored parameters and reports hashes made with other ones, so
+    callers can rehash them while they hold the plain password.
+    """
+
+    def __init__(
+        self,
+        params: HashParams | None = None,
+        workers: int | None = None,
+        queue_size: int = 256,
+        retry_after: int = 2,
+        executor: Literal["process", "thread"] = "process",
+    ) -> None:
+        self.params = params or HashParams()
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.executor_kind = executor
+        self._executor: Executor | None = None
+        self._slots = asyncio.Semaphore(self.workers)
+        self._waiting = 0
+        self._counters = dict.fromkeys(("hashed", "verified", "rejected_passwords", "upgrades", "queue_full"), 0)
+        self._busy = 0.0
+
+    def configure(
+        self,
+        params: HashParams,
+        workers: int | None = None,
+        queue_size: int = 256,
+        retry_after: int = 2,
+        executor: Literal["process", "thread"] = "process",
+    ) -> None:
+        if self._executor is not None:
+            raise RuntimeError("The password hasher cannot be reconfigured while its workers run")
+        self.params = params
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.executor_kind = executor
+        self._slots = asyncio.Semaphore(self.workers)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "thread":
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hasher")
+            else:
+                self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor
+
+    async def close(self) -> None:
+        """Cancel the queued derivations and wait for the running ones and the workers to exit."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._waiting >= self.queue_size:
+            self._counters["queue_full"] += 1
+            raise HashingQueueFullError(self.retry_after)
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._busy += time.perf_counter() - started
+            self._slots.release()
+
+    async def hash(self, password: str) -> PasswordHash:
+        """Hash ``password`` with a new salt and the current parameters."""
+        salt = secrets.token_bytes(16)
+        key = await self._run(derive, password, salt, self.params)
+        self._counters["hashed"] += 1
+        return self._stored(key, salt)
+
+    async def hash_many(self, passwords: Sequence[str]) -> list[PasswordHash]:
+        """
+        Hash ``passwords`` in bulk, in the order given.
+
+        The passwords are split in one slice per worker and each slice is derived in a single
+        executor call, so a bulk import pays one round trip per worker rather than per password.
+        """
+        salts = [secrets.token_bytes(16) for _ in passwords]
+        size = max(-(-len(passwords) // self.workers), 1)
+        slices = [slice(start, start + size) for start in range(0, len(passwords), size)]
+        keys = await asyncio.gather(
+            *(self._run(derive_many, passwords[part], salts[part], self.params) for part in slices)
+        )
+        self._counters["hashed"] += len(passwords)
+        return [self._stored(key, salt) for key, salt in zip(itertools.chain(*keys), salts, strict=True)]
+
+    def _stored(self, key: bytes, salt: bytes) -> PasswordHash:
+        return PasswordHash(
+            password=base64.b64encode(key).decode(),
+            salt=base64.b64encode(salt).decode(),
+            params=self.params.encode(),
+        )
+
+    async def verify(self, password: str, hashed: str, salt: str, params: str | None) -> bool:
+        """
+        Check ``password`` against a stored hash, in constant time.
+
+        :param password: The plain password to check.
+        :param hashed: The stored base64 hash.
+        :param salt: The stored base64 salt.
+        :param params: The stored parameters, None for hashes that predate them.
+        :return: Whether the password matches.
+        """
+        key = await self._run(derive, password, base64.b64decode(salt), HashParams.decode(params))
+        matched = hmac.compare_digest(base64.b64encode(key).decode(), hashed)
+        self._counters["verified" if matched else "rejected_passwords"] += 1
+        return matched
+
+    def needs_upgrade(self, params: str | None) -> bool:
+        """Whether a hash made with ``params`` should be replaced by one with the current parameters."""
+        return params != self.params.encode()
+
+    def record_upgrade(self) -> None:
+        self._counters["upgrades"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "params": self.params.encode(),
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self._waiting,
+            "busy_seconds": round(self._busy, 3),
+            **self._counters,
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+def configure_password_hasher(app: Quart) -> None:
+    password_hasher.configure(
+        HashParams(
+            algorithm=app.config.get("PASSWORD_HASH_ALGORITHM", "pbkdf2_sha256"),
+            iterations=app.config.get("PASSWORD_HASH_ITERATIONS", 600000),
+            n=app.config.get("PASSWORD_HASH_SCRYPT_N", 16384),
+            r=app.config.get("PASSWORD_HASH_SCRYPT_R", 8),
+            p=app.config.get("PASSWORD_HASH_SCRYPT_P", 1),
+        ),
+        workers=app.config.get("PASSWORD_HASH_WORKERS") or None,
+        queue_size=app.config.get("PASSWORD_HASH_QUEUE_SIZE", 256),
+        retry_after=app.config.get("PASSWORD_HASH_RETRY_AFTER", 2),
+        executor=app.config.get("PASSWORD_HASH_EXECUTOR", "process"),
+    )
+
+    @app.after_serving
+    async def stop_password_hasher() -> None:
+        await password_hasher.close()
+
+    @app.errorhandler(HashingQueueFullError)
+    async def hashing_queue_full(e: HashingQueueFullError) -> tuple[dict[str, str], int, dict[str, str]]:
+        return {"error": "Too many sign-ins in progress, please retry later."}, 503, {"Retry-After": str(e.retry_after)}
+
+    @app.route("/password-hasher-info")
+    @hide
+    async def get_password_hasher_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **password_hasher.stats()}
+        return reponse_, 200
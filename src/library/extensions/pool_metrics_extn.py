@@ -0,0 +1,227 @@
+import logging
+import time
+import weakref
+from bisect import bisect_left
+from typing import Any
+
+import sqlalchemy
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import Pool
+
+# seconds, from an idle pool handing out a connection to requests queueing for it
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HOLD_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# SQLAlchemy releases whose private Pool._do_get is known to be the whole blocking checkout
+TIMED_CHECKOUT_VERSIONS = ("2.0.",)
+
+logger = logging.getLogger(__name__)
+
+
+def checkout_timing_supported(pool: Pool) -> bool:
+    """Whether checkout waits of ``pool`` can be timed on this SQLAlchemy release."""
+    return sqlalchemy.__version__.startswith(TIMED_CHECKOUT_VERSIONS) and callable(getattr(pool, "_do_get", None))
+
+
+class Histogram:
+    """Cumulative histogram over fixed upper bounds, in the Prometheus sense."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile, None when empty or beyond the last bucket."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts, strict=False):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class PoolMetrics:
+    """
+    Continuous telemetry of one engine's connection pool, fed by SQLAlchemy pool events.
+
+    Records how long callers wait for a connection, how long they hold it, and counts
+    connections opened beyond ``pool_size``, checkout timeouts, invalidations and recycles.
+    Pool events have no hook before a checkout starts, so the wait is timed around the pool's
+    private ``_do_get``, and only on the releases of ``TIMED_CHECKOUT_VERSIONS``; the wrapper is
+    reinstalled when ``dispose`` replaces the pool. On other releases everything else is still
+    recorded from public events, but checkout waits and timeouts are not, and ``snapshot``
+    reports ``checkout_wait_timed`` false.
+    """
+
+    def __init__(self, async_engine: AsyncEngine, name: str) -> None:
+        self.name = name
+        self.sync_engine = async_engine.sync_engine
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.hold = Histogram(HOLD_BUCKETS)
+        self.counters = dict.fromkeys(
+            (
+                "checkouts",
+                "connects",
+                "overflow_connects",
+                "timeouts",
+                "invalidations",
+                "soft_invalidations",
+                "recycles",
+            ),
+            0,
+        )
+        self._connected: weakref.WeakSet[Any] = weakref.WeakSet()
+        self._invalidated: weakref.WeakSet[Any] = weakref.WeakSet()
+        event.listen(self.sync_engine, "connect", self._on_connect)
+        event.listen(self.sync_engine, "checkout", self._on_checkout)
+        event.listen(self.sync_engine, "checkin", self._on_checkin)
+        event.listen(self.sync_engine, "invalidate", self._on_invalidate)
+        event.listen(self.sync_engine, "soft_invalidate", self._on_soft_invalidate)
+        event.listen(self.sync_engine, "engine_disposed", self._on_disposed)
+        self._time_checkouts(self.sync_engine.pool)
+
+    @property
+    def pool(self) -> Pool:
+        return self.sync_engine.pool
+
+    def _time_checkouts(self, pool: Pool) -> None:
+        self.checkout_wait_timed = checkout_timing_supported(pool)
+        if not self.checkout_wait_timed:
+            logger.warning(
+                f"Checkout waits of the {self.name} pool are not timed on SQLAlchemy {sqlalchemy.__version__}"
+            )
+            return
+        do_get = pool._do_get  # noqa: SLF001
+
+        def timed_do_get() -> Any:
+            started = time.perf_counter()
+            try:
+                return do_get()
+            except exc.TimeoutError:
+                self.counters["timeouts"] += 1
+                raise
+            finally:
+                self.wait.observe(time.perf_counter() - started)
+
+        pool._do_get = timed_do_get  # noqa: SLF001
+
+    def _on_disposed(self, _: Any) -> None:
+        self._time_checkouts(self.pool)
+
+    def _on_connect(self, _: Any, record: Any) -> None:
+        self.counters["connects"] += 1
+        overflow = getattr(self.pool, "overflow", None)
+        if overflow is not None and overflow() > 0:
+            self.counters["overflow_connects"] += 1
+        # records outlive their connections, and their info is cleared on reconnect
+        if record in self._invalidated:
+            self._invalidated.discard(record)
+        elif record in self._connected:
+            self.counters["recycles"] += 1
+        self._connected.add(record)
+
+    def _on_checkout(self, _: Any, record: Any, __: Any) -> None:
+        self.counters["checkouts"] += 1
+        record.info["metrics_checkout_at"] = time.perf_counter()
+
+    def _on_checkin(self, _: Any, record: Any) -> None:
+        started = record.info.pop("metrics_checkout_at", None) if record is not None else None
+        if started is not None:
+            self.hold.observe(time.perf_counter() - started)
+
+    def _on_invalidate(self, _: Any, record: Any, __: Any) -> None:
+        self.counters["invalidations"] += 1
+        self._invalidated.add(record)
+
+    def _on_soft_invalidate(self, _: Any, record: Any, __: Any) -> None:
+        self.counters["soft_invalidations"] += 1
+        self._invalidated.add(record)
+
+    def gauges(self) -> dict[str, int]:
+        gauges = {}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(self.pool, name, None)
+            if method is not None:
+                gauges[name] = method()
+        return gauges
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "pool": self.name,
+            **self.gauges(),
+            **self.counters,
+            "checkout_wait_timed": self.checkout_wait_timed,
+            "checkout_wait_seconds": self.wait.snapshot(),
+            "hold_seconds": self.hold.snapshot(),
+        }
+
+
+_HELP = {
+    "checkouts": "Connections handed out by the pool.",
+    "connects": "DBAPI connections opened.",
+    "overflow_connects": "Connections opened beyond pool_size, within max_overflow.",
+    "timeouts": "Checkouts that gave up after pool_timeout.",
+    "invalidations": "Connections invalidated, e.g. after a disconnect or a failed pre-ping.",
+    "soft_invalidations": "Connections marked to be replaced on their next checkout.",
+    "recycles": "Connections replaced for being older than pool_recycle, or after a disconnect invalidated the pool.",
+    "size": "Configured pool_size.",
+    "checkedin": "Idle connections in the pool.",
+    "checkedout": "Connections in use.",
+    "overflow": "Current overflow; negative while fewer than pool_size connections are open.",
+}
+
+
+def _histogram_lines(name: str, help_: str, series: list[tuple[str, Histogram]]) -> list[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} histogram"]
+    for pool, histogram in series:
+        cumulative = 0
+        for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts, strict=True):
+            cumulative += count
+            lines.append(f'{name}_bucket{{pool="{pool}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{pool="{pool}"}} {histogram.total}')
+        lines.append(f'{name}_count{{pool="{pool}"}} {histogram.count}')
+    return lines
+
+
+def render_prometheus(pools: list[PoolMetrics]) -> str:
+    """All pools' metrics in the Prometheus text exposition format, labelled by pool name."""
+    lines = _histogram_lines(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a connection from the pool.",
+        [(metrics.name, metrics.wait) for metrics in pools],
+    )
+    lines += _histogram_lines(
+        "db_pool_hold_seconds",
+        "Time a connection stayed checked out.",
+        [(metrics.name, metrics.hold) for metrics in pools],
+    )
+    for counter in pools[0].counters if pools else ():
+        name = f"db_pool_{counter}_total"
+        lines += [f"# HELP {name} {_HELP[counter]}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{pool="{metrics.name}"}} {metrics.counters[counter]}' for metrics in pools]
+    for gauge in ("size", "checkedin", "checkedout", "overflow"):
+        name = f"db_pool_{gauge}"
+        samples = [(metrics.name, metrics.gauges().get(gauge)) for metrics in pools]
+        samples = [(pool, value) for pool, value in samples if value is not None]
+        if samples:
+            lines += [f"# HELP {name} {_HELP[gauge]}", f"# TYPE {name} gauge"]
+            lines += [f'{name}{{pool="{pool}"}} {value}' for pool, value in samples]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+
+from quart import current_app, request
+from quart_uploads import UploadSet
+from werkzeug.exceptions import BadRequest
+
+from .upload_extn import _PartWriter, pdf_loader
+from .upload_scheduler_extn import Offload
+
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    handle = path.open("r+b")
+    handle.seek(offset)
+    return handle
+
+
+class SessionFiles:
+    """
+    Backing files of resumable upload sessions.
+
+    Each session owns ``<destination>/sessions/<id>.part``, pre-sized to the declared length so
+    chunks can be written at any offset, in any order and from any worker.
+    """
+
+    def __init__(self, upload_set: UploadSet, folder: str = "sessions") -> None:
+        self._upload_set = upload_set
+        self._folder = folder
+
+    @property
+    def root(self) -> Path:
+        return Path(self._upload_set.config.destination) / self._folder
+
+    def path_for(self, upload_id: uuid.UUID) -> Path:
+        return self.root / f"{upload_id.hex}.part"
+
+    def allocate(self, upload_id: uuid.UUID, length: int) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self.path_for(upload_id).open("xb") as handle:
+            handle.truncate(length)
+
+    def digest(self, upload_id: uuid.UUID, block_size: int = 1048576) -> str:
+        sha256 = hashlib.sha256()
+        with self.path_for(upload_id).open("rb") as handle:
+            while block := handle.read(block_size):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def discard(self, upload_id: uuid.UUID) -> None:
+        self.path_for(upload_id).unlink(missing_ok=True)
+
+    @staticmethod
+    def offloader() -> Offload:
+        scheduler = current_app.extensions.get("upload_scheduler")
+        return scheduler.offloader() if scheduler else asyncio.to_thread
+
+    async def write_chunk(self, upload_id: uuid.UUID, offset: int, max_length: int) -> int:
+        """
+        Stream the current request body into the session file starting at ``offset``.
+
+        :param upload_id: The session the chunk belongs to.
+        :param offset: Byte position of the first byte of the body.
+        :param max_length: Bytes left before the declared end of the file.
+        :return: The number of bytes written.
+        """
+        scheduler = current_app.extensions.get("upload_scheduler")
+        if scheduler is not None:
+            scheduler.check_capacity()
+        offload = self.offloader()
+        path = self.path_for(upload_id)
+        buffer_size = current_app.config.get("UPLOADS_STREAM_BUFFER_SIZE", 1048576)
+        depth = scheduler.per_request if scheduler is not None else 1
+        writer = _PartWriter(path, await offload(_open_at, path, offset), buffer_size, offload, depth)
+        written = 0
+        try:
+            async for data in request.body:
+                written += len(data)
+                if written > max_length:
+                    raise BadRequest("Chunk runs past the declared Upload-Length.")
+                await writer.write(data)
+        finally:
+            await writer.close()
+        return written
+
+
+pdf_sessions = SessionFiles(pdf_loader)
@@ -0,0 +1,269 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, TypeVar
+
+from quart import Quart, g, request
+from quart_schema import hide
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# account_id -> (token_version, status), None for an unknown account
+LoadState = Callable[[uuid.UUID], Awaitable[tuple[int, str] | None]]
+WriteActivity = Callable[[Mapping[uuid.UUID, datetime]], Awaitable[int]]
+
+
+@dataclass(slots=True, frozen=True)
+class TokenClaims:
+    account_id: uuid.UUID
+    version: int
+    expires_at: int
+
+
+class SessionTokens:
+    """
+    Issues and validates signed session tokens.
+
+    A token is ``<account id>.<token version>.<expiry>.<nonce>.<signature>``, signed with
+    HMAC-SHA256. It is valid until its expiry while its version equals the account's
+    ``token_version``; bumping that counter revokes every token issued before.
+
+    Validated tokens are cached per process for ``cache_ttl`` seconds, in an LRU of at most
+    ``max_entries`` tokens, so an authenticated request costs a dict lookup instead of a
+    signature check and a database read. A revocation in this process applies at once, other
+    processes stop accepting the revoked tokens within ``cache_ttl``. Request activity is kept
+    in memory and written to ``last_active_at`` every ``flush_interval`` seconds in one batch.
+    """
+
+    def __init__(
+        self,
+        secret: bytes | None = None,
+        ttl: int = 86400,
+        cache_ttl: float = 60.0,
+        max_entries: int = 10000,
+        flush_interval: float = 30.0,
+    ) -> None:
+        self._secret = secret or secrets.token_bytes(32)
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._load_state: LoadState | None = None
+        self._write_activity: WriteActivity | None = None
+        self._cache: OrderedDict[str, tuple[float, TokenClaims]] = OrderedDict()
+        self._min_versions: dict[uuid.UUID, int] = {}
+        self._active: dict[uuid.UUID, datetime] = {}
+        self._task: asyncio.Task | None = None
+        self._counters = dict.fromkeys(
+            ("issued", "cache_hits", "validated", "rejected", "revoked", "flushes", "flushed_accounts", "flush_errors"),
+            0,
+        )
+
+    def configure(  # noqa: PLR0913
+        self,
+        secret: bytes,
+        load_state: LoadState,
+        write_activity: WriteActivity,
+        *,
+        ttl: int = 86400,
+        cache_ttl: float = 60.0,
+        max_entries: int = 10000,
+        flush_interval: float = 30.0,
+    ) -> None:
+        self._secret = secret
+        self._load_state = load_state
+        self._write_activity = write_activity
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._cache.clear()
+        self._min_versions.clear()
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def issue(self, account_id: uuid.UUID, version: int) -> tuple[str, int]:
+        """A new token of the account and its expiry as a unix timestamp."""
+        expires_at = int(time.time()) + self.ttl
+        payload = f"{account_id.hex}.{version}.{expires_at}.{secrets.token_hex(8)}"
+        self._counters["issued"] += 1
+        return f"{payload}.{self._sign(payload)}", expires_at
+
+    def decode(self, token: str) -> TokenClaims | None:
+        """The claims of a well formed, correctly signed and unexpired token, else None."""
+        payload, _, signature = token.rpartition(".")
+        if not payload or not hmac.compare_digest(self._sign(payload), signature):
+            return None
+        try:
+            account_hex, version, expires_at, _ = payload.split(".")
+            claims = TokenClaims(uuid.UUID(hex=account_hex), int(version), int(expires_at))
+        except ValueError:
+            return None
+        return claims if claims.expires_at > time.time() else None
+
+    async def validate(self, token: str) -> TokenClaims | None:
+        """
+        The claims of ``token`` when it is valid and its account active, else None.
+
+        Tokens seen within ``cache_ttl`` are accepted from the cache; others are checked against
+        the account's current version and status. Either way the account's activity is recorded.
+        """
+        now = time.monotonic()
+        cached = self._cache.get(token)
+        if cached is not None:
+            cached_until, claims = cached
+            if (
+                cached_until > now
+                and claims.expires_at > time.time()
+                and claims.version >= self._min_versions.get(claims.account_id, 0)
+            ):
+                self._cache.move_to_end(token)
+                self._counters["cache_hits"] += 1
+                self.touch(claims.account_id)
+                return claims
+            del self._cache[token]
+        claims = self.decode(token)
+        if claims is None or self._load_state is None:
+            self._counters["rejected"] += 1
+            return None
+        state = await self._load_state(claims.account_id)
+        if state is None or state[0] != claims.version or state[1] != "active":
+            self._counters["rejected"] += 1
+            return None
+        self._counters["validated"] += 1
+        self._cache[token] = (now + self.cache_ttl, claims)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        self.touch(claims.account_id)
+        return claims
+
+    def revoked(self, account_id: uuid.UUID, version: int) -> None:
+        """Stop accepting cached tokens of the account older than ``version``, after the counter was bumped."""
+        self._min_versions[account_id] = max(version, self._min_versions.get(account_id, 0))
+        self._counters["revoked"] += 1
+
+    def touch(self, account_id: uuid.UUID) -> None:
+        # naive UTC, like the CURRENT_TIMESTAMP the other account columns are stamped with
+        self._active[account_id] = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def flush(self) -> int:
+        """Write the activity recorded since the last flush, returns the number of accounts written."""
+        if not self._active or self._write_activity is None:
+            return 0
+        seen, self._active = self._active, {}
+        try:
+            await self._write_activity(seen)
+        except Exception:
+            # kept for the next flush, unless a request refreshed them meanwhile
+            for account_id, seen_at in seen.items():
+                self._active.setdefault(account_id, seen_at)
+            raise
+        self._counters["flushes"] += 1
+        self._counters["flushed_accounts"] += len(seen)
+        return len(seen)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self._counters["flush_errors"] += 1
+                logger.error(f"Session activity flush failed: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="session-activity-flush")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Session activity lost at shutdown: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "cached_tokens": len(self._cache),
+            "pending_activity": len(self._active),
+            "cache_ttl": self.cache_ttl,
+            **self._counters,
+        }
+
+
+session_tokens = SessionTokens()
+
+
+def login_required(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Reject requests without a valid ``Authorization: Bearer`` session token with a 401.
+
+    The validated claims are available to the view as ``g.token``.
+    """
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        claims = await session_tokens.validate(token.strip()) if scheme.lower() == "bearer" else None
+        if claims is None:
+            return {"error": "Authentication required."}, 401, {"WWW-Authenticate": "Bearer"}
+        g.token = claims
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def configure_session_tokens(app: Quart) -> None:
+    from database.models import Account
+
+    async def load_state(account_id: uuid.UUID) -> tuple[int, str] | None:
+        row = await Account.get_token_state(account_id)
+        return None if row is None else (row.token_version, row.status)
+
+    secret = app.config.get("SESSION_TOKEN_SECRET")
+    # a SecretStr when the app is configured from AppConfig
+    secret = getattr(secret, "get_secret_value", lambda: secret)() or app.secret_key
+    if not secret:
+        logger.warning("SESSION_TOKEN_SECRET is not set, session tokens are only valid in this process")
+        secret = secrets.token_bytes(32)
+    session_tokens.configure(
+        secret.encode() if isinstance(secret, str) else secret,
+        load_state,
+        Account.touch_many,
+        ttl=app.config.get("SESSION_TOKEN_TTL", 86400),
+        cache_ttl=app.config.get("SESSION_TOKEN_CACHE_TTL", 60.0),
+        max_entries=app.config.get("SESSION_TOKEN_CACHE_MAX_ENTRIES", 10000),
+        flush_interval=app.config.get("SESSION_ACTIVITY_FLUSH_INTERVAL", 30.0),
+    )
+
+    @app.before_serving
+    async def start_session_activity() -> None:
+        session_tokens.start()
+
+    @app.after_serving
+    async def stop_session_activity() -> None:
+        await session_tokens.stop()
+
+    @app.route("/session-token-info")
+    @hide
+    async def get_session_token_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **session_tokens.stats()}
+        return reponse_, 200
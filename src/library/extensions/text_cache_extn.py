@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import uuid
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from quart import Quart
+from quart_schema import hide
+from quart_uploads import UploadSet
+
+from .extraction_extn import PageText
+from .upload_extn import pdf_loader
+
+
+class TextCache:
+    """
+    Two tier cache of extracted page text, keyed by file content hash and extractor version.
+
+    The first tier is an in-memory LRU bounded by the number of characters it holds. The second
+    is a directory of zlib compressed JSON files under ``<destination>/text-cache`` bounded by
+    its size on disk; reads refresh a file's mtime so the least recently used files are evicted
+    first. Disk access always happens off the event loop.
+
+    Only the page text is cached. Document metadata (``doc_type``, ``doc_language``,
+    ``doc_metadata``) lives on the Document rows and is shared between duplicates by
+    ``Document.reuse_results``, not here.
+    """
+
+    def __init__(
+        self,
+        upload_set: UploadSet,
+        folder: str = "text-cache",
+        memory_chars: int = 67108864,
+        disk_bytes: int = 1073741824,
+    ) -> None:
+        self._upload_set = upload_set
+        self._folder = folder
+        self.memory_chars = memory_chars
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, tuple[PageText, ...]] = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: int | None = None
+        self._evict_lock = asyncio.Lock()
+        self._counters = dict.fromkeys(
+            ("memory_hits", "disk_hits", "misses", "stores", "memory_evictions", "disk_evictions"), 0
+        )
+
+    @property
+    def root(self) -> Path:
+        return Path(self._upload_set.config.destination) / self._folder
+
+    @staticmethod
+    def key_for(content_hash: str, version: str) -> str:
+        return f"{version}-{content_hash}"
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[-64:-62] / f"{key}.json.z"
+
+    @staticmethod
+    def _chars(pages: tuple[PageText, ...]) -> int:
+        return sum(len(page.text) for page in pages)
+
+    def _remember(self, key: str, pages: tuple[PageText, ...]) -> None:
+        size = self._chars(pages)
+        if size > self.memory_chars:
+            return
+        if key in self._memory:
+            self._memory_used -= self._chars(self._memory.pop(key))
+        self._memory[key] = pages
+        self._memory_used += size
+        while self._memory_used > self.memory_chars:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= self._chars(evicted)
+            self._counters["memory_evictions"] += 1
+
+    def _read(self, key: str) -> tuple[PageText, ...] | None:
+        path = self.path_for(key)
+        try:
+            payload = json.loads(zlib.decompress(path.read_bytes()))
+            os.utime(path)
+        except (FileNotFoundError, zlib.error, ValueError):
+            return None
+        return tuple(PageText(page=page, text=text) for page, text in payload["pages"])
+
+    def _write(self, key: str, pages: tuple[PageText, ...]) -> int:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"key": key, "page_count": len(pages), "pages": [[page.page, page.text] for page in pages]}
+        data = zlib.compress(json.dumps(payload, ensure_ascii=False).encode(), 6)
+        temp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        temp.write_bytes(data)
+        temp.replace(path)
+        return len(data)
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        files = []
+        for shard in self.root.glob("*"):
+            if not shard.is_dir():
+                continue
+            with os.scandir(shard) as entries:
+                for entry in entries:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self, target: int) -> tuple[int, int]:
+        """Delete least recently used files until at most ``target`` bytes are left."""
+        files = sorted(self._scan())
+        used = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if used <= target:
+                break
+            Path(path).unlink(missing_ok=True)
+            used -= size
+            evicted += 1
+        return used, evicted
+
+    async def get(self, key: str) -> tuple[PageText, ...] | None:
+        pages = self._memory.get(key)
+        if pages is not None:
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return pages
+        pages = await asyncio.to_thread(self._read, key)
+        if pages is None:
+            self._counters["misses"] += 1
+            return None
+        self._counters["disk_hits"] += 1
+        self._remember(key, pages)
+        return pages
+
+    async def put(self, key: str, pages: list[PageText] | tuple[PageText, ...]) -> None:
+        pages = tuple(pages)
+        self._remember(key, pages)
+        written = await asyncio.to_thread(self._write, key, pages)
+        self._counters["stores"] += 1
+        async with self._evict_lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in await asyncio.to_thread(self._scan))
+            else:
+                self._disk_used += written
+            if self._disk_used > self.disk_bytes:
+                # trim below the limit so eviction does not run on every store
+                self._disk_used, evicted = await asyncio.to_thread(self._evict, int(self.disk_bytes * 0.9))
+                self._counters["disk_evictions"] += evicted
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._counters,
+            "memory_entries": len(self._memory),
+            "memory_chars": self._memory_used,
+            "disk_bytes": self._disk_used,
+        }
+
+
+def configure_text_cache(app: Quart) -> None:
+    text_cache = TextCache(
+        pdf_loader,
+        memory_chars=app.config.get("TEXT_CACHE_MEMORY_CHARS", 67108864),
+        disk_bytes=app.config.get("TEXT_CACHE_DISK_BYTES", 1073741824),
+    )
+    app.extensions["text_cache"] = text_cache
+
+    @app.route("/text-cache-info")
+    @hide
+    async def get_text_cache_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **text_cache.stats()}
+        return reponse_, 200
@@ -1,7 +1,359 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+from quart import current_app, request
 from quart_schema import hide
-from quart_uploads import UploadSet
+from quart_uploads import UploadNotAllowed, UploadSet
 from quart_uploads.route import uploaded_file
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from .upload_scheduler_extn import Offload, UploadScheduler
 
 hide(uploaded_file)
 
 pdf_loader = UploadSet(name="pdf", extensions=("pdf", " PDF"))
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass(slots=True)
+class StreamedFile:
+    field_name: str
+    filename: str
+    saved_as: str
+    content_type: str | None
+    size: int = 0
+    content_hash: str | None = None
+    duplicate: bool = False
+
+
+@dataclass(slots=True)
+class StreamedForm:
+    fields: dict[str, list[str]] = field(default_factory=dict)
+    files: list[StreamedFile] = field(default_factory=list)
+
+    def getlist(self, name: str) -> list[str]:
+        return self.fields.get(name, [])
+
+    def files_for(self, name: str) -> list[StreamedFile]:
+        return [file_ for file_ in self.files if file_.field_name == name]
+
+
+def _open_exclusive(folder: Path, basename: str) -> tuple[Path, BinaryIO]:
+    """Reserve ``basename`` in ``folder``, suffixing ``_<n>`` the way ``UploadSet.resolve_conflict`` does."""
+    stem, ext = Path(basename).stem, Path(basename).suffix
+    candidate, count = basename, 0
+    while True:
+        target = folder / candidate
+        try:
+            return target, target.open("xb")
+        except FileExistsError:
+            count += 1
+            candidate = f"{stem}_{count}{ext}"
+
+
+class _PartWriter:
+    """
+    Writes one file part, flushing every ``buffer_size`` bytes off the event loop.
+
+    Up to ``depth`` blocks are written at the same time, each at its own position in the file,
+    so a request can use every write slot its limiter grants. The SHA-256 is still computed over
+    the blocks in order: a block is hashed once it is written and the block before it is hashed.
+    """
+
+    def __init__(self, target: Path, handle: BinaryIO, buffer_size: int, offload: Offload, depth: int = 1) -> None:
+        self.target = target
+        self._handle = handle
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._offload = offload
+        self._depth = max(depth, 1)
+        self._digest = hashlib.sha256()
+        self._position = handle.tell()
+        self._lock = threading.Lock()
+        self._pending: deque[asyncio.Task] = deque()
+        self._last: asyncio.Task | None = None
+
+    async def write(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        if len(self._buffer) >= self._buffer_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._buffer:
+            data, self._buffer = self._buffer, bytearray()
+            while len(self._pending) >= self._depth:
+                await self._pending.popleft()
+            self._last = asyncio.create_task(self._write_block(data, self._position, self._last))
+            self._pending.append(self._last)
+            self._position += len(data)
+
+    async def _write_block(self, data: bytearray, position: int, previous: asyncio.Task | None) -> None:
+        await self._offload(self._write_at, data, position)
+        if previous is not None:
+            await previous
+        await asyncio.to_thread(self._digest.update, data)
+
+    def _write_at(self, data: bytearray, position: int) -> None:
+        if hasattr(os, "pwrite"):
+            # positional writes share no file cursor, blocks land side by side without a lock
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self._handle.fileno(), view, position)
+                view, position = view[written:], position + written
+            return
+        with self._lock:
+            self._handle.seek(position)
+            self._handle.write(data)
+
+    async def _settle(self) -> None:
+        pending, self._pending = self._pending, deque()
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def close(self) -> str:
+        """Flush and close the file, returning the SHA-256 hex digest of everything written."""
+        try:
+            await self._flush()
+            await self._settle()
+        finally:
+            await asyncio.to_thread(self._handle.close)
+        return self._digest.hexdigest()
+
+    async def discard(self) -> None:
+        self._buffer.clear()
+        # let the blocks in flight finish, their threads cannot be interrupted
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._pending.clear()
+        await asyncio.to_thread(self._discard)
+
+    def _discard(self) -> None:
+        self._handle.close()
+        self.target.unlink(missing_ok=True)
+
+
+class _PartDigest:
+    """Hashes a file part the store already holds instead of writing it, checking it against the declared hash."""
+
+    def __init__(self, target: Path, content_hash: str, buffer_size: int) -> None:
+        self.target = target
+        self._content_hash = content_hash
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._digest = hashlib.sha256()
+
+    async def write(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        if len(self._buffer) >= self._buffer_size:
+            data, self._buffer = self._buffer, bytearray()
+            await asyncio.to_thread(self._digest.update, data)
+
+    async def close(self) -> str:
+        if self._buffer:
+            await asyncio.to_thread(self._digest.update, self._buffer)
+        content_hash = self._digest.hexdigest()
+        if content_hash != self._content_hash:
+            raise BadRequest(f"A file does not match its declared content hash {self._content_hash}.")
+        return content_hash
+
+    async def discard(self) -> None:
+        self._buffer.clear()
+
+
+class FolderStore:
+    """Stores every upload under its own (conflict resolved) name in a folder."""
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+
+    def prepare(self) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def reserve(self, basename: str) -> tuple[Path, BinaryIO]:
+        return _open_exclusive(self.folder, basename)
+
+    def commit(self, target: Path, content_hash: str) -> tuple[Path, bool]:  # noqa: ARG002
+        return target, False
+
+    def claim(self, content_hash: str) -> Path | None:  # noqa: ARG002
+        return None
+
+    def release(self, stored: Path) -> None:
+        stored.unlink(missing_ok=True)
+
+
+class UploadStore(Protocol):
+    """Where :class:`MultipartStreamer` puts file parts; the blocking methods run in a worker thread."""
+
+    def prepare(self) -> None: ...
+
+    def reserve(self, basename: str) -> tuple[Path, BinaryIO]: ...
+
+    def commit(self, target: Path, content_hash: str) -> tuple[Path, bool]: ...
+
+    def claim(self, content_hash: str) -> Path | None: ...
+
+    def release(self, stored: Path) -> None: ...
+
+
+class MultipartStreamer:
+    """
+    Parses the current request's multipart body incrementally and writes file parts
+    straight into an upload set, so memory use is bounded by ``buffer_size`` rather
+    than by the size of the upload.
+    """
+
+    def __init__(
+        self,
+        upload_set: UploadSet,
+        folder: str | None = None,
+        store: UploadStore | None = None,
+        hashes_field: str | None = None,
+    ) -> None:
+        config = current_app.config
+        self._upload_set = upload_set
+        self._buffer_size: int = config.get("UPLOADS_STREAM_BUFFER_SIZE", 1048576)
+        self._max_field_size: int = config.get("UPLOADS_MAX_FIELD_SIZE", 65536)
+        if store is None:
+            destination = Path(upload_set.config.destination)
+            store = FolderStore(destination / folder if folder else destination)
+        self._store = store
+        self._hashes_field = hashes_field
+        self._root = Path(upload_set.config.destination)
+        self._scheduler: UploadScheduler | None = current_app.extensions.get("upload_scheduler")
+        self._offload: Offload = self._scheduler.offloader() if self._scheduler else asyncio.to_thread
+        self._depth = self._scheduler.per_request if self._scheduler else 1
+        self._form = StreamedForm()
+        self._part: Field | File | None = None
+        self._field_value = bytearray()
+        self._writer: _PartWriter | _PartDigest | None = None
+        self._written: list[Path] = []
+
+    async def parse(self) -> StreamedForm:
+        boundary = request.mimetype_params.get("boundary")
+        if request.mimetype != "multipart/form-data" or not boundary:
+            raise BadRequest("Expected a multipart/form-data body with a boundary.")
+        if self._scheduler is not None:
+            # refuse before reading the body rather than after part of it was written
+            self._scheduler.check_capacity()
+        await asyncio.to_thread(self._store.prepare)
+        decoder = MultipartDecoder(boundary.encode("latin-1"), max_form_memory_size=2 * self._buffer_size)
+        try:
+            async for chunk in request.body:
+                for offset in range(0, len(chunk), self._buffer_size):
+                    decoder.receive_data(chunk[offset : offset + self._buffer_size])
+                    await self._drain(decoder)
+            decoder.receive_data(None)
+            if not await self._drain(decoder):
+                raise BadRequest("Multipart body ended before the closing boundary.")
+        except ValueError as e:
+            await self._rollback()
+            raise BadRequest(str(e)) from e
+        except BaseException:
+            await self._rollback()
+            raise
+        return self._form
+
+    async def _drain(self, decoder: MultipartDecoder) -> bool:
+        """Handle every event the decoder can produce; returns True once the epilogue is reached."""
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                return False
+            if isinstance(event, Epilogue):
+                return True
+            if isinstance(event, File):
+                await self._start_file(event)
+            elif isinstance(event, Field):
+                self._part = event
+                self._field_value.clear()
+            elif isinstance(event, Data):
+                await self._receive(event)
+
+    async def _start_file(self, event: File) -> None:
+        self._part = event
+        basename = self._upload_set.get_basename(event.filename)
+        if not self._upload_set.file_allowed(basename):
+            raise UploadNotAllowed(event.filename)
+        declared = self._declared_hash(len(self._form.files))
+        stored = await self._offload(self._store.claim, declared) if declared else None
+        if stored is not None:
+            self._writer = _PartDigest(stored, declared, self._buffer_size)
+        else:
+            target, handle = await self._offload(self._store.reserve, basename)
+            self._writer = _PartWriter(target, handle, self._buffer_size, self._offload, self._depth)
+        self._form.files.append(
+            StreamedFile(
+                field_name=event.name,
+                filename=event.filename,
+                saved_as=basename,
+                content_type=event.headers.get("content-type"),
+            )
+        )
+
+    def _declared_hash(self, index: int) -> str | None:
+        """The SHA-256 the form declared for its ``index``-th file part, if a valid one precedes the part."""
+        declared = self._form.getlist(self._hashes_field) if self._hashes_field else []
+        content_hash = declared[index].strip().lower() if index < len(declared) else ""
+        return content_hash if _SHA256.fullmatch(content_hash) else None
+
+    async def _receive(self, event: Data) -> None:
+        if isinstance(self._part, File):
+            streamed = self._form.files[-1]
+            streamed.size += len(event.data)
+            await self._writer.write(event.data)
+            if not event.more_data:
+                streamed.content_hash = await self._writer.close()
+                if isinstance(self._writer, _PartDigest):
+                    stored, streamed.duplicate = self._writer.target, True
+                else:
+                    stored, streamed.duplicate = await self._offload(
+                        self._store.commit, self._writer.target, streamed.content_hash
+                    )
+                self._writer = None
+                self._written.append(stored)
+                streamed.saved_as = stored.relative_to(self._root).as_posix()
+            return
+        self._field_value.extend(event.data)
+        if len(self._field_value) > self._max_field_size:
+            raise RequestEntityTooLarge
+        if not event.more_data:
+            value = self._field_value.decode("utf-8", "replace")
+            self._form.fields.setdefault(self._part.name, []).append(value)
+
+    async def _rollback(self) -> None:
+        if self._writer is not None:
+            await self._writer.discard()
+            self._writer = None
+        for stored in self._written:
+            await asyncio.to_thread(self._store.release, stored)
+
+
+async def stream_multipart(
+    upload_set: UploadSet,
+    folder: str | None = None,
+    store: UploadStore | None = None,
+    hashes_field: str | None = None,
+) -> StreamedForm:
+    """
+    Stream the current multipart request into ``upload_set``.
+
+    :param upload_set: The upload set whose destination receives the file parts.
+    :param folder: Optional sub folder within the upload set destination.
+    :param store: Optional storage layout, such as a ``BlobStore``; defaults to plain files in the destination.
+    :param hashes_field: Optional form field whose n-th value, sent before the file parts, declares the
+        SHA-256 of the n-th file. A file the store already holds under its declared hash is only
+        hashed, never written, and the request fails if it does not match.
+    :return: The text fields and the saved files; on any error every file written so far is released.
+    """
+    return await MultipartStreamer(upload_set, folder, store, hashes_field).parse()
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from functools import partial
+from typing import Any, TypeVar
+
+from quart import Quart
+from quart_schema import hide
+
+T = TypeVar("T")
+
+Offload = Callable[..., Awaitable[Any]]
+
+
+class UploadQueueFullError(Exception):
+    """Raised when the upload write queue is full; rendered as 503 with a Retry-After header."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Upload write queue is full")
+        self.retry_after = retry_after
+
+
+class UploadScheduler:
+    """
+    Process wide gate for blocking upload I/O.
+
+    Every disk write of an upload runs through :meth:`run`, which bounds the number of writes
+    in flight across the worker (``max_concurrent``) and per request (``per_request``). Writes
+    waiting for a global slot form a queue of at most ``queue_size`` entries; beyond that new
+    work is refused with :class:`UploadQueueFullError` instead of piling onto the thread pool.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        per_request: int = 2,
+        queue_size: int = 64,
+        retry_after: int = 5,
+        history: int = 1024,
+    ) -> None:
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.per_request = per_request
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._waiting = 0
+        self._in_flight = 0
+        self._peak_waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._max_wait = 0.0
+        self._total_wait = 0.0
+        self._wait_times: deque[float] = deque(maxlen=history)
+
+    def limiter(self) -> asyncio.Semaphore:
+        """A fresh per-request limiter to pass to :meth:`run`."""
+        return asyncio.Semaphore(self.per_request)
+
+    def offloader(self) -> Offload:
+        """A ``to_thread`` replacement that runs blocking calls through this scheduler with one limiter."""
+        return partial(self.run, self.limiter())
+
+    def check_capacity(self) -> None:
+        if self._waiting >= self.queue_size:
+            self._rejected += 1
+            raise UploadQueueFullError(self.retry_after)
+
+    async def run(self, limiter: asyncio.Semaphore, func: Callable[..., T], *args: Any) -> T:
+        async with limiter:
+            self.check_capacity()
+            self._waiting += 1
+            self._peak_waiting = max(self._peak_waiting, self._waiting)
+            start_time = time.perf_counter()
+            try:
+                await self._slots.acquire()
+            finally:
+                self._waiting -= 1
+            self._record_wait(time.perf_counter() - start_time)
+            self._in_flight += 1
+            try:
+                return await asyncio.to_thread(func, *args)
+            finally:
+                self._in_flight -= 1
+                self._completed += 1
+                self._slots.release()
+
+    def _record_wait(self, waited: float) -> None:
+        self._wait_times.append(waited)
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._wait_times)
+        admitted = self._completed + self._in_flight
+
+        def percentile(fraction: float) -> float:
+            return round(waits[min(len(waits) - 1, int(len(waits) * fraction))] * 1000, 3) if waits else 0.0
+
+        return {
+            "max_concurrent": self.max_concurrent,
+            "per_request": self.per_request,
+            "queue_size": self.queue_size,
+            "queue_depth": self._waiting,
+            "peak_queue_depth": self._peak_waiting,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_ms_avg": round(self._total_wait / admitted * 1000, 3) if admitted else 0.0,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p99": percentile(0.99),
+            "wait_ms_max": round(self._max_wait * 1000, 3),
+        }
+
+
+def configure_upload_scheduler(app: Quart) -> None:
+    scheduler = UploadScheduler(
+        max_concurrent=app.config.get("UPLOADS_MAX_CONCURRENT_WRITES", 8),
+        per_request=app.config.get("UPLOADS_MAX_WRITES_PER_REQUEST", 2),
+        queue_size=app.config.get("UPLOADS_WRITE_QUEUE_SIZE", 64),
+        retry_after=app.config.get("UPLOADS_RETRY_AFTER", 5),
+    )
+    app.extensions["upload_scheduler"] = scheduler
+
+    @app.errorhandler(UploadQueueFullError)
+    async def upload_queue_full(e: UploadQueueFullError) -> tuple[dict[str, str], int, dict[str, str]]:
+        return {"error": "Upload capacity exhausted, please retry later."}, 503, {"Retry-After": str(e.retry_after)}
+
+    @app.route("/upload-scheduler-info")
+    @hide
+    async def get_upload_scheduler_info() -> tuple[dict[str, Any], int]:
+        reponse_ = {"pid": os.getpid(), **scheduler.stats()}
+        return reponse_, 200
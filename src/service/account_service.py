@@ -1,15 +1,35 @@
-import base64
-import binascii
-import hashlib
-import secrets
+import asyncio
+import itertools
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import db
 from database.models import Account
+from library.extensions.password_hasher_extn import PasswordHash, password_hasher
+from library.extensions.session_token_extn import session_tokens
+
+
+@dataclass(slots=True)
+class ImportProgress:
+    """Running totals of an account import, reported after every chunk."""
 
+    read: int = 0
+    created: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    started_at: float = 0.0
 
-def hash_password(password_str: str, salt_byte: bytes) -> bytes:
-    dk = hashlib.pbkdf2_hmac("sha256", password_str.encode("utf-8"), salt_byte, 10000)
-    return binascii.hexlify(dk)
+    @property
+    def rate(self) -> float:
+        """Records read per second since the import started."""
+        elapsed = time.perf_counter() - self.started_at
+        return self.read / elapsed if elapsed > 0 else 0.0
 
 
 class AccountService:
@@ -38,17 +58,13 @@ class AccountService:
         """
 
         account = Account()
-        account.email = email
+        account.email = Account.normalise_email(email)
         account.name = name
-        salt = secrets.token_bytes(16)
-        base64_salt = base64.b64encode(salt).decode()
-
-        # encrypt password with salt
-        password_hashed = hash_password(password, salt)
-        base64_password_hashed = base64.b64encode(password_hashed).decode()
-
-        account.password = base64_password_hashed
-        account.password_salt = base64_salt
+        # derived in the hasher's worker pool, the event loop keeps serving meanwhile
+        hashed = await password_hasher.hash(password)
+        account.password = hashed.password
+        account.password_salt = hashed.salt
+        account.password_params = hashed.params
 
         account.interface_language = language
         account.interface_theme = interface_theme
@@ -56,7 +72,178 @@ class AccountService:
         account.last_login_ip = last_login_ip
         # Set timezone based on language
         account.timezone = timezone
-        async with db.session() as session:
+
+        async def add(session: AsyncSession) -> Account:
             session.add(account)
-            await session.commit()
+            return account
+
+        return await db.run_write(add)
+
+    @staticmethod
+    async def verify_password(account: Account, password: str) -> bool:
+        """
+        Check a password against the account's stored hash.
+
+        A hash made with older parameters than the configured ones is replaced while the plain
+        password is at hand, so accounts move to the current algorithm as their users sign in.
+
+        :param account: The account, as loaded from the database.
+        :param password: The plain password to check.
+        :return: Whether the password matches.
+        """
+        if account.password is None:
+            return False
+        if not await password_hasher.verify(password, account.password, account.password_salt, account.password_params):
+            return False
+        if password_hasher.needs_upgrade(account.password_params):
+            hashed = await password_hasher.hash(password)
+            stmt = (
+                update(Account)
+                .where(Account.id == account.id, Account.password == account.password)
+                .values(
+                    password=hashed.password,
+                    password_salt=hashed.salt,
+                    password_params=hashed.params,
+                    updated_at=func.current_timestamp(),
+                )
+            )
+
+            async def apply(session: AsyncSession) -> bool:
+                return (await session.execute(stmt)).rowcount == 1
+
+            if await db.run_write(apply):
+                account.password = hashed.password
+                account.password_salt = hashed.salt
+                account.password_params = hashed.params
+                password_hasher.record_upgrade()
+        return True
+
+    @staticmethod
+    async def authenticate(email: str, password: str) -> Account | None:
+        """The account of ``email`` when ``password`` matches, else None."""
+        account = await Account.get_by_email(email)
+        if account is None or not await AccountService.verify_password(account, password):
+            return None
         return account
+
+    @staticmethod
+    async def login(email: str, password: str, ip: str) -> tuple[Account, str, int] | None:
+        """
+        Verify the credentials once and issue a session token.
+
+        :param email: The account email.
+        :param password: The plain password.
+        :param ip: Address the login came from.
+        :return: The account, the token and its expiry as a unix timestamp, None on bad credentials.
+        """
+        account = await AccountService.authenticate(email, password)
+        if account is None or account.status != "active":
+            return None
+        await Account.record_login(account.id, ip)
+        token, expires_at = session_tokens.issue(account.id, account.token_version)
+        return account, token, expires_at
+
+    @staticmethod
+    async def revoke_sessions(account_id: uuid.UUID) -> bool:
+        """Invalidate every session token of the account, returns False for an unknown account."""
+        version = await Account.revoke_tokens(account_id)
+        if version is None:
+            return False
+        session_tokens.revoked(account_id, version)
+        return True
+
+    @staticmethod
+    async def import_accounts(
+        records: Iterable[Mapping[str, Any]],
+        chunk_size: int = 500,
+        language: str = "en-US",
+        timezone: str = "UTC",
+    ) -> AsyncIterator[ImportProgress]:
+        """
+        Create accounts from a stream of records, ``chunk_size`` records at a time.
+
+        Records need an ``email`` and may carry ``password``, ``name``, ``language`` and
+        ``timezone``. Emails are normalised like every account's, see ``Account.normalise_email``;
+        those already registered, or repeated in the stream, are skipped before their passwords
+        are hashed. The passwords of a chunk are hashed across the hasher's worker processes
+        while the previous chunk is inserted, so only two chunks are ever held in memory,
+        however long the stream.
+
+        :param records: The records, read lazily.
+        :param chunk_size: Records hashed and inserted together.
+        :param language: Language of the records without one.
+        :param timezone: Timezone of the records without one.
+        :return: The progress after every inserted chunk.
+        """
+        progress = ImportProgress(started_at=time.perf_counter())
+        iterator = iter(records)
+        previous: set[str] = set()
+        inserting: asyncio.Task[int] | None = None
+        pending = 0
+
+        async def inserted() -> None:
+            written = await inserting
+            # a rowcount the driver could not tell, or one counting untouched rows, is capped at the chunk
+            written = pending if written < 0 else min(written, pending)
+            progress.created += written
+            # rows that lost a race with an account created meanwhile
+            progress.skipped += pending - written
+
+        try:
+            while chunk := list(itertools.islice(iterator, chunk_size)):
+                progress.read += len(chunk)
+                accounts: dict[str, Mapping[str, Any]] = {}
+                for record in chunk:
+                    email = Account.normalise_email(str(record.get("email") or ""))
+                    if "@" not in email:
+                        progress.invalid += 1
+                    elif email in accounts or email in previous:
+                        progress.skipped += 1
+                    else:
+                        accounts[email] = record
+                # the previous chunk may not be committed yet, its emails are checked above
+                existing = await Account.existing_emails(accounts)
+                progress.skipped += len(existing)
+                fresh = {email: record for email, record in accounts.items() if email not in existing}
+                with_password = [email for email, record in fresh.items() if record.get("password")]
+                hashes = dict(
+                    zip(
+                        with_password,
+                        await password_hasher.hash_many([str(fresh[email]["password"]) for email in with_password]),
+                        strict=True,
+                    )
+                )
+                rows = [
+                    AccountService._import_row(email, record, hashes.get(email), language, timezone)
+                    for email, record in fresh.items()
+                ]
+                previous = set(accounts)
+                if inserting is not None:
+                    await inserted()
+                    yield progress
+                inserting = asyncio.create_task(Account.add_accounts(rows)) if rows else None
+                pending = len(rows)
+            if inserting is not None:
+                await inserted()
+                inserting = None
+            yield progress
+        finally:
+            if inserting is not None:
+                inserting.cancel()
+                await asyncio.gather(inserting, return_exceptions=True)
+
+    @staticmethod
+    def _import_row(
+        email: str, record: Mapping[str, Any], hashed: PasswordHash | None, language: str, timezone: str
+    ) -> dict[str, Any]:
+        return {
+            "email": email,
+            "name": str(record.get("name") or email.partition("@")[0]),
+            "password": hashed.password if hashed is not None else None,
+            "password_salt": hashed.salt if hashed is not None else None,
+            "password_params": hashed.params if hashed is not None else None,
+            "interface_language": str(record.get("language") or language),
+            "interface_theme": "default",
+            "timezone": str(record.get("timezone") or timezone),
+            "last_login_ip": "From import",
+        }
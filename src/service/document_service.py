@@ -0,0 +1,81 @@
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+
+from quart import current_app
+
+from database.models import Document
+from library.extensions import PageText, PdfTextExtractor, TextCache, pdf_blobs
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentService:
+    """
+    Service class for processing stored documents.
+    """
+
+    @staticmethod
+    async def reuse_parsed(document_id: uuid.UUID) -> bool:
+        """
+        Skip the extraction of a document that is parsed already, or whose content was parsed under another one.
+
+        :param document_id: The unique identifier for the document.
+        :return: Whether the document now has parsing results and needs no extraction.
+        """
+        document = await Document.get_document_by_id(document_id)
+        if document is None or not document.content_hash:
+            return False
+        if document.parsing_completed_at is not None:
+            return True
+        source = await Document.get_processed_document_by_hash(document.content_hash)
+        if source is None:
+            return False
+        await Document.reuse_results(document.id, document.batch_id, source)
+        logger.info(f"Document {document.id} reuses the results of {source.id}, same content")
+        return True
+
+    @staticmethod
+    async def extract_pages(document_id: uuid.UUID) -> AsyncIterator[PageText]:
+        """
+        Extract the text of a stored document page by page, in page order.
+
+        ``processing_started_at`` is stamped before the first page and ``parsing_completed_at``
+        once the last page has been yielded, on the document and on its batch; when extraction
+        raises, ``parsing_failed_at`` and the error are stamped instead. Text already
+        extracted from a file with the same content is served from the text cache without
+        running poppler, freshly extracted text is cached once the whole document was read.
+
+        :param document_id: The unique identifier for the document.
+        """
+        document = await Document.get_document_by_id(document_id)
+        if document is None:
+            raise ValueError(f"Document {document_id} not found")
+        if not document.content_hash:
+            raise ValueError(f"Document {document_id} has no stored file")
+        extractor: PdfTextExtractor = current_app.extensions["pdf_extractor"]
+        path = pdf_blobs.path_for(document.content_hash)
+
+        text_cache: TextCache | None = current_app.extensions.get("text_cache")
+        cache_key = TextCache.key_for(document.content_hash, extractor.cache_version)
+
+        await Document.mark_processing_started(document.id, document.batch_id)
+        cached = await text_cache.get(cache_key) if text_cache is not None else None
+        if cached is not None:
+            for page in cached:
+                yield page
+        else:
+            pages: list[PageText] = []
+            try:
+                async with aclosing(extractor.iter_pages(path, document.password)) as page_iter:
+                    async for page in page_iter:
+                        pages.append(page)
+                        yield page
+            except Exception as e:
+                await Document.mark_parsing_failed(document.id, str(e) or type(e).__name__)
+                raise
+            if text_cache is not None:
+                await text_cache.put(cache_key, pages)
+        await Document.mark_parsing_completed(document.id, document.batch_id)
+        logger.info(f"Document {document.id} parsed, pages: {len(cached or pages)}, cached: {cached is not None}")
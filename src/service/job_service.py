@@ -0,0 +1,174 @@
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import socket
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from quart import Quart, current_app
+
+from database.models import Job
+from service.document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+_HANDLERS: dict[str, JobHandler] = {}
+
+
+class JobService:
+    """
+    Service class for the durable job queue.
+    """
+
+    @staticmethod
+    def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Register the coroutine function that runs jobs of ``kind``."""
+
+        def decorator(func: JobHandler) -> JobHandler:
+            _HANDLERS[kind] = func
+            return func
+
+        return decorator
+
+    @staticmethod
+    def get_handler(kind: str) -> JobHandler | None:
+        return _HANDLERS.get(kind)
+
+    @staticmethod
+    async def enqueue(
+        kind: str, payload: dict[str, Any], queue: str = "default", max_attempts: int | None = None
+    ) -> Job:
+        """
+        Add a job for a registered handler.
+
+        :param kind: The handler name.
+        :param payload: JSON serialisable arguments of the handler.
+        :param queue: The queue workers claim the job from.
+        :param max_attempts: Number of runs before the job is given up as dead, defaults to ``JOBS_MAX_ATTEMPTS``.
+        """
+        if kind not in _HANDLERS:
+            raise ValueError(f"No job handler registered for {kind}")
+        if max_attempts is None:
+            max_attempts = current_app.config.get("JOBS_MAX_ATTEMPTS", 5)
+        return await Job.enqueue(kind, payload, queue=queue, max_attempts=max_attempts)
+
+    @staticmethod
+    async def enqueue_extraction(document_id: uuid.UUID, queue: str = "default") -> Job:
+        """Queue the text extraction of a registered document, see ``extract_document``."""
+        return await JobService.enqueue("extract_document", {"document_id": str(document_id)}, queue=queue)
+
+
+@JobService.handler("extract_document")
+async def extract_document(payload: dict[str, Any]) -> None:
+    document_id = uuid.UUID(payload["document_id"])
+    if await DocumentService.reuse_parsed(document_id):
+        return
+    async for _ in DocumentService.extract_pages(document_id):
+        pass
+
+
+class JobWorker:
+    """
+    Claims jobs from one queue and runs up to ``concurrency`` of them at once.
+
+    Each running job renews its lease every third of the visibility timeout. Failed jobs are
+    re-queued with exponential backoff and jitter until they run out of attempts. ``stop``
+    stops claiming and lets the jobs in flight finish.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        app: Quart,
+        queue: str = "default",
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        visibility_timeout: float = 300,
+        backoff_base: float = 5.0,
+        backoff_max: float = 600.0,
+    ) -> None:
+        self.app = app
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** max(attempts - 1, 0), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)  # noqa: S311
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._wake.set()
+
+    async def run(self, max_jobs: int | None = None) -> int:
+        """
+        Claim and run jobs until stopped, or until ``max_jobs`` jobs were claimed.
+
+        :return: The number of jobs claimed.
+        """
+        logger.info(f"Worker {self.worker_id} serving queue {self.queue}, concurrency {self.concurrency}")
+        claimed = 0
+        while not self._stopping:
+            free = self.concurrency - len(self._tasks)
+            if max_jobs is not None:
+                free = min(free, max_jobs - claimed)
+            jobs = []
+            if free > 0:
+                async with self.app.app_context():
+                    jobs = await Job.claim(self.queue, self.worker_id, free, self.visibility_timeout)
+            for job in jobs:
+                task = asyncio.create_task(self._execute(job), name=f"job-{job.id}")
+                self._tasks.add(task)
+                task.add_done_callback(self._done)
+            claimed += len(jobs)
+            if max_jobs is not None and claimed >= max_jobs:
+                break
+            if len(jobs) < free or free <= 0:
+                self._wake.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped after {claimed} jobs")
+        return claimed
+
+    async def _heartbeat(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await Job.extend_lease(job, self.visibility_timeout):
+                logger.warning(f"Job {job.id} lost its lease, another worker may run it again")
+                return
+
+    async def _execute(self, job: Job) -> None:
+        async with self.app.app_context():
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+            try:
+                handler = JobService.get_handler(job.kind)
+                if handler is None:
+                    raise LookupError(f"No job handler registered for {job.kind}")
+                await handler(job.payload)
+            except Exception as e:
+                retry_in = self.backoff(job.attempts) if job.attempts < job.max_attempts else None
+                logger.error(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e!r}, retry in {retry_in}")
+                await Job.fail(job, repr(e), retry_in)
+            else:
+                await Job.complete(job)
+                logger.info(f"Job {job.id} ({job.kind}) completed")
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
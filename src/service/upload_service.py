@@ -0,0 +1,193 @@
+import asyncio
+import itertools
+import logging
+import uuid
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from database.models import Document, DocumentBatch, Uploads, UploadStatusEnum
+from library.extensions import pdf_blobs, pdf_sessions
+from service.job_service import JobService
+
+if TYPE_CHECKING:
+    from database.models.document import DocumentSpec
+    from library.extensions.upload_extn import StreamedFile
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSessionError(Exception):
+    """Raised when an upload request cannot be applied to its session or batch."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class UploadService:
+    """
+    Service class for resumable upload sessions.
+    """
+
+    @staticmethod
+    async def create_session(
+        batch_id: uuid.UUID, filename: str, upload_length: int, content_hash: str | None = None
+    ) -> Uploads:
+        """
+        Open a session for one file of an existing batch and reserve its backing file.
+
+        :param batch_id: The batch the document will be registered in once the upload completes.
+        :param filename: The client side file name.
+        :param upload_length: The total size of the file in bytes.
+        :param content_hash: Optional SHA-256 the assembled file is verified against.
+        """
+        if await DocumentBatch.get_batch_by_id(batch_id) is None:
+            raise UploadSessionError(f"Batch {batch_id} not found.", 404)
+        upload = await Uploads.create_session(batch_id, filename, upload_length, content_hash)
+        await asyncio.to_thread(pdf_sessions.allocate, upload.id, upload.upload_length)
+        return upload
+
+    @staticmethod
+    async def get_session(upload_id: uuid.UUID) -> Uploads:
+        upload = await Uploads.get_session(upload_id)
+        if upload is None:
+            raise UploadSessionError(f"Upload session {upload_id} not found.", 404)
+        return upload
+
+    @staticmethod
+    async def write_chunk(upload_id: uuid.UUID, offset: int) -> Uploads:
+        """
+        Write the current request body at ``offset`` and assemble the file if it was the last missing chunk.
+
+        A session whose every byte was already received is pending again only after a failed
+        assembly; a retried chunk then resumes the assembly instead of being written again.
+
+        :param upload_id: The session to write to.
+        :param offset: The Upload-Offset sent by the client.
+        :return: The session after the chunk was recorded.
+        """
+        upload = await UploadService.get_session(upload_id)
+        if upload.status != UploadStatusEnum.PENDING:
+            raise UploadSessionError(f"Upload session is {upload.status}.", 409)
+        if offset >= upload.upload_length:
+            raise UploadSessionError("Upload-Offset is past the declared Upload-Length.")
+
+        if upload.is_complete:
+            must_assemble = await Uploads.begin_assembly(upload.id)
+        else:
+            try:
+                written = await pdf_sessions.write_chunk(upload.id, offset, upload.upload_length - offset)
+            except FileNotFoundError as e:
+                # the backing file of an abandoned session was removed by housekeeping
+                await Uploads.finish_session(upload.id, UploadStatusEnum.FAILED)
+                raise UploadSessionError("Upload session expired.", 410) from e
+            if not written:
+                return upload
+            try:
+                upload, must_assemble = await Uploads.record_range(upload.id, offset, offset + written)
+            except StaleDataError as e:
+                raise UploadSessionError("Too many chunks of this session arrived at once, retry this one.", 409) from e
+        if must_assemble:
+            try:
+                await UploadService._assemble(upload)
+            except UploadSessionError:
+                raise
+            except Exception:
+                # let a retried chunk trigger assembly again
+                await Uploads.set_status(upload.id, UploadStatusEnum.PENDING)
+                raise
+        return upload
+
+    @staticmethod
+    async def _assemble(upload: Uploads) -> None:
+        """
+        Verify the received file, move it into the blob store and register its document.
+
+        The verified hash and the id the document will get are stored on the session before the
+        file is moved, so an attempt that failed half way is resumed by the next one from the blob.
+        """
+        offload = pdf_sessions.offloader()
+        if upload.document_id is None:
+            content_hash = await offload(pdf_sessions.digest, upload.id)
+            if upload.content_hash and upload.content_hash != content_hash:
+                logger.error(f"Upload {upload.id} checksum mismatch, expected {upload.content_hash} got {content_hash}")
+                await Uploads.finish_session(upload.id, UploadStatusEnum.FAILED)
+                await asyncio.to_thread(pdf_sessions.discard, upload.id)
+                raise UploadSessionError("Assembled file does not match the declared content hash.", 422)
+            document_id = uuid.uuid4()
+            await Uploads.reserve_document(upload.id, document_id, content_hash)
+            upload.document_id, upload.content_hash = document_id, content_hash
+
+        part = pdf_sessions.path_for(upload.id)
+        if await asyncio.to_thread(part.is_file):
+            _, duplicate = await offload(pdf_blobs.commit, part, upload.content_hash)
+        elif await asyncio.to_thread(pdf_blobs.exists, upload.content_hash):
+            duplicate = None  # moved by an earlier attempt
+        else:
+            await Uploads.finish_session(upload.id, UploadStatusEnum.FAILED)
+            raise UploadSessionError("Upload session expired.", 410)
+
+        if await Document.get_document_by_id(upload.document_id) is None:
+            batch = await DocumentBatch.get_batch_by_id(upload.batch_id)
+            spec: DocumentSpec = {
+                "id": upload.document_id,
+                "name": upload.filename,
+                "extension": Path(upload.filename).suffix.lstrip(".").lower(),
+                "content_hash": upload.content_hash,
+                "file_size": upload.upload_length,
+            }
+            await UploadService._register(batch, [spec])
+        await Uploads.finish_session(upload.id, UploadStatusEnum.COMPLETED)
+        upload.status = UploadStatusEnum.COMPLETED
+        logger.info(f"Upload {upload.id} assembled into document {upload.document_id}, duplicate blob: {duplicate}")
+
+    @staticmethod
+    async def register_files(
+        batch_id: uuid.UUID, files: "Sequence[StreamedFile]", passwords: Sequence[str] = ()
+    ) -> list[uuid.UUID]:
+        """
+        Register the files of a multipart upload, already in the blob store, as documents of a batch,
+        and queue the extraction of those not parsed before.
+
+        :param batch_id: The existing batch the documents are added to.
+        :param files: The stored files, see ``stream_multipart``.
+        :param passwords: The passwords of the files, in the same order; empty for files without one.
+        :return: The document ids, in the order of ``files``.
+        """
+        batch = await DocumentBatch.get_batch_by_id(batch_id)
+        if batch is None:
+            raise UploadSessionError(f"Batch {batch_id} not found.", 404)
+        specs: list[DocumentSpec] = [
+            {
+                "name": file_.filename,
+                "extension": Path(file_.filename).suffix.lstrip(".").lower(),
+                "password": password or None,
+                "content_hash": file_.content_hash,
+                "file_size": file_.size,
+            }
+            for file_, password in zip(files, itertools.chain(passwords, itertools.repeat("")))
+        ]
+        return await UploadService._register(batch, specs)
+
+    @staticmethod
+    async def _register(batch: DocumentBatch, specs: "list[DocumentSpec]") -> list[uuid.UUID]:
+        # a file already parsed under another document only costs its insert, it is not extracted again
+        sources = {
+            content_hash: await Document.get_processed_document_by_hash(content_hash)
+            for content_hash in {spec["content_hash"] for spec in specs}
+        }
+        document_ids = await DocumentBatch.add_documents(batch.id, batch.created_by, specs)
+        extract = []
+        for document_id, spec in zip(document_ids, specs, strict=True):
+            source = sources[spec["content_hash"]]
+            if source is not None:
+                await Document.reuse_results(document_id, batch.id, source)
+            else:
+                extract.append(document_id)
+        # concurrent, so the SQLite writer commits the jobs together
+        await asyncio.gather(*(JobService.enqueue_extraction(document_id) for document_id in extract))
+        return document_ids
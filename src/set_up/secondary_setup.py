@@ -5,9 +5,17 @@ from quart_uploads import configure_uploads
 from database.base import db
 from library.extensions import (
     configure_db_checkup,
+    configure_entity_cache,
+    configure_extraction,
     configure_heath_checkup,
+    configure_housekeeping,
     configure_lifespan,
+    configure_message_catalogue,
+    configure_password_hasher,
+    configure_session_tokens,
+    configure_text_cache,
     configure_thread_checkup,
+    configure_upload_scheduler,
     pdf_loader,
 )
 
@@ -27,11 +35,22 @@ def register_app(app: Quart) -> None:
     configure_db_checkup(app)
     configure_lifespan(app)
     configure_uploads(app, pdf_loader)
+    configure_upload_scheduler(app)
+    configure_extraction(app)
+    configure_text_cache(app)
+    configure_entity_cache(app)
+    configure_message_catalogue(app)
+    configure_password_hasher(app)
+    configure_session_tokens(app)
+    configure_housekeeping(app)
     register_commands(app)
 
 
 def register_commands(app: Quart) -> None:
-    from commands import create_user, init_db
+    from commands import create_user, import_users, init_db, rebalance_tenant, run_worker
 
     app.cli.add_command(init_db)
     app.cli.add_command(create_user)
+    app.cli.add_command(run_worker)
+    app.cli.add_command(rebalance_tenant)
+    app.cli.add_command(import_users)
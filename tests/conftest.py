@@ -0,0 +1,62 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from quart import Blueprint, Quart
+from quart_schema import QuartSchema
+from quart_uploads import UploadSet, configure_uploads
+
+from blueprints import auth_bp, bp, documents_bp
+from database import db
+from library.extensions import (
+    configure_password_hasher,
+    configure_session_tokens,
+    password_hasher,
+    pdf_loader,
+)
+
+
+def _configure_uploads(app: Quart, upload_set: UploadSet) -> None:
+    configure_uploads(app, upload_set)
+    upload_set._config = None  # noqa: SLF001 - the upload set caches the config of the first app it sees
+
+
+@pytest.fixture
+def upload_app(tmp_path: Path) -> Quart:
+    """Fixture to create a bare Quart app whose upload destination is a temp directory."""
+    app = Quart(__name__)
+    app.config["UPLOADS_DEFAULT_DEST"] = str(tmp_path)
+    _configure_uploads(app, pdf_loader)
+    return app
+
+
+@pytest_asyncio.fixture
+async def app(tmp_path: Path) -> AsyncIterator[Quart]:
+    """Fixture to create the application's blueprints and models on a temporary SQLite database."""
+    app = Quart(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite+aiosqlite:///{tmp_path / 'app.db'}",
+        SQLALCHEMY_RECORD_QUERIES=False,
+        UPLOADS_DEFAULT_DEST=str(tmp_path / "uploads"),
+        PASSWORD_HASH_EXECUTOR="thread",  # noqa: S106
+        PASSWORD_HASH_ITERATIONS=1000,
+        SESSION_TOKEN_SECRET="test-secret",  # noqa: S106
+    )
+    QuartSchema(app)
+    db.init_app(app)
+    _configure_uploads(app, pdf_loader)
+    configure_password_hasher(app)
+    configure_session_tokens(app)
+
+    api_v1 = Blueprint("parent", __name__, url_prefix="/api/v1")
+    api_v1.register_blueprint(bp)
+    api_v1.register_blueprint(documents_bp)
+    api_v1.register_blueprint(auth_bp)
+    app.register_blueprint(api_v1)
+
+    async with app.app_context():
+        await db.create_all()
+    yield app
+    await password_hasher.close()
+    await db.engine.dispose()
@@ -0,0 +1,101 @@
+# ruff: noqa: S101
+import base64
+import binascii
+import hashlib
+
+import pytest
+from quart import Quart
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import db
+from database.models import Account
+from library.extensions.password_hasher_extn import password_hasher
+from service.account_service import AccountService
+
+
+async def _add_legacy_account(email: str, password: str) -> Account:
+    """An account whose password was hashed before the hash parameters were stored."""
+    salt = b"0123456789abcdef"
+    key = binascii.hexlify(hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 10000))
+    account = Account(
+        email=email,
+        name="legacy",
+        password=base64.b64encode(key).decode(),
+        password_salt=base64.b64encode(salt).decode(),
+        password_params=None,
+        interface_language="en-US",
+        interface_theme="default",
+        timezone="UTC",
+        last_login_ip="From UI",
+    )
+
+    async def add(session: AsyncSession) -> Account:
+        session.add(account)
+        return account
+
+    return await db.run_write(add)
+
+
+@pytest.mark.asyncio
+async def test_legacy_hash_is_rewritten_on_login(app: Quart) -> None:
+    """Test that signing in to an account without hash parameters stores a hash with the current ones."""
+    async with app.app_context():
+        legacy = await _add_legacy_account("old@example.com", "old secret")
+        upgrades = password_hasher.stats()["upgrades"]
+
+        assert await AccountService.authenticate("old@example.com", "wrong secret") is None
+        assert (await Account.get_by_email("old@example.com")).password_params is None
+
+        assert await AccountService.authenticate("old@example.com", "old secret") is not None
+        stored = await Account.get_by_email("old@example.com")
+        assert password_hasher.stats()["upgrades"] == upgrades + 1
+
+        assert stored.password_params == password_hasher.params.encode()
+        assert stored.password != legacy.password
+        assert stored.password_salt != legacy.password_salt
+        assert await AccountService.authenticate("old@example.com", "old secret") is not None
+        assert password_hasher.stats()["upgrades"] == upgrades + 1
+
+
+@pytest.mark.asyncio
+async def test_import_accounts(app: Quart, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that an import inserts each new email once, normalised, and counts what it skipped."""
+    records = [
+        {"email": "a@example.com", "password": "secret a"},
+        {"email": "not-an-email", "password": "secret"},
+        {"email": " A@Example.com ", "password": "secret a again"},
+        {"email": "b@example.com", "name": "Bee"},
+        {"email": "a@example.com", "password": "secret a again"},
+        {"email": "old@example.com", "password": "secret old"},
+        {"email": "c@example.com", "password": "secret c", "timezone": "Asia/Kolkata"},
+        {"email": "", "password": "secret"},
+        {"email": "a@example.com", "password": "secret a again"},
+    ]
+    async with app.app_context():
+        await AccountService.create_account(" Old@Example.com", "old secret", "Old")
+        totals = [
+            (progress.read, progress.created, progress.skipped, progress.invalid)
+            async for progress in AccountService.import_accounts(records, chunk_size=3)
+        ]
+        a = await AccountService.authenticate("A@Example.com ", "secret a")
+        b = await Account.get_by_email("b@example.com")
+        c = await Account.get_by_email("c@example.com")
+        old = await AccountService.authenticate("OLD@example.com", "old secret")
+        emails = await Account.existing_emails(["a@example.com", "b@example.com", "c@example.com", "old@example.com"])
+
+        # an account created between the check and the insert is counted as skipped
+        monkeypatch.setattr(Account, "existing_emails", classmethod(_no_emails))
+        [raced] = [progress async for progress in AccountService.import_accounts([{"email": "c@example.com"}])]
+
+    assert totals == [(6, 1, 3, 1), (9, 2, 4, 2), (9, 3, 4, 2)]
+    assert emails == {"a@example.com", "b@example.com", "c@example.com", "old@example.com"}
+    assert a is not None
+    assert a.name == "a"
+    assert (b.name, b.password, b.password_salt) == ("Bee", None, None)
+    assert c.timezone == "Asia/Kolkata"
+    assert (old.email, old.name) == ("old@example.com", "Old")
+    assert (raced.read, raced.created, raced.skipped) == (1, 0, 1)
+
+
+async def _no_emails(_: type[Account], __: object) -> set[str]:
+    return set()
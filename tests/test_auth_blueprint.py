@@ -0,0 +1,122 @@
+# ruff: noqa: S101,  PLR2004
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from quart import Quart, g
+
+from database.models import Account
+from library.extensions import login_required, session_tokens
+from service.account_service import AccountService
+
+AUTH = "/api/v1/auth"
+
+
+async def _login(app: Quart, email: str, password: str) -> str:
+    response = await app.test_client().post(f"{AUTH}/login", json={"email": email, "password": password})
+    assert response.status_code == 200
+    return (await response.get_json())["token"]
+
+
+@pytest.mark.asyncio
+async def test_login_then_logout(app: Quart) -> None:
+    """Test that a token is accepted after login and rejected after logout, on every device of the account."""
+
+    @app.route("/whoami")
+    @login_required
+    async def whoami() -> tuple[dict[str, str], int]:
+        return {"account_id": str(g.token.account_id)}, 200
+
+    async with app.app_context():
+        account = await AccountService.create_account("ada@example.com", "correct horse", "Ada")
+    client = app.test_client()
+
+    wrong = await client.post(f"{AUTH}/login", json={"email": "ada@example.com", "password": "wrong horse"})
+    assert wrong.status_code == 401
+    token = await _login(app, "ada@example.com", "correct horse")
+    other_device = await _login(app, "ada@example.com", "correct horse")
+
+    response = await client.get("/whoami", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert await response.get_json() == {"account_id": str(account.id)}
+    assert (await client.get("/whoami")).status_code == 401
+
+    assert (await client.post(f"{AUTH}/logout", headers={"Authorization": f"Bearer {token}"})).status_code == 204
+    # the first token is rejected from the validation cache, the other one after a database check
+    for stale in (token, other_device):
+        response = await client.get("/whoami", headers={"Authorization": f"Bearer {stale}"})
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert (await client.post(f"{AUTH}/logout", headers={"Authorization": f"Bearer {token}"})).status_code == 401
+
+    fresh = await _login(app, "ada@example.com", "correct horse")
+    assert (await client.get("/whoami", headers={"Authorization": f"Bearer {fresh}"})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_revoke_tokens(app: Quart) -> None:
+    """Test that revoking bumps the token version of the account once per call and ignores unknown accounts."""
+    async with app.app_context():
+        account = await AccountService.create_account("ada@example.com", "correct horse", "Ada")
+
+        assert await Account.revoke_tokens(account.id) == 1
+        assert await Account.revoke_tokens(account.id) == 2
+        assert await Account.revoke_tokens(uuid.uuid4()) is None
+        assert (await Account.get_token_state(account.id)).token_version == 2
+        assert not await AccountService.revoke_sessions(uuid.uuid4())
+
+
+@pytest.mark.asyncio
+async def test_activity_is_flushed(app: Quart) -> None:
+    """Test that the activity of validated tokens is written to last_active_at, in UTC, in one flush."""
+    async with app.app_context():
+        ada = await AccountService.create_account("ada@example.com", "correct horse", "Ada")
+        bob = await AccountService.create_account("bob@example.com", "battery staple", "Bob")
+        seen_at = datetime(2024, 1, 1)  # noqa: DTZ001 - the column is naive
+        assert await Account.touch_many({ada.id: seen_at, bob.id: seen_at, uuid.uuid4(): seen_at}) == 2
+        assert (await Account.get_by_email("bob@example.com")).last_active_at == seen_at
+        # activity left over from other tests
+        await session_tokens.flush()
+
+    tokens = [
+        await _login(app, "ada@example.com", "correct horse"),
+        await _login(app, "bob@example.com", "battery staple"),
+    ]
+    async with app.app_context():
+        for token in tokens:
+            assert await session_tokens.validate(token) is not None
+        assert await session_tokens.flush() == 2
+        accounts = [await Account.get_by_email(email) for email in ("ada@example.com", "bob@example.com")]
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for account in accounts:
+        assert now - timedelta(minutes=1) < account.last_active_at <= now
+        assert now - timedelta(minutes=1) < account.last_login_at <= now
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("remote_addr", "stored"),
+    [
+        ("2001:0db8:85a3:0000:0000:8a2e:0370:7334", "2001:db8:85a3::8a2e:370:7334"),
+        ("0000:0000:0000:0000:0000:ffff:192.168.100.200", "192.168.100.200"),
+        ("fe80::1%eth0", "fe80::1"),
+        ("203.0.113.7", "203.0.113.7"),
+    ],
+)
+async def test_login_records_the_address(app: Quart, remote_addr: str, stored: str) -> None:
+    """Test that a login from any address, IPv6 included, is recorded in a form that fits the column."""
+    async with app.app_context():
+        await AccountService.create_account("ada@example.com", "correct horse", "Ada")
+
+    response = await app.test_client().post(
+        f"{AUTH}/login",
+        json={"email": "ada@example.com", "password": "correct horse"},
+        scope_base={"client": (remote_addr, 50000)},
+    )
+
+    assert response.status_code == 200
+    async with app.app_context():
+        account = await Account.get_by_email("ada@example.com")
+    assert account.last_login_ip == stored
+    assert len(account.last_login_ip) <= Account.last_login_ip.type.length
@@ -1,8 +1,11 @@
 # ruff: noqa: S101,  PLR2004
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
 import pytest
 from quart import Quart
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncEngine, async_scoped_session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_scoped_session
 
 from src.library.extensions.database_extn import SqlAlchemy
 
@@ -163,3 +166,430 @@ async def test_query_method(quart_app: Quart, db: SqlAlchemy) -> None:
             results = session.query(MessageCatalogue).where(MessageCatalogue.language == "en").all()
             assert len(results) == 1
             assert results[0].message == "Hello"
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_task_local(quart_app: Quart, db: SqlAlchemy) -> None:
+    """Test that concurrent tasks get their own session, released when the task finishes."""
+    import asyncio
+
+    async def current_session() -> object:
+        async with quart_app.app_context():
+            session = db.session()
+            await session.execute(text("SELECT 1"))
+            await asyncio.sleep(0.01)
+            return session
+
+    first, second = await asyncio.gather(current_session(), current_session())
+    assert first is not second
+    assert db.session() is db.session()
+
+    async def background() -> None:
+        await db.session().execute(text("SELECT 1"))
+
+    task = asyncio.create_task(background())
+    await task
+    await asyncio.sleep(0.05)
+    assert task not in db.session.registry.registry
+
+
+@pytest.mark.asyncio
+async def test_replica_routing(tmp_path: Path) -> None:
+    """Test that plain reads go to replicas round-robin while writes and later reads stay on the primary."""
+    from sqlalchemy import Integer, MetaData, String, insert, select
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Node(Base):
+        __tablename__ = "node"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        name: Mapped[str] = mapped_column(String(50))
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_REPLICA_URIS"] = [f"sqlite+aiosqlite:///{tmp_path / f'replica{i}.db'}" for i in range(2)]
+    db = SqlAlchemy(app, model_class=Base)
+    for name, engine in [("primary", db.engine), ("replica0", db.replicas[0]), ("replica1", db.replicas[1])]:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Node), [{"id": 1, "name": name}])
+
+    async def read_name() -> str:
+        async with app.app_context():
+            return (await db.session.execute(select(Node.name))).scalar_one()
+
+    assert sorted([await read_name(), await read_name()]) == ["replica0", "replica1"]
+    assert db.replica_status()[0]["healthy"]
+
+    async with app.app_context():
+        await db.session.execute(insert(Node).values(id=2, name="written"))
+        await db.session.commit()
+        assert (await db.session.execute(select(Node.name).where(Node.id == 1))).scalar_one() == "primary"
+
+    for engine in [db.engine, *db.replicas]:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_fallback(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that reads fall back to the primary while the replica lags or fails its check, and return once it is back."""
+    from sqlalchemy import Integer, MetaData, String, insert, select
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    from src.library.extensions import database_extn
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Node(Base):
+        __tablename__ = "node"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        name: Mapped[str] = mapped_column(String(50))
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_REPLICA_URIS"] = [f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"]
+    app.config["SQLALCHEMY_REPLICA_MAX_LAG"] = 5.0
+    db = SqlAlchemy(app, model_class=Base)
+    for name, engine in [("primary", db.engine), ("replica", db.replicas[0])]:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Node), [{"id": 1, "name": name}])
+
+    async def read_name() -> str:
+        async with app.app_context():
+            return (await db.session.execute(select(Node.name))).scalar_one()
+
+    async def check(lag_sql: str) -> dict:
+        monkeypatch.setitem(database_extn._REPLICA_LAG_SQL, "sqlite", lag_sql)  # noqa: SLF001
+        [status] = await db.check_replicas()
+        return status
+
+    lagging = await check("SELECT 30")
+    assert (lagging["healthy"], lagging["lag"]) == (False, 30.0)
+    assert await read_name() == "primary"
+
+    failing = await check("SELECT lag FROM replication_status")
+    assert (failing["healthy"], failing["lag"]) == (False, None)
+    assert "replication_status" in failing["error"]
+    assert await read_name() == "primary"
+
+    caught_up = await check("SELECT 1")
+    assert (caught_up["healthy"], caught_up["lag"], caught_up["error"]) == (True, 1.0, None)
+    assert await read_name() == "replica"
+
+    for engine in [db.engine, *db.replicas]:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_production_mode(tmp_path: Path) -> None:
+    """Test that WAL is enabled and concurrent writes are group committed by the single writer."""
+    import asyncio
+
+    from sqlalchemy import Integer, MetaData, String, func, insert, select
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Event(Base):
+        __tablename__ = "event"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        name: Mapped[str] = mapped_column(String(50))
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'edge.db'}"
+    app.config["SQLITE_PRODUCTION_MODE"] = True
+    db = SqlAlchemy(app, model_class=Base)
+    await db.create_all()
+
+    def write(event_id: int) -> Callable[[AsyncSession], Awaitable[int]]:
+        async def operation(session: AsyncSession) -> int:
+            await session.execute(insert(Event).values(id=event_id, name=f"event {event_id}"))
+            return event_id
+
+        return operation
+
+    results = await asyncio.gather(*(db.run_write(write(i % 40)) for i in range(50)), return_exceptions=True)
+    assert sum(isinstance(result, IntegrityError) for result in results) == 10
+    assert db.write_queue.stats()["batches"] < 50
+
+    async with app.app_context():
+        assert (await db.session.execute(select(func.count()).select_from(Event))).scalar_one() == 40
+        async with db.engine.connect() as conn:
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar_one() == "wal"
+
+    for engine in [db.engine, *db.replicas]:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_batched_writes_are_recorded_per_request(tmp_path: Path) -> None:
+    """Test that writes group committed by the SQLite writer are recorded for the request that submitted them."""
+    import asyncio
+
+    from sqlalchemy import Integer, MetaData, insert
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Event(Base):
+        __tablename__ = "event"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'edge.db'}"
+    app.config["SQLITE_PRODUCTION_MODE"] = True
+    db = SqlAlchemy(app, model_class=Base)
+    await db.create_all()
+
+    @app.route("/events/<int:first>/<int:count>", methods=["POST"])
+    async def add_events(first: int, count: int) -> tuple[dict[str, int], int]:
+        async def add(session: AsyncSession, event_id: int) -> None:
+            await session.execute(insert(Event).values(id=event_id))
+
+        await asyncio.gather(*(db.run_write(lambda s, i=i: add(s, i)) for i in range(first, first + count)))
+        return {"written": count}, 200
+
+    client = app.test_client()
+    async with app.test_app():
+        responses = await asyncio.gather(client.post("/events/0/1"), client.post("/events/10/3"))
+        stats = await (await client.get("/sql-stats")).get_json()
+
+    assert [response.status_code for response in responses] == [200, 200]
+    # each write is a savepoint and an insert, the write opening a batch also runs its BEGIN
+    queries = {item["path"]: item["queries"] for item in stats["recent"]}
+    assert 2 <= queries["/events/0/1"] <= 3
+    assert 6 <= queries["/events/10/3"] <= 7
+    assert db.write_queue.stats()["batches"] < 4
+
+
+@pytest.mark.asyncio
+async def test_query_recording(quart_app: Quart, db: SqlAlchemy) -> None:
+    """Test that request timings reach the Server-Timing header and repeated selects are flagged."""
+
+    @quart_app.route("/items")
+    async def items() -> tuple[dict[str, int], int]:
+        statement = text("SELECT :value")
+        values = [(await db.session.execute(statement, {"value": i})).scalar_one() for i in range(6)]
+        return {"total": sum(values)}, 200
+
+    client = quart_app.test_client()
+    async with quart_app.test_app():
+        response = await client.get("/items")
+        assert response.status_code == 200
+        assert 'desc="6 queries"' in response.headers["Server-Timing"]
+
+        stats = await (await client.get("/sql-stats")).get_json()
+        assert stats["requests"] == 1
+        assert stats["n_plus_one"][0]["n_plus_one"] == {"SELECT ?": 6}
+
+
+@pytest.mark.asyncio
+async def test_streamed_query_recording(quart_app: Quart, db: SqlAlchemy) -> None:
+    """Test that the queries of a streamed body are kept for /sql-stats once the body was sent."""
+    from collections.abc import AsyncIterator
+
+    @quart_app.route("/items.ndjson")
+    async def items() -> tuple:
+        async def lines() -> AsyncIterator[bytes]:
+            for i in range(3):
+                yield f"{(await db.session.execute(text('SELECT :value'), {'value': i})).scalar_one()}\n".encode()
+
+        return db.record_stream(lines()), 200
+
+    client = quart_app.test_client()
+    async with quart_app.test_app():
+        response = await client.get("/items.ndjson")
+        assert await response.get_data() == b"0\n1\n2\n"
+        assert 'desc="0 queries"' in response.headers["Server-Timing"]
+
+        stats = await (await client.get("/sql-stats")).get_json()
+        assert stats["recent"][0]["path"] == "/items.ndjson (body)"
+        assert stats["recent"][0]["queries"] == 3
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert(quart_app: Quart, db: SqlAlchemy) -> None:
+    """Test that a chunked bulk upsert inserts new rows, updates those colliding on the unique key and counts both."""
+    from sqlalchemy import Integer, String, UniqueConstraint, select
+    from sqlalchemy.orm import Mapped, mapped_column
+
+    class Message(db.Model):
+        __tablename__ = "message"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        code: Mapped[str] = mapped_column(String(10))
+        language: Mapped[str] = mapped_column(String(20))
+        text: Mapped[str] = mapped_column(String(300))
+        __table_args__ = (UniqueConstraint(code, language, name="unique_message_code"),)
+
+    async with quart_app.app_context():
+        await db.create_all()
+        rows = [{"code": f"M{i:04d}", "language": "en", "text": f"message {i}"} for i in range(250)]
+        assert await db.bulk_upsert(Message, rows, chunk_size=100) == 250
+
+        changed = [{**row, "text": row["text"].upper()} for row in rows[200:]]
+        added = [{"code": f"M{i:04d}", "language": "de", "text": f"nachricht {i}"} for i in range(10)]
+        assert await db.bulk_upsert(Message, changed + added) == 60
+        # rows left untouched are not counted
+        assert await db.bulk_upsert(Message, rows[:10], update=()) == 0
+        assert await db.bulk_upsert(Message, [*rows[:10], *added, {**added[0], "language": "fr"}], update=()) == 1
+
+        messages = {(m.code, m.language): m.text for m in (await db.session.scalars(select(Message))).all()}
+        assert len(messages) == 261
+        assert messages["M0000", "en"] == "message 0"
+        assert messages["M0249", "en"] == "MESSAGE 249"
+        assert messages["M0009", "de"] == "nachricht 9"
+
+
+@pytest.mark.asyncio
+async def test_pool_warm_up_and_drain(tmp_path: Path) -> None:
+    """Test that serving starts with a filled pool and shutdown waits for checked out connections."""
+    import asyncio
+    import time
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": 3, "max_overflow": 0}
+    app.config["SQLALCHEMY_WARMUP_QUERIES"] = ["SELECT 1"]
+    db = SqlAlchemy(app)
+
+    async def hold_connection() -> None:
+        async with db.engine.connect() as conn:
+            await asyncio.sleep(0.2)
+            await conn.execute(text("SELECT 1"))
+
+    async with app.test_app():
+        pool = db.engine.pool
+        assert pool.checkedin() == 3
+        background = asyncio.create_task(hold_connection())
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+
+    assert time.perf_counter() - started >= 0.15
+    assert background.done()
+    assert background.exception() is None
+    assert pool.checkedin() == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_runs_after_other_shutdown_hooks(tmp_path: Path) -> None:
+    """Test that the engines are drained after the after_serving hooks of extensions registered later."""
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'drain.db'}"
+    db = SqlAlchemy(app)
+    order = []
+    drain = db.drain
+
+    async def drained() -> None:
+        order.append("drain")
+        await drain()
+
+    @app.after_serving
+    async def flush_activity() -> None:
+        async with db.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        order.append("flush_activity")
+
+    db.drain = drained
+    async with app.test_app():
+        pass
+
+    assert order == ["flush_activity", "drain"]
+    assert db.engine.pool.checkedin() == 0
+
+
+@pytest.mark.asyncio
+async def test_tenant_from_request(tmp_path: Path) -> None:
+    """Test that a route's tenant_id wins over the header, which only names the tenant of other routes."""
+    from sqlalchemy import Integer, MetaData, String, func, select
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Item(Base):
+        __tablename__ = "items"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        tenant_id: Mapped[str] = mapped_column(String(36))
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_SHARD_URIS"] = {"eu": f"sqlite+aiosqlite:///{tmp_path / 'eu.db'}"}
+    app.config["SQLALCHEMY_SHARD_MAP"] = {"acme": "eu"}
+    app.config["SQLALCHEMY_SHARDED_TABLES"] = ["items"]
+    db = SqlAlchemy(app, model_class=Base)
+    await db.create_all()
+    async with app.app_context():
+        for offset, (tenant_id, count) in enumerate((("acme", 3), ("globex", 5))):
+            with db.tenant(tenant_id):
+                db.session.add_all([Item(id=offset * 10 + i, tenant_id=tenant_id) for i in range(count)])
+                await db.session.commit()
+
+    @app.route("/items")
+    @app.route("/tenants/<tenant_id>/items")
+    async def items(tenant_id: str | None = None) -> tuple[dict[str, int], int]:  # noqa: ARG001
+        return {"items": (await db.session.execute(select(func.count()).select_from(Item))).scalar_one()}, 200
+
+    client = app.test_client()
+    header = db._tenant_header  # noqa: SLF001
+    assert await (await client.get("/tenants/acme/items")).get_json() == {"items": 3}
+    assert await (await client.get("/tenants/acme/items", headers={header: "acme"})).get_json() == {"items": 3}
+    assert (await client.get("/tenants/acme/items", headers={header: "globex"})).status_code == 400
+    assert await (await client.get("/items", headers={header: "acme"})).get_json() == {"items": 3}
+    assert await (await client.get("/items", headers={header: "globex"})).get_json() == {"items": 5}
+
+    for _, async_engine in db.named_engines():
+        await async_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_tenant_shard_routing(tmp_path: Path) -> None:
+    """Test that tenant rows are routed to the mapped shard and copied between shards."""
+    from sqlalchemy import Integer, MetaData, String, func, select
+    from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+    class Base(DeclarativeBase):
+        metadata = MetaData()
+
+    class Item(Base):
+        __tablename__ = "items"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        tenant_id: Mapped[str] = mapped_column(String(36))
+        name: Mapped[str] = mapped_column(String(50))
+
+    app = Quart(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    app.config["SQLALCHEMY_SHARD_URIS"] = {"eu": f"sqlite+aiosqlite:///{tmp_path / 'eu.db'}"}
+    app.config["SQLALCHEMY_SHARD_MAP"] = {"acme": "eu"}
+    app.config["SQLALCHEMY_SHARDED_TABLES"] = ["items"]
+    db = SqlAlchemy(app, model_class=Base)
+    await db.create_all()
+
+    async def count(tenant_id: str, shard: str) -> int:
+        async with db.shards[shard].connect() as conn:
+            return (await conn.execute(select(func.count()).where(Item.tenant_id == tenant_id))).scalar_one()
+
+    for offset, tenant_id in enumerate(("acme", "globex")):
+        async with app.app_context():
+            with db.tenant(tenant_id):
+                db.session.add_all([Item(id=offset * 10 + i, tenant_id=tenant_id, name=tenant_id) for i in range(5)])
+                await db.session.commit()
+    assert (await count("acme", "eu"), await count("acme", "default")) == (5, 0)
+    assert (await count("globex", "eu"), await count("globex", "default")) == (0, 5)
+
+    async with app.app_context():
+        with pytest.raises(RuntimeError):
+            await db.session.execute(select(Item))
+
+    assert await db.copy_tenant("globex", "default", "eu", batch_size=2) == {"items": 5}
+    assert await db.copy_tenant("globex", "default", "eu", batch_size=2) == {"items": 5}
+    assert await db.delete_tenant("globex", "default") == {"items": 5}
+    assert (await count("globex", "eu"), await count("globex", "default")) == (5, 0)
+    assert await count("acme", "eu") == 5
+    await db.drain()
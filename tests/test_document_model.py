@@ -0,0 +1,169 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import uuid
+from pathlib import Path
+
+import pytest
+from quart import Quart
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from database.models import Document, DocumentBatch
+
+
+def _specs(count: int) -> list[dict]:
+    return [{"name": f"doc-{index}", "extension": "pdf", "file_size": index} for index in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_register_batch(app: Quart) -> None:
+    """Test that a batch and its documents are inserted across several INSERT chunks, in input order."""
+    async with app.app_context():
+        batch, document_ids = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(5), chunk_size=2)
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+        documents = await Document.get_documents_by_batch_id(batch.id)
+
+    assert stored.batch_size == 5
+    assert len(set(document_ids)) == 5
+    by_id = {document.id: document for document in documents}
+    assert [by_id[document_id].name for document_id in document_ids] == [f"doc-{index}" for index in range(5)]
+    assert all(document.created_by == batch.created_by for document in documents)
+
+
+@pytest.mark.asyncio
+async def test_register_empty_batch(app: Quart) -> None:
+    """Test that a batch can be registered without documents."""
+    async with app.app_context():
+        batch, document_ids = await DocumentBatch.register_batch("empty", uuid.uuid4(), [])
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+
+    assert document_ids == []
+    assert stored.batch_size == 0
+
+
+@pytest.mark.asyncio
+async def test_add_documents_grows_batch(app: Quart) -> None:
+    """Test that documents added to a batch keep given ids and grow ``batch_size``; no documents change nothing."""
+    given = uuid.uuid4()
+    async with app.app_context():
+        batch, _ = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(2))
+        document_ids = await DocumentBatch.add_documents(
+            batch.id, batch.created_by, [{"id": given, "name": "extra", "extension": "pdf"}, *_specs(2)], 2
+        )
+        assert await DocumentBatch.add_documents(batch.id, batch.created_by, []) == []
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+        documents = await Document.get_documents_by_batch_id(batch.id)
+
+    assert document_ids[0] == given
+    assert stored.batch_size == 5
+    assert len(documents) == 5
+
+
+@pytest.mark.asyncio
+async def test_add_documents_rolls_back(app: Quart) -> None:
+    """Test that an invalid row undoes the chunks already inserted and the ``batch_size`` update."""
+    specs = [*_specs(3), {"name": None, "extension": "pdf"}]
+    async with app.app_context():
+        batch, _ = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(1))
+        with pytest.raises(IntegrityError):
+            await DocumentBatch.add_documents(batch.id, batch.created_by, specs, chunk_size=2)
+        with pytest.raises(IntegrityError):
+            await DocumentBatch.register_batch("broken", uuid.uuid4(), specs, chunk_size=2)
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+        documents = await Document.get_documents_by_batch_id(batch.id)
+
+    assert stored.batch_size == 1
+    assert len(documents) == 1
+
+
+@pytest.mark.asyncio
+async def test_add_documents_unknown_batch(app: Quart) -> None:
+    """Test that documents are not added to a batch that does not exist."""
+    async with app.app_context():
+        with pytest.raises(ValueError, match="not found"):
+            await DocumentBatch.add_documents(uuid.uuid4(), uuid.uuid4(), _specs(1))
+
+
+@pytest.mark.asyncio
+async def test_add_document_grows_batch(app: Quart) -> None:
+    """Test that a single document is counted in its batch like the bulk ones."""
+    async with app.app_context():
+        batch, _ = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(1))
+        await Document.add_document(batch.id, "single", "pdf", None, None, batch.created_by, None, None, None)
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+
+    assert stored.batch_size == 2
+
+
+@pytest.mark.asyncio
+async def test_writes_go_through_the_sqlite_writer(tmp_path: Path) -> None:
+    """Test that concurrent model writes are group committed by the single writer in SQLite production mode."""
+    app = Quart(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite+aiosqlite:///{tmp_path / 'app.db'}",
+        SQLALCHEMY_RECORD_QUERIES=False,
+        SQLITE_PRODUCTION_MODE=True,
+    )
+    db.init_app(app)
+    try:
+        async with app.app_context():
+            await db.create_all()
+            batch, document_ids = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(20))
+            await asyncio.gather(*(Document.mark_processing_started(id_, batch.id) for id_ in document_ids))
+            await asyncio.gather(*(Document.mark_parsing_completed(id_, batch.id) for id_ in document_ids))
+            stored = await DocumentBatch.get_batch_by_id(batch.id)
+        stats = db.write_queue.stats()
+    finally:
+        for engine in [db.engine, *db.replicas]:
+            await engine.dispose()
+
+    assert stats["operations"] == 41
+    assert stats["batches"] < 41
+    assert stored.processing_started_at is not None
+    assert stored.parsing_completed_at is not None
+
+
+def test_projection_selects_named_columns() -> None:
+    """Test that a projection selects only the named columns, all of them when none are named."""
+    assert [column.name for column in Document.projection("id", "name").selected_columns] == ["id", "name"]
+    assert len(Document.projection().selected_columns) == len(Document.__table__.c)
+    with pytest.raises(ValueError, match="Document has no column color, shape"):
+        Document.projection("id", "color", "shape")
+
+
+@pytest.mark.asyncio
+async def test_project_returns_rows(app: Quart) -> None:
+    """Test that ``project`` filters, orders and limits plain rows carrying only the requested values."""
+    async with app.app_context():
+        batch, _ = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(5))
+        await DocumentBatch.register_batch("other", uuid.uuid4(), _specs(2))
+        rows = await Document.project(
+            "name",
+            "file_size",
+            where=[Document.batch_id == batch.id, Document.file_size >= 1],
+            order_by=[Document.file_size.desc()],
+            limit=3,
+        )
+
+    assert [tuple(row) for row in rows] == [("doc-4", 4), ("doc-3", 3), ("doc-2", 2)]
+    assert rows[0].name == "doc-4"
+    assert rows[0]._mapping["file_size"] == 4  # noqa: SLF001 - the public Row API
+    assert not isinstance(rows[0], Document)
+    with pytest.raises(AttributeError):
+        _ = rows[0].extension
+
+
+@pytest.mark.asyncio
+async def test_documents_page_columns(app: Quart) -> None:
+    """Test that ``get_documents_page(columns=)`` returns rows of the named columns and rejects unknown ones."""
+    async with app.app_context():
+        batch, document_ids = await DocumentBatch.register_batch("scans", uuid.uuid4(), _specs(4))
+        first = await Document.get_documents_page(batch.id, limit=2, columns=("id", "name"))
+        rest = await Document.get_documents_page(batch.id, after=first[-1].id, limit=10, columns=("id", "name"))
+        documents = await Document.get_documents_page(batch.id, limit=1)
+        with pytest.raises(ValueError, match="no column color"):
+            await Document.get_documents_page(batch.id, columns=("id", "color"))
+
+    assert [row.id for row in first + rest] == sorted(document_ids)
+    assert first[0]._fields == ("id", "name")
+    assert isinstance(documents[0], Document)
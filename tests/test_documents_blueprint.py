@@ -0,0 +1,81 @@
+# ruff: noqa: S101,  PLR2004
+import json
+import uuid
+
+import pytest
+from quart import Quart
+
+from database.models import DocumentBatch
+
+BATCHES = "/api/v1/batches"
+
+
+async def _batch(app: Quart, count: int) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    specs = [{"name": f"doc-{index}", "extension": "pdf", "file_size": index} for index in range(count)]
+    async with app.app_context():
+        batch, document_ids = await DocumentBatch.register_batch("scans", uuid.uuid4(), specs)
+    return batch.id, sorted(document_ids)
+
+
+@pytest.mark.asyncio
+async def test_list_documents_pages(app: Quart) -> None:
+    """Test that following ``next_cursor`` walks every document once, in id order."""
+    batch_id, document_ids = await _batch(app, 7)
+    client = app.test_client()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        query = {"limit": 3} if cursor is None else {"limit": 3, "after": cursor}
+        response = await client.get(f"{BATCHES}/{batch_id}/documents", query_string=query)
+        assert response.status_code == 200
+        body = await response.get_json()
+        seen.extend(uuid.UUID(document["id"]) for document in body["documents"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == document_ids
+    assert pages == 3
+    assert set(body["documents"][0]) >= {"id", "batch_id", "name", "parsing_failed_at", "archived"}
+
+
+@pytest.mark.asyncio
+async def test_list_documents_last_full_page(app: Quart) -> None:
+    """Test that a page that ends exactly at the last document has no cursor, and the default limit applies."""
+    batch_id, document_ids = await _batch(app, 4)
+    client = app.test_client()
+
+    body = await (await client.get(f"{BATCHES}/{batch_id}/documents", query_string={"limit": 4})).get_json()
+    assert body["next_cursor"] is None
+    assert len(body["documents"]) == 4
+
+    body = await (await client.get(f"{BATCHES}/{batch_id}/documents")).get_json()
+    assert len(body["documents"]) == 4
+
+    after = str(document_ids[-1])
+    body = await (await client.get(f"{BATCHES}/{batch_id}/documents", query_string={"after": after})).get_json()
+    assert body == {"documents": [], "next_cursor": None}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", [{"limit": 0}, {"limit": 1001}, {"limit": "many"}, {"after": "not-a-uuid"}])
+async def test_list_documents_rejects_bad_query(app: Quart, query: dict) -> None:
+    """Test that out of range limits and malformed cursors are refused."""
+    batch_id, _ = await _batch(app, 1)
+    response = await app.test_client().get(f"{BATCHES}/{batch_id}/documents", query_string=query)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_stream_documents(app: Quart) -> None:
+    """Test that the NDJSON export has one JSON object per document, in id order."""
+    batch_id, document_ids = await _batch(app, 5)
+
+    response = await app.test_client().get(f"{BATCHES}/{batch_id}/documents.ndjson")
+
+    assert response.status_code == 200
+    assert response.content_type == "application/x-ndjson"
+    lines = (await response.get_data()).splitlines()
+    assert len(lines) == 5
+    assert [uuid.UUID(json.loads(line)["id"]) for line in lines] == document_ids
@@ -0,0 +1,166 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import json
+import pickle
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from database.base import Base
+from database.models import Document
+from library.extensions.entity_cache_extn import EntityCache, MemoryBackend, RedisBackend
+
+
+class Loader:
+    """Counts database reads and lets the test decide when they finish."""
+
+    def __init__(self, value: object) -> None:
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> object:
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once() -> None:
+    """Test that concurrent misses share one load, and later reads are hits."""
+    cache = EntityCache(MemoryBackend(), ttl=60)
+    loader = Loader({"id": 1})
+    readers = [asyncio.create_task(cache.get_or_load("Document:1", loader)) for _ in range(10)]
+    await asyncio.sleep(0)
+    readers[0].cancel()
+    loader.release.set()
+    results = await asyncio.gather(*readers[1:])
+
+    assert loader.calls == 1
+    assert all(result == {"id": 1} for result in results)
+    assert await cache.get_or_load("Document:1", loader) == {"id": 1}
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 9, 1)
+
+
+@pytest.mark.asyncio
+async def test_invalidation() -> None:
+    """Test that writes evict entries and that a load racing a write is not cached."""
+    cache = EntityCache(MemoryBackend(), ttl=60)
+    loader = Loader("before")
+    loader.release.set()
+    assert await cache.get_or_load("Document:1", loader) == "before"
+    await cache.invalidate("Document:1")
+
+    loader.value, loader.release = "stale", asyncio.Event()
+    reader = asyncio.create_task(cache.get_or_load("Document:1", loader))
+    await asyncio.sleep(0)
+    await cache.invalidate("Document:1")
+    loader.release.set()
+    assert await reader == "stale"
+
+    loader.value = "after"
+    assert await cache.get_or_load("Document:1", loader) == "after"
+    assert loader.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_bounds() -> None:
+    """Test that the memory backend expires entries and evicts the least recently used."""
+    backend = MemoryBackend(max_entries=2)
+    await backend.set("a", 1, ttl=60)
+    await backend.set("b", 2, ttl=60)
+    assert await backend.get("a") == 1
+    await backend.set("c", 3, ttl=60)
+    assert await backend.get("b") is None
+    assert await backend.get("a") == 1
+
+    await backend.set("d", 4, ttl=0.01)
+    await asyncio.sleep(0.02)
+    assert await backend.get("d") is None
+    assert backend.stats()["evictions"] == 2
+
+
+class FakeRedis:
+    """The part of the redis.asyncio client the backend uses, over a dict."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[bytes, float]] = {}
+        self.closed = False
+
+    async def get(self, key: str) -> bytes | None:
+        value, expires_at = self.data.get(key, (None, 0.0))
+        return value if expires_at > time.monotonic() else None
+
+    async def set(self, key: str, value: bytes, px: int) -> None:
+        assert isinstance(value, bytes)
+        self.data[key] = (value, time.monotonic() + px / 1000)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_round_trips_entities_as_json() -> None:
+    """Test that model instances are stored as JSON and come back as detached instances with typed values."""
+    client = FakeRedis()
+    backend = RedisBackend(client=client, models=Base.registry)
+    document = Document(
+        id=uuid.uuid4(),
+        batch_id=uuid.uuid4(),
+        name="scan",
+        extension="pdf",
+        created_by=uuid.uuid4(),
+        created_at=datetime(2026, 1, 2, 3, 4, 5),  # noqa: DTZ001 - the columns are naive
+        doc_metadata={"pages": 3, "tags": ["a"]},
+        archived=False,
+    )
+    await backend.set("Document:1", document, ttl=60)
+
+    stored = json.loads(client.data["entity:Document:1"][0])
+    assert stored["$entity"] == "Document"
+    cached = await backend.get("Document:1")
+    assert isinstance(cached, Document)
+    assert cached is not document
+    assert (cached.id, cached.batch_id, cached.created_at) == (document.id, document.batch_id, document.created_at)
+    assert cached.doc_metadata == {"pages": 3, "tags": ["a"]}
+    assert cached.parsing_completed_at is None
+
+    await backend.delete("Document:1")
+    assert await backend.get("Document:1") is None
+    await backend.close()
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_never_unpickles() -> None:
+    """Test that pickled, unknown and unencodable entries are refused and read as misses."""
+    client = FakeRedis()
+    backend = RedisBackend(client=client)
+    client.data["entity:a"] = (pickle.dumps({"id": 1}), time.monotonic() + 60)
+    client.data["entity:b"] = (b'{"$entity": "Secret", "values": {}}', time.monotonic() + 60)
+
+    assert await backend.get("a") is None
+    assert await backend.get("b") is None
+    await backend.set("c", object(), ttl=60)
+    assert "entity:c" not in client.data
+    await backend.set("d", {"count": 2}, ttl=60)
+    assert await backend.get("d") == {"count": 2}
+    assert backend.stats()["errors"] == 3
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_behind_the_cache() -> None:
+    """Test that the entity cache serves hits from the shared server."""
+    cache = EntityCache(RedisBackend(client=FakeRedis()), ttl=60)
+    loader = Loader({"id": str(uuid.UUID(int=1))})
+    loader.release.set()
+    assert await cache.get_or_load("Document:1", loader) == {"id": "00000000-0000-0000-0000-000000000001"}
+    assert await cache.get_or_load("Document:1", loader) == {"id": "00000000-0000-0000-0000-000000000001"}
+    assert loader.calls == 1
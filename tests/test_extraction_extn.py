@@ -0,0 +1,89 @@
+# ruff: noqa: S101,  PLR2004
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from quart import Quart
+
+from database.models import Document, DocumentBatch
+from library.extensions import configure_extraction
+from library.extensions.extraction_extn import PdfExtractionError, PdfTextExtractor
+from service.document_service import DocumentService
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake poppler binaries are shell scripts")
+
+
+@pytest.fixture
+def poppler_path(tmp_path: Path) -> str:
+    """Fixture that stands in for poppler: a 23 page document, each range taking a little while."""
+    (tmp_path / "pdfinfo").write_text('#!/bin/sh\necho "Pages:          23"\n')
+    (tmp_path / "pdftotext").write_text(
+        '#!/bin/sh\nsleep 0.05\ni=$2; while [ $i -le $4 ]; do printf "text of page %s\\f" $i; i=$((i+1)); done\n'
+    )
+    for binary in ("pdfinfo", "pdftotext"):
+        (tmp_path / binary).chmod(0o755)
+    return str(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_in_order(poppler_path: str) -> None:
+    """Test that page ranges fan out but pages come back in order."""
+    extractor = PdfTextExtractor(workers=3, pages_per_task=4, poppler_path=poppler_path)
+    pages = [page async for page in extractor.iter_pages(Path("document.pdf"))]
+    assert [page.page for page in pages] == list(range(1, 24))
+    assert pages[22].text == "text of page 23"
+
+
+@pytest.mark.asyncio
+async def test_missing_poppler(tmp_path: Path) -> None:
+    """Test that a missing poppler install is reported as an extraction error."""
+    extractor = PdfTextExtractor(poppler_path=str(tmp_path))
+    with pytest.raises(PdfExtractionError):
+        await extractor.page_count(Path("document.pdf"))
+
+
+@pytest.mark.asyncio
+async def test_password_stays_off_the_command_line(poppler_path: str, tmp_path: Path) -> None:
+    """Test that a protected document is decrypted by qpdf reading the password on stdin, then removed."""
+    log = tmp_path / "argv.log"
+    (Path(poppler_path) / "qpdf").write_text(
+        f'#!/bin/sh\necho "$@" >> {log}\nread password\necho "$password" > {tmp_path}/stdin\ncp "$3" "$4"\n'
+    )
+    (Path(poppler_path) / "qpdf").chmod(0o755)
+    pdftotext = Path(poppler_path) / "pdftotext"
+    pdftotext.write_text(pdftotext.read_text().replace("sleep 0.05", f'echo "$@" >> {log}'))
+    source = tmp_path / "document.pdf"
+    source.write_bytes(b"%PDF-1.4")
+
+    extractor = PdfTextExtractor(workers=2, pages_per_task=8, poppler_path=poppler_path)
+    pages = [page async for page in extractor.iter_pages(source, "s3cret")]
+
+    assert len(pages) == 23
+    assert (tmp_path / "stdin").read_text() == "s3cret\n"
+    assert "s3cret" not in log.read_text()
+    decrypted = Path(log.read_text().splitlines()[-1].split()[-2])
+    assert decrypted != source
+    assert not decrypted.parent.exists()
+
+
+@pytest.mark.asyncio
+async def test_failed_extraction_is_stamped(app: Quart, tmp_path: Path) -> None:
+    """Test that a document whose extraction raises is stamped as failed, and cleared by a later success."""
+    app.config["POPPLER_PATH"] = str(tmp_path)
+    configure_extraction(app)
+    async with app.app_context():
+        batch, [document_id] = await DocumentBatch.register_batch(
+            "scans", uuid.uuid4(), [{"name": "scan", "extension": "pdf", "content_hash": "ab" * 32}]
+        )
+        with pytest.raises(PdfExtractionError):
+            _ = [page async for page in DocumentService.extract_pages(document_id)]
+        failed = await Document.get_document_by_id(document_id)
+        await Document.mark_parsing_completed(document_id, batch.id)
+        parsed = await Document.get_document_by_id(document_id)
+
+    assert failed.processing_started_at is not None
+    assert failed.parsing_failed_at is not None
+    assert "pdfinfo not found" in failed.parsing_error
+    assert parsed.parsing_failed_at is None
+    assert parsed.parsing_error is None
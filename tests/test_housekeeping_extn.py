@@ -0,0 +1,95 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+from quart import Quart
+
+from database.models import DocumentBatch
+from library.extensions.blob_store_extn import pdf_blobs
+from library.extensions.housekeeping_extn import Housekeeper, SweepTarget, configure_housekeeping
+from library.extensions.resumable_upload_extn import pdf_sessions
+
+
+def _write(path: Path, size: int, age: float = 0) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+@pytest.mark.asyncio
+async def test_sweep_applies_ttl_and_quota(tmp_path: Path) -> None:
+    """Test that expired entries go first, then the oldest ones until the directory fits its quota."""
+    stale = _write(tmp_path / "stale" / "nested" / "a.bin", 100, age=7200)
+    os.utime(tmp_path / "stale", (time.time() - 7200,) * 2)
+    old = _write(tmp_path / "old.bin", 300, age=600)
+    new = _write(tmp_path / "new.bin", 300)
+
+    housekeeper = Housekeeper(lambda: [SweepTarget(tmp_path, ttl=3600, quota=400)], pause=0)
+    result = await housekeeper.sweep()
+
+    assert not stale.parent.parent.exists()
+    assert not old.exists()
+    assert new.exists()
+    assert result["removed"] == 2
+    assert result["bytes_reclaimed"] == 400
+    assert housekeeper.stats()["sweeps"] == 1
+
+
+@pytest.mark.asyncio
+async def test_housekeeping_runs_with_the_app(upload_app: Quart) -> None:
+    """Test that the app sweeps abandoned upload files on start up and leaves stored blobs alone."""
+    app = upload_app
+    app.config.update(HOUSEKEEPING_TTL=60, HOUSEKEEPING_DELETE_PAUSE=0)
+    configure_housekeeping(app)
+
+    async with app.app_context():
+        blob = _write(pdf_blobs.path_for("ab" * 32), 10, age=7200)
+        incoming = _write(pdf_blobs.incoming / "tmp", 10, age=7200)
+        part = _write(pdf_sessions.root / "dead.part", 10, age=7200)
+        live = _write(pdf_sessions.root / "live.part", 10)
+
+    async with app.test_app() as test_app:
+        housekeeper = app.extensions["housekeeping"]
+        for _ in range(100):
+            if housekeeper.stats()["sweeps"]:
+                break
+            await asyncio.sleep(0.01)
+        response = await test_app.test_client().get("/housekeeping-info")
+        stats = await response.get_json()
+
+    assert stats["sweeps"] == 1
+    assert stats["bytes_reclaimed"] == 20
+    assert blob.exists()
+    assert live.exists()
+    assert not incoming.exists()
+    assert not part.exists()
+
+
+@pytest.mark.asyncio
+async def test_sweep_removes_unreferenced_blobs(app: Quart) -> None:
+    """Test that stored blobs no document points at are removed once their grace period is over."""
+    app.config.update(HOUSEKEEPING_ORPHAN_BLOB_TTL=60, HOUSEKEEPING_DELETE_PAUSE=0)
+    configure_housekeeping(app)
+
+    async with app.app_context():
+        batch = await DocumentBatch.add_batch("scans", uuid.uuid4())
+        spec = {"name": "kept", "extension": "pdf", "content_hash": "ab" * 32, "file_size": 10}
+        await DocumentBatch.add_documents(batch.id, batch.created_by, [spec])
+        referenced = _write(pdf_blobs.path_for("ab" * 32), 10, age=7200)
+        orphan = _write(pdf_blobs.path_for("cd" * 32), 10, age=7200)
+        recent = _write(pdf_blobs.path_for("ef" * 32), 10)
+        staged = _write(pdf_blobs.incoming / ("01" * 32), 10)
+
+        result = await app.extensions["housekeeping"].sweep()
+
+    assert result["orphan_blobs_removed"] == 1
+    assert referenced.exists()
+    assert not orphan.exists()
+    assert recent.exists()
+    assert staged.exists()
@@ -0,0 +1,111 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+from typing import Any
+
+import pytest
+from quart import Quart
+
+from database.models import Job, JobStatusEnum
+from service.job_service import JobService, JobWorker
+
+calls: list[dict[str, Any]] = []
+
+
+@JobService.handler("test_record")
+async def record(payload: dict[str, Any]) -> None:
+    calls.append(payload)
+
+
+@JobService.handler("test_fail")
+async def fail(payload: dict[str, Any]) -> None:
+    raise RuntimeError(f"cannot handle {payload['n']}")
+
+
+@pytest.mark.asyncio
+async def test_enqueue_and_claim(app: Quart) -> None:
+    """Test that due jobs are leased once each, in run order, and attempts default from the config."""
+    app.config["JOBS_MAX_ATTEMPTS"] = 3
+    async with app.app_context():
+        enqueued = [await JobService.enqueue("test_record", {"n": n}) for n in range(3)]
+        first = await Job.claim("default", "worker-1", 2, 60)
+        second = await Job.claim("default", "worker-2", 2, 60)
+        assert await Job.claim("default", "worker-3", 2, 60) == []
+        with pytest.raises(ValueError, match="No job handler"):
+            await JobService.enqueue("unknown", {})
+
+    assert [job.id for job in first + second] == [job.id for job in enqueued]
+    assert {job.locked_by for job in first} == {"worker-1"}
+    assert all(job.status == JobStatusEnum.RUNNING and job.attempts == 1 for job in first + second)
+    # one lease per claim, finishing a job also matches its id
+    assert len({job.lease_token for job in first}) == 1
+    assert first[0].lease_token != second[0].lease_token
+    assert all(job.max_attempts == 3 for job in enqueued)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed(app: Quart) -> None:
+    """Test that a job whose lease expired is claimed again, and the worker that lost it cannot finish it."""
+    async with app.app_context():
+        job = await JobService.enqueue("test_record", {"n": 1})
+        [stale] = await Job.claim("default", "worker-1", 1, -1)
+        [fresh] = await Job.claim("default", "worker-2", 1, 60)
+        assert await Job.claim("default", "worker-3", 1, 60) == []
+
+        assert not await Job.complete(stale)
+        assert not await Job.extend_lease(stale, 60)
+        assert await Job.complete(fresh)
+        done = await Job.get_job(job.id)
+
+    assert fresh.id == job.id
+    assert fresh.attempts == 2
+    assert fresh.lease_token != stale.lease_token
+    assert done.status == JobStatusEnum.SUCCEEDED
+    assert done.lease_token is None
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_jobs(app: Quart) -> None:
+    """Test that a worker runs claimed jobs through their handler and completes them."""
+    calls.clear()
+    async with app.app_context():
+        jobs = [await JobService.enqueue("test_record", {"n": n}) for n in range(3)]
+
+    assert await JobWorker(app, concurrency=2, poll_interval=0.01).run(max_jobs=3) == 3
+
+    async with app.app_context():
+        done = [await Job.get_job(job.id) for job in jobs]
+    assert sorted(call["n"] for call in calls) == [0, 1, 2]
+    assert all(job.status == JobStatusEnum.SUCCEEDED and job.finished_at is not None for job in done)
+
+
+@pytest.mark.asyncio
+async def test_retry_then_dead_letter(app: Quart) -> None:
+    """Test that a failing job is re-queued with backoff and buried once it ran ``max_attempts`` times."""
+    async with app.app_context():
+        job = await JobService.enqueue("test_fail", {"n": 7}, max_attempts=2)
+    worker = JobWorker(app, poll_interval=0.01, backoff_base=0.01, backoff_max=0.02)
+
+    assert await worker.run(max_jobs=1) == 1
+    async with app.app_context():
+        retried = await Job.get_job(job.id)
+    assert retried.status == JobStatusEnum.QUEUED
+    assert retried.attempts == 1
+    assert "cannot handle 7" in retried.last_error
+    assert retried.run_at > retried.created_at
+
+    await asyncio.sleep(0.05)
+    assert await worker.run(max_jobs=1) == 1
+    async with app.app_context():
+        dead = await Job.get_job(job.id)
+        assert await Job.claim("default", "worker-1", 1, 60) == []
+    assert dead.status == JobStatusEnum.DEAD
+    assert dead.attempts == 2
+    assert dead.finished_at is not None
+
+
+def test_backoff_is_bounded(app: Quart) -> None:
+    """Test that the retry delay doubles per attempt, with jitter, up to the maximum."""
+    worker = JobWorker(app, backoff_base=5, backoff_max=60)
+    assert 2.5 <= worker.backoff(1) <= 5
+    assert 10 <= worker.backoff(3) <= 20
+    assert 30 <= worker.backoff(10) <= 60
@@ -0,0 +1,107 @@
+# ruff: noqa: S101,  PLR2004
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import pytest
+from quart import Quart
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.base import db
+from database.models.messages import MessageCatalogue
+from library.extensions.message_catalogue_extn import MessageCatalogueCache, MessageTemplate
+
+
+class Message(NamedTuple):
+    code: str
+    language: str
+    text: str
+    isactive: bool
+    updated_at: datetime
+
+
+class Table:
+    """Stands in for the message_catalogue table, recording the version every read starts from."""
+
+    def __init__(self) -> None:
+        self.rows: dict[tuple[str, str], Message] = {}
+        self.reads: list[datetime | None] = []
+        self.clock = datetime(2024, 1, 1)  # noqa: DTZ001
+
+    def write(self, code: str, language: str, text: str, isactive: bool = True) -> None:
+        self.clock += timedelta(seconds=5)
+        self.rows[code, language] = Message(code, language, text, isactive, self.clock)
+
+    async def changed_since(self, version: datetime | None, languages: tuple[str, ...]) -> list[Message]:
+        self.reads.append(version)
+        return sorted(
+            (
+                row
+                for row in self.rows.values()
+                if (version is None or row.updated_at >= version) and (not languages or row.language in languages)
+            ),
+            key=lambda row: row.updated_at,
+        )
+
+
+def test_template_formatting() -> None:
+    """Test that placeholders are substituted, percent signs kept and missing parameters left as is."""
+    template = MessageTemplate("{count} of {total} files, 100% of {name}")
+    assert template.parameters == {"count", "total", "name"}
+    assert template.format({"count": 3, "total": 4, "name": "batch", "extra": 1}) == "3 of 4 files, 100% of batch"
+    assert template.format({"count": 3}) == "3 of {total} files, 100% of {name}"
+    assert MessageTemplate("No parameters, 5%").format({"count": 1}) == "No parameters, 5%"
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh() -> None:
+    """Test that refreshes read from the last version and apply edits, deactivations and fallbacks."""
+    table = Table()
+    table.write("E001", "en-US", "File {name} is too large")
+    table.write("E001", "fr", "Le fichier {name} est trop grand")
+    table.write("E002", "en-US", "Unknown error")
+    cache = MessageCatalogueCache(table.changed_since)
+    assert await cache.reload() == 3
+    assert cache.format("E001", "fr", name="a.pdf") == "Le fichier a.pdf est trop grand"
+    assert cache.format("E002", "fr") == "Unknown error"
+    assert cache.format("E404", "fr") == "E404"
+
+    version = cache.version
+    table.write("E002", "en-US", "Something went wrong")
+    table.write("E001", "fr", "Le fichier {name} est trop grand", isactive=False)
+    assert await cache.refresh() == 2
+    assert table.reads[-1] == version
+    assert cache.format("E001", "fr", name="a.pdf") == "File a.pdf is too large"
+    assert cache.format("E002", "en-US") == "Something went wrong"
+
+    assert await cache.refresh() == 0
+    assert cache.stats()["languages"] == {"en-US": 2, "fr": 0}
+
+
+@pytest.mark.asyncio
+async def test_edits_restamp_updated_at(app: Quart) -> None:
+    """Test that a message edited through the ORM gets a new updated_at, so the next refresh reads it."""
+    written = datetime(2024, 1, 1)  # noqa: DTZ001 - the column is naive
+    async with app.app_context():
+        await MessageCatalogue.upsert_messages(
+            [
+                {
+                    "code": "E001",
+                    "language": "en-US",
+                    "text": "File {name} is too large",
+                    "description": "upload too large",
+                    "category": "upload",
+                    "updated_at": written,
+                }
+            ]
+        )
+
+        async def edit(session: AsyncSession) -> None:
+            message = (await session.execute(select(MessageCatalogue))).scalar_one()
+            message.text = "File {name} is larger than {limit}"
+
+        await db.run_write(edit)
+        [row] = await MessageCatalogue.changed_since(written + timedelta(days=1))
+
+    assert row.text == "File {name} is larger than {limit}"
+    assert row.updated_at > written
@@ -0,0 +1,50 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import base64
+import binascii
+import hashlib
+
+import pytest
+
+from library.extensions.password_hasher_extn import (
+    HashingQueueFullError,
+    HashParams,
+    PasswordHasher,
+)
+
+
+@pytest.mark.asyncio
+async def test_hash_verify_and_upgrade() -> None:
+    """Test that hashes verify with their own parameters, including hashes made before parameters were stored."""
+    scrypt = HashParams("scrypt", n=1024, r=8, p=1)
+    hasher = PasswordHasher(scrypt, workers=2)
+    try:
+        hashed = await hasher.hash("correct horse")
+        assert hashed.params == "scrypt$1024$8$1"
+        assert await hasher.verify("correct horse", hashed.password, hashed.salt, hashed.params)
+        assert not await hasher.verify("wrong horse", hashed.password, hashed.salt, hashed.params)
+        assert not hasher.needs_upgrade(hashed.params)
+
+        salt = b"0123456789abcdef"
+        legacy = base64.b64encode(binascii.hexlify(hashlib.pbkdf2_hmac("sha256", b"old secret", salt, 10000)))
+        assert await hasher.verify("old secret", legacy.decode(), base64.b64encode(salt).decode(), None)
+        assert hasher.needs_upgrade(None)
+
+        passwords = [f"secret-{i}" for i in range(5)]
+        for password, stored in zip(passwords, await hasher.hash_many(passwords), strict=True):
+            assert await hasher.verify(password, stored.password, stored.salt, stored.params)
+    finally:
+        await hasher.close()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded() -> None:
+    """Test that callers beyond the workers and the queue are refused instead of waiting."""
+    hasher = PasswordHasher(HashParams(iterations=200000), workers=1, queue_size=2, executor="thread")
+    try:
+        results = await asyncio.gather(*(hasher.hash("secret") for _ in range(5)), return_exceptions=True)
+        refused = [result for result in results if isinstance(result, HashingQueueFullError)]
+        assert len(refused) == 2
+        assert hasher.stats()["queue_full"] == 2
+    finally:
+        await hasher.close()
@@ -0,0 +1,82 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+from pathlib import Path
+
+import pytest
+from quart import Quart
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from library.extensions import configure_db_checkup, pool_metrics_extn
+from library.extensions.pool_metrics_extn import PoolMetrics, render_prometheus
+
+
+@pytest.mark.asyncio
+async def test_pool_events_are_recorded(tmp_path: Path) -> None:
+    """Test that waits, holds, overflow, timeouts, invalidations and recycles are counted."""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=1, pool_timeout=0.05, pool_recycle=1
+    )
+    metrics = PoolMetrics(engine, "primary")
+
+    first = await engine.connect()
+    second = await engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        await engine.connect()
+    await first.close()
+    await second.invalidate()
+    await second.close()
+    await asyncio.sleep(1.1)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checkouts"] == 3
+    assert snapshot["overflow_connects"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["invalidations"] == 1
+    assert snapshot["recycles"] == 1
+    assert snapshot["checkout_wait_seconds"]["count"] == 4
+    assert snapshot["hold_seconds"]["count"] == 3
+
+    exposition = render_prometheus([metrics])
+    assert 'db_pool_checkout_wait_seconds_bucket{pool="primary",le="+Inf"} 4' in exposition
+    assert 'db_pool_timeouts_total{pool="primary"} 1' in exposition
+    assert "# TYPE db_pool_checkedout gauge" in exposition
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_untimed_checkouts_on_other_releases(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the pool is left alone where its private checkout may differ, and public events still count."""
+    monkeypatch.setattr(pool_metrics_extn, "TIMED_CHECKOUT_VERSIONS", ("9.9.",))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=1)
+    do_get = engine.sync_engine.pool._do_get  # noqa: SLF001
+    metrics = PoolMetrics(engine, "primary")
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    snapshot = metrics.snapshot()
+    assert engine.sync_engine.pool._do_get == do_get  # noqa: SLF001
+    assert snapshot["checkout_wait_timed"] is False
+    assert snapshot["checkouts"] == 1
+    assert snapshot["hold_seconds"]["count"] == 1
+    assert snapshot["checkout_wait_seconds"]["count"] == 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pool_info_keeps_the_primary_pool_keys(app: Quart) -> None:
+    """Test that /db-pool-info still reports the primary pool at the top level, next to every pool's telemetry."""
+    configure_db_checkup(app)
+
+    response = await app.test_client().get("/db-pool-info")
+
+    body = await response.get_json()
+    primary = body["pools"][0]
+    assert primary["pool"] == "primary"
+    assert body["pool_size"] == primary["size"]
+    assert body["checked_in_connections"] == primary["checkedin"]
+    assert body["checked_out_connections"] == primary["checkedout"]
+    assert body["overflow_connections"] == primary["overflow"]
@@ -0,0 +1,72 @@
+# ruff: noqa: S101,  PLR2004
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+
+import pytest
+
+from library.extensions.session_token_extn import SessionTokens
+
+
+class Accounts:
+    """Stands in for the accounts table, counting the reads and writes the tokens make."""
+
+    def __init__(self) -> None:
+        self.versions: dict[uuid.UUID, int] = {}
+        self.loads = 0
+        self.writes: list[dict[uuid.UUID, datetime]] = []
+
+    async def load_state(self, account_id: uuid.UUID) -> tuple[int, str] | None:
+        self.loads += 1
+        version = self.versions.get(account_id)
+        return None if version is None else (version, "active")
+
+    async def write_activity(self, seen: Mapping[uuid.UUID, datetime]) -> int:
+        self.writes.append(dict(seen))
+        return len(seen)
+
+
+@pytest.mark.asyncio
+async def test_validation_is_cached_and_revocable() -> None:
+    """Test that a token is checked against the database once, and revoked by bumping the account version."""
+    accounts = Accounts()
+    tokens = SessionTokens()
+    tokens.configure(b"secret", accounts.load_state, accounts.write_activity, ttl=60, cache_ttl=30)
+    account_id = uuid.uuid4()
+    accounts.versions[account_id] = 0
+    token, _ = tokens.issue(account_id, 0)
+
+    for _ in range(10):
+        claims = await tokens.validate(token)
+        assert claims is not None
+        assert claims.account_id == account_id
+    assert accounts.loads == 1
+    assert await tokens.validate(token[:-1] + ("A" if token[-1] != "A" else "B")) is None
+    assert await tokens.validate("not-a-token") is None
+
+    accounts.versions[account_id] = 1
+    tokens.revoked(account_id, 1)
+    assert await tokens.validate(token) is None
+    fresh, _ = tokens.issue(account_id, 1)
+    assert await tokens.validate(fresh) is not None
+
+
+@pytest.mark.asyncio
+async def test_activity_is_written_in_batches() -> None:
+    """Test that requests of many accounts end up in one write per flush."""
+    accounts = Accounts()
+    tokens = SessionTokens()
+    tokens.configure(b"secret", accounts.load_state, accounts.write_activity)
+    issued = []
+    for _ in range(3):
+        account_id = uuid.uuid4()
+        accounts.versions[account_id] = 0
+        issued.append(tokens.issue(account_id, 0)[0])
+    for _ in range(5):
+        for token in issued:
+            assert await tokens.validate(token) is not None
+
+    assert await tokens.flush() == 3
+    assert await tokens.flush() == 0
+    assert len(accounts.writes) == 1
+    assert set(accounts.writes[0]) == set(accounts.versions)
@@ -0,0 +1,47 @@
+# ruff: noqa: S101,  PLR2004
+
+import pytest
+from quart import Quart
+
+from library.extensions.extraction_extn import PageText
+from library.extensions.text_cache_extn import TextCache
+from library.extensions.upload_extn import pdf_loader
+
+
+def _pages(marker: str, count: int = 3) -> list[PageText]:
+    return [PageText(page=i, text=f"{marker} page {i} " * 10) for i in range(1, count + 1)]
+
+
+@pytest.mark.asyncio
+async def test_memory_then_disk_tier(upload_app: Quart) -> None:
+    """Test that entries evicted from memory are still served, decompressed, from disk."""
+    async with upload_app.app_context():
+        cache = TextCache(pdf_loader, memory_chars=500)
+        first, second = TextCache.key_for("a" * 64, "v1"), TextCache.key_for("b" * 64, "v1")
+        await cache.put(first, _pages("first"))
+        await cache.put(second, _pages("second"))
+
+        assert await cache.get(TextCache.key_for("a" * 64, "v2")) is None
+        assert list(await cache.get(second)) == _pages("second")
+        assert list(await cache.get(first)) == _pages("first")
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["disk_hits"] == 1
+        assert stats["memory_evictions"] == 2
+        assert cache.path_for(first).is_file()
+
+
+@pytest.mark.asyncio
+async def test_disk_size_eviction(upload_app: Quart) -> None:
+    """Test that the on disk tier drops the least recently used files once it outgrows its budget."""
+    async with upload_app.app_context():
+        cache = TextCache(pdf_loader, memory_chars=1, disk_bytes=400)
+        keys = [TextCache.key_for(f"{i:064x}", "v1") for i in range(6)]
+        for key in keys:
+            await cache.put(key, _pages(key, 2))
+
+        assert cache.stats()["disk_evictions"] > 0
+        assert cache.stats()["disk_bytes"] <= 400
+        assert cache.path_for(keys[-1]).is_file()
+        assert not cache.path_for(keys[0]).is_file()
@@ -0,0 +1,138 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from quart import Quart, jsonify
+from quart_uploads import UploadNotAllowed
+
+from library.extensions.blob_store_extn import pdf_blobs
+from library.extensions.upload_extn import _PartWriter, pdf_loader, stream_multipart
+from library.extensions.upload_scheduler_extn import UploadQueueFullError, UploadScheduler
+
+BOUNDARY = "test-boundary"
+
+
+def _multipart(*parts: tuple[str, str | None, bytes]) -> bytes:
+    body = b""
+    for name, filename, payload in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + payload + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def quart_app(upload_app: Quart) -> Quart:
+    """Fixture to create a Quart app that streams uploads into a temp directory."""
+    app = upload_app
+    app.config["UPLOADS_STREAM_BUFFER_SIZE"] = 1024
+
+    @app.route("/upload", methods=["POST"])
+    @app.route("/blobs", methods=["POST"], defaults={"store": pdf_blobs})
+    async def upload(store: object = None) -> tuple:
+        try:
+            form = await stream_multipart(pdf_loader, store=store)
+        except UploadNotAllowed:
+            return jsonify(error="not allowed"), 415
+        files = [(f.filename, f.saved_as, f.size, f.duplicate) for f in form.files]
+        return jsonify(fields=form.fields, files=files), 201
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_stream_multipart_writes_files(quart_app: Quart, tmp_path: Path) -> None:
+    """Test that file parts land in the upload set destination and fields are collected."""
+    payload = bytes(range(256)) * 40
+    body = _multipart(("passwords", None, b"secret"), ("documents", "a.pdf", payload), ("documents", "a.pdf", payload))
+    response = await quart_app.test_client().post(
+        "/upload", data=body, headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    result = await response.get_json()
+    assert response.status_code == 201
+    assert result["fields"] == {"passwords": ["secret"]}
+    assert result["files"] == [["a.pdf", "a.pdf", len(payload), False], ["a.pdf", "a_1.pdf", len(payload), False]]
+    assert (tmp_path / "pdf" / "a_1.pdf").read_bytes() == payload
+
+
+@pytest.mark.asyncio
+async def test_stream_multipart_rolls_back(quart_app: Quart, tmp_path: Path) -> None:
+    """Test that files already written are removed when a later part is rejected."""
+    body = _multipart(("documents", "a.pdf", b"%PDF-1.4"), ("documents", "run.exe", b"MZ"))
+    response = await quart_app.test_client().post(
+        "/upload", data=body, headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    assert response.status_code == 415
+    assert list((tmp_path / "pdf").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_blob_store_deduplicates(quart_app: Quart, tmp_path: Path) -> None:
+    """Test that identical uploads are stored once under their SHA-256."""
+    payload = b"%PDF-1.4 same bytes"
+    digest = hashlib.sha256(payload).hexdigest()
+    body = _multipart(("documents", "a.pdf", payload), ("documents", "b.pdf", payload))
+    response = await quart_app.test_client().post(
+        "/blobs", data=body, headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    result = await response.get_json()
+    blob_path = f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+    assert result["files"] == [["a.pdf", blob_path, len(payload), False], ["b.pdf", blob_path, len(payload), True]]
+    assert (tmp_path / "pdf" / blob_path).read_bytes() == payload
+    assert list((tmp_path / "pdf" / "blobs" / "incoming").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_scheduler_rejects_when_queue_full() -> None:
+    """Test that writes beyond the global slots and the wait queue are refused."""
+    scheduler = UploadScheduler(max_concurrent=1, per_request=4, queue_size=1, retry_after=7)
+    release = threading.Event()
+    limiter = scheduler.limiter()
+    running = asyncio.create_task(scheduler.run(limiter, release.wait))
+    waiting = asyncio.create_task(scheduler.run(limiter, lambda: "done"))
+    await asyncio.sleep(0.05)
+    assert scheduler.stats()["in_flight"] == 1
+    assert scheduler.stats()["queue_depth"] == 1
+    with pytest.raises(UploadQueueFullError) as exc_info:
+        await scheduler.run(scheduler.limiter(), lambda: None)
+    assert exc_info.value.retry_after == 7
+    release.set()
+    assert await running is True
+    assert await waiting == "done"
+    assert scheduler.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_part_writer_overlaps_blocks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a part is written up to ``per_request`` blocks at a time and still hashed in order."""
+    scheduler = UploadScheduler(per_request=2)
+    target = tmp_path / "part.bin"
+    lock = threading.Lock()
+    writing = peak = 0
+    pwrite = os.pwrite
+
+    def slow_pwrite(fd: int, data: bytes, position: int) -> int:
+        nonlocal writing, peak
+        with lock:
+            writing += 1
+            peak = max(peak, writing)
+        time.sleep(0.02)
+        with lock:
+            writing -= 1
+        return pwrite(fd, data, position)
+
+    monkeypatch.setattr(os, "pwrite", slow_pwrite)
+    payload = bytes(range(256)) * 32
+    writer = _PartWriter(target, target.open("wb"), 1024, scheduler.offloader(), scheduler.per_request)
+    for offset in range(0, len(payload), 512):
+        await writer.write(payload[offset : offset + 512])
+
+    assert await writer.close() == hashlib.sha256(payload).hexdigest()
+    assert target.read_bytes() == payload
+    assert peak == 2
@@ -0,0 +1,164 @@
+# ruff: noqa: S101,  PLR2004
+import asyncio
+import hashlib
+import uuid
+
+import pytest
+from quart import Quart
+
+from database.models import Document, DocumentBatch, Job, Uploads, UploadStatusEnum
+from library.extensions import pdf_blobs, pdf_sessions
+
+SESSIONS = "/api/v1/uploads/sessions"
+PAYLOAD = b"%PDF-1.4 " + bytes(range(256)) * 8
+
+
+async def _open_session(app: Quart, content_hash: str | None = None, length: int = len(PAYLOAD)) -> tuple[str, str]:
+    async with app.app_context():
+        batch = await DocumentBatch.add_batch("scans", uuid.uuid4())
+    body = {"batch_id": str(batch.id), "filename": "scan.pdf", "upload_length": length}
+    if content_hash is not None:
+        body["content_hash"] = content_hash
+    response = await app.test_client().post(f"{SESSIONS}/", json=body)
+    assert response.status_code == 201
+    assert response.headers["Upload-Offset"] == "0"
+    return str(batch.id), response.headers["Location"]
+
+
+async def _patch(app: Quart, location: str, offset: int, data: bytes) -> int:
+    response = await app.test_client().patch(
+        location,
+        data=data,
+        headers={"Content-Type": "application/offset+octet-stream", "Upload-Offset": str(offset)},
+    )
+    return response.status_code
+
+
+async def _offset(app: Quart, location: str) -> int:
+    response = await app.test_client().head(location)
+    assert response.status_code == 200
+    return int(response.headers["Upload-Offset"])
+
+
+@pytest.mark.asyncio
+async def test_chunks_out_of_order_are_assembled(app: Quart) -> None:
+    """Test that chunks sent out of order and twice are assembled once into a document of the batch."""
+    batch_id, location = await _open_session(app, hashlib.sha256(PAYLOAD).hexdigest())
+    half = len(PAYLOAD) // 2
+
+    assert await _patch(app, location, half, PAYLOAD[half:]) == 204
+    assert await _offset(app, location) == 0
+    assert await _patch(app, location, half, PAYLOAD[half:]) == 204
+    assert await _offset(app, location) == 0
+    assert await _patch(app, location, 0, PAYLOAD[:half]) == 204
+    assert await _offset(app, location) == len(PAYLOAD)
+    assert await _patch(app, location, 0, PAYLOAD[:half]) == 409
+
+    session = await (await app.test_client().get(location)).get_json()
+    assert session["status"] == UploadStatusEnum.COMPLETED
+    async with app.app_context():
+        document = await Document.get_document_by_id(uuid.UUID(session["document_id"]))
+        batch = await DocumentBatch.get_batch_by_id(uuid.UUID(batch_id))
+        assert pdf_blobs.path_for(document.content_hash).read_bytes() == PAYLOAD
+        assert not pdf_sessions.path_for(uuid.UUID(session["id"])).exists()
+        [job] = await Job.claim("default", "test", 10, 60)
+    assert job.payload == {"document_id": str(document.id)}
+    assert document.content_hash == hashlib.sha256(PAYLOAD).hexdigest()
+    assert document.file_size == len(PAYLOAD)
+    assert batch.batch_size == 1
+
+
+@pytest.mark.asyncio
+async def test_checksum_mismatch(app: Quart) -> None:
+    """Test that a file that does not match its declared hash fails the session with a 422."""
+    _, location = await _open_session(app, "0" * 64)
+
+    assert await _patch(app, location, 0, PAYLOAD) == 422
+    session = await (await app.test_client().get(location)).get_json()
+    assert session["status"] == UploadStatusEnum.FAILED
+    assert session["document_id"] is None
+
+
+@pytest.mark.asyncio
+async def test_expired_session(app: Quart) -> None:
+    """Test that a chunk for a session whose backing file was swept gets a 410."""
+    _, location = await _open_session(app)
+    upload_id = uuid.UUID(location.rsplit("/", 1)[-1])
+    async with app.app_context():
+        pdf_sessions.discard(upload_id)
+
+    assert await _patch(app, location, 0, PAYLOAD[:10]) == 410
+    assert await _patch(app, location, 10, PAYLOAD[10:]) == 409
+
+
+@pytest.mark.asyncio
+async def test_failed_assembly_is_resumed(app: Quart, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a retried chunk resumes an assembly that failed after the file was moved into the blob store."""
+    batch_id, location = await _open_session(app)
+    upload_id = uuid.UUID(location.rsplit("/", 1)[-1])
+    add_documents = DocumentBatch.add_documents
+
+    async def fail_once(*_: object, **__: object) -> list[uuid.UUID]:
+        monkeypatch.setattr(DocumentBatch, "add_documents", add_documents)
+        raise ConnectionError("database went away")
+
+    monkeypatch.setattr(DocumentBatch, "add_documents", fail_once)
+    assert await _patch(app, location, 0, PAYLOAD) == 500
+    async with app.app_context():
+        upload = await Uploads.get_session(upload_id)
+        assert not pdf_sessions.path_for(upload_id).exists()
+    assert upload.status == UploadStatusEnum.PENDING
+    assert upload.document_id is not None
+
+    assert await _patch(app, location, len(PAYLOAD) - 10, PAYLOAD[-10:]) == 204
+    async with app.app_context():
+        completed = await Uploads.get_session(upload_id)
+        documents = await Document.get_documents_by_batch_id(uuid.UUID(batch_id))
+        batch = await DocumentBatch.get_batch_by_id(uuid.UUID(batch_id))
+    assert completed.status == UploadStatusEnum.COMPLETED
+    assert [document.id for document in documents] == [upload.document_id]
+    assert documents[0].content_hash == hashlib.sha256(PAYLOAD).hexdigest()
+    assert batch.batch_size == 1
+
+
+@pytest.mark.asyncio
+async def test_parallel_chunks(app: Quart) -> None:
+    """Test that chunks written at the same time all get recorded, without locking the session row."""
+    _, location = await _open_session(app)
+    size = len(PAYLOAD) // 8
+    chunks = [(offset, PAYLOAD[offset : offset + size]) for offset in range(0, len(PAYLOAD), size)]
+
+    statuses = await asyncio.gather(*(_patch(app, location, offset, data) for offset, data in chunks))
+
+    assert statuses == [204] * len(chunks)
+    session = await (await app.test_client().get(location)).get_json()
+    assert session["status"] == UploadStatusEnum.COMPLETED
+    assert session["upload_offset"] == len(PAYLOAD)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_reuses_parsing_results(app: Quart) -> None:
+    """Test that a file already parsed under another document is stored once and not queued for extraction."""
+    content_hash = hashlib.sha256(PAYLOAD).hexdigest()
+    async with app.app_context():
+        batch = await DocumentBatch.add_batch("earlier", uuid.uuid4())
+        spec = {"name": "first", "extension": "pdf", "content_hash": content_hash, "file_size": len(PAYLOAD)}
+        [source_id] = await DocumentBatch.add_documents(
+            batch.id, batch.created_by, [{**spec, "doc_type": "invoice", "doc_metadata": {"pages": 2}}]
+        )
+        await Document.mark_parsing_completed(source_id, batch.id)
+
+    batch_id, location = await _open_session(app, content_hash)
+    assert await _patch(app, location, 0, PAYLOAD) == 204
+
+    session = await (await app.test_client().get(location)).get_json()
+    async with app.app_context():
+        document = await Document.get_document_by_id(uuid.UUID(session["document_id"]))
+        batch = await DocumentBatch.get_batch_by_id(uuid.UUID(batch_id))
+        jobs = await Job.claim("default", "test", 10, 60)
+    assert jobs == []
+    assert document.id != source_id
+    assert document.parsing_completed_at is not None
+    assert document.doc_type == "invoice"
+    assert document.doc_metadata == {"pages": 2}
+    assert batch.parsing_completed_at is not None
@@ -0,0 +1,99 @@
+# ruff: noqa: S101,  PLR2004
+import hashlib
+import uuid
+
+import pytest
+from quart import Quart
+
+from database.models import Document, DocumentBatch, Job
+from library.extensions import pdf_blobs
+
+UPLOADS = "/api/v1/uploads"
+BOUNDARY = "test-boundary"
+PAYLOAD = b"%PDF-1.4 " + bytes(range(256)) * 8
+
+
+def _multipart(*parts: tuple[str, str | None, bytes]) -> bytes:
+    body = b""
+    for name, filename, payload in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + payload + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def _post(app: Quart, *parts: tuple[str, str | None, bytes]) -> tuple[int, dict]:
+    response = await app.test_client().post(
+        f"{UPLOADS}/", data=_multipart(*parts), headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    return response.status_code, await response.get_json()
+
+
+@pytest.mark.asyncio
+async def test_uploads_are_registered(app: Quart) -> None:
+    """Test that uploaded files become documents of the batch, keeping their blobs, and are queued for extraction."""
+    content_hash = hashlib.sha256(PAYLOAD).hexdigest()
+    async with app.app_context():
+        batch = await DocumentBatch.add_batch("scans", uuid.uuid4())
+    assert (await app.test_client().head(f"{UPLOADS}/blobs/{content_hash}")).status_code == 404
+
+    status, body = await _post(
+        app,
+        ("batch_id", None, str(batch.id).encode()),
+        ("passwords", None, b"secret"),
+        ("documents", "a.pdf", PAYLOAD),
+        ("documents", "b.pdf", PAYLOAD),
+    )
+
+    assert status == 201
+    assert [(d["filename"], d["content_hash"], d["duplicate"]) for d in body["documents"]] == [
+        ("a.pdf", content_hash, False),
+        ("b.pdf", content_hash, True),
+    ]
+    async with app.app_context():
+        documents = {d.id: d for d in await Document.get_documents_by_batch_id(batch.id)}
+        stored = await DocumentBatch.get_batch_by_id(batch.id)
+        assert await Document.referenced_hashes([content_hash]) == {content_hash}
+        assert pdf_blobs.path_for(content_hash).read_bytes() == PAYLOAD
+        jobs = await Job.claim("default", "test", 10, 60)
+    assert [documents[uuid.UUID(d["document_id"])].name for d in body["documents"]] == ["a.pdf", "b.pdf"]
+    assert [documents[uuid.UUID(d["document_id"])].password for d in body["documents"]] == ["secret", None]
+    assert stored.batch_size == 2
+    assert sorted(job.payload["document_id"] for job in jobs) == sorted(d["document_id"] for d in body["documents"])
+    assert {job.kind for job in jobs} == {"extract_document"}
+    assert (await app.test_client().head(f"{UPLOADS}/blobs/{content_hash}")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_declared_duplicate_is_not_written(app: Quart, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a file declaring the hash of a stored blob is only hashed, and rejected when it does not match."""
+    content_hash = hashlib.sha256(PAYLOAD).hexdigest()
+    async with app.app_context():
+        batch = await DocumentBatch.add_batch("scans", uuid.uuid4())
+    batch_id = ("batch_id", None, str(batch.id).encode())
+    assert (await _post(app, batch_id, ("documents", "a.pdf", PAYLOAD)))[0] == 201
+
+    def reserve(_: str) -> None:
+        raise AssertionError("a declared duplicate was written")
+
+    monkeypatch.setattr(pdf_blobs, "reserve", reserve)
+    declared = ("content_hashes", None, content_hash.encode())
+    status, body = await _post(app, batch_id, declared, ("documents", "again.pdf", PAYLOAD))
+    assert status == 201
+    assert body["documents"][0]["duplicate"]
+
+    status, _ = await _post(app, batch_id, declared, ("documents", "forged.pdf", PAYLOAD[::-1]))
+    assert status == 400
+    async with app.app_context():
+        names = sorted(d.name for d in await Document.get_documents_by_batch_id(batch.id))
+    assert names == ["a.pdf", "again.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_upload_needs_a_batch(app: Quart) -> None:
+    """Test that an upload without a batch, or into an unknown one, registers nothing."""
+    document = ("documents", "a.pdf", PAYLOAD)
+    assert (await _post(app, document))[0] == 400
+    assert (await _post(app, ("batch_id", None, b"nope"), document))[0] == 400
+    assert (await _post(app, ("batch_id", None, str(uuid.uuid4()).encode()), document))[0] == 404